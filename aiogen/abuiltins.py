@@ -1,56 +1,500 @@
 from typing import \
     Union, List, Tuple, Dict, Set, FrozenSet, Callable, Awaitable, \
-    Iterable, Iterator, AsyncIterable, AsyncIterator
-from collections import deque
-
-from aiogen.agenerator import agenerator, async_yield
+    Iterable, AsyncIterable, AsyncIterator
+from collections import Counter, deque
+from itertools import chain, islice
+import asyncio as aio
+import heapq
+import operator
+import os
+import pickle
+import tempfile
+import threading
 
 
 __all__ = (
-    'aall', 'aany', 'adict', 'aenumerate', 'afilter',
-    'afrozenset', 'aiter', 'alist', 'amap', 'amax', 'amin',
-    'anext', 'aset', 'asorted', 'asum', 'atuple', 'azip',
+    'aall', 'aany', 'abatch', 'acounter', 'adict', 'aenumerate', 'afilter', 'aflatten',
+    'afrozenset', 'aggregate_by', 'aiter', 'aiter_from_sync', 'alist', 'amap',
+    'amap_concurrent', 'amap_executor', 'amax', 'amerge_sorted', 'amin',
+    'anext', 'anlargest', 'ansmallest', 'aset', 'asorted', 'asum', 'atuple', 'aunbatch', 'azip',
 )
 
 
+# Max values consumers take at once from aiterators supporting __anext_batch__:
+BATCH_SIZE = 1024
+
+
+def _batches(aiterator: AsyncIterator) -> Union[AsyncIterator, None]:
+    """Return async iterator of value lists if aiterator supports __anext_batch__, None otherwise."""
+    if hasattr(aiterator, '__anext_batch__'):
+        return _Batches(aiterator)
+    return None
+
+
+class _Batches(AsyncIterator):
+    __slots__ = ('_anext_batch',)
+
+    def __init__(self, aiterator):
+        self._anext_batch = aiterator.__anext_batch__
+
+    async def __anext__(self):
+        return await self._anext_batch(BATCH_SIZE)
+
+
+def _chunks(aiterator: AsyncIterator) -> AsyncIterator:
+    """Return async iterator of value lists: aiterator's batches if supported, collected values otherwise.
+
+    Note: values are collected ahead, use it only to consume aiterator completely.
+    """
+    batches = _batches(aiterator)
+    return batches if batches is not None else _Chunks(aiterator)
+
+
+class _Chunks(AsyncIterator):
+    __slots__ = ('_anext',)
+
+    def __init__(self, aiterator):
+        self._anext = aiterator.__anext__
+
+    async def __anext__(self):
+        anext_ = self._anext
+        chunk = []
+        chunk_append = chunk.append
+        try:
+            for _ in range(BATCH_SIZE):
+                chunk_append(await anext_())
+        except StopAsyncIteration:
+            if not chunk:
+                raise
+        return chunk
+
+
+async def _aclose(aiterator: AsyncIterator):
+    """Close aiterator if it supports aclose (like agenerator does)."""
+    aclose = getattr(aiterator, 'aclose', None)
+    if aclose is not None:
+        await aclose()
+
+
+# Default value of amax/amin meaning no default, of aggregate_by meaning no initial value:
+_MISSING = object()
+
+
 async def aall(aiterable: AsyncIterable) -> Awaitable[bool]:
-    async for element in aiterable:
+    aiterator = aiter(aiterable)
+    batches = _batches(aiterator)
+    if batches is not None:
+        async for batch in batches:
+            if not all(batch):
+                return False
+        return True
+    async for element in aiterator:
         if not element:
             return False
     return True
 
 
 async def aany(aiterable: AsyncIterable) -> Awaitable[bool]:
-    async for element in aiterable:
+    aiterator = aiter(aiterable)
+    batches = _batches(aiterator)
+    if batches is not None:
+        async for batch in batches:
+            if any(batch):
+                return True
+        return False
+    async for element in aiterator:
         if element:
             return True
     return False
 
 
+class abatch(AsyncIterator):
+    """Lists of up to max_size aiterable's values.
+
+    With max_delay (seconds) list is returned once max_delay passed since its first value
+    was taken, even if it's shorter, so values of slow aiterable wait for bounded time.
+    Upstream is iterated by task then, which takes up to max_size values ahead: delay doesn't
+    interrupt upstream's pending __anext__, its value goes to the next list. Upstream's
+    exception is raised after values taken before it were returned. aclose (or garbage
+    collection) closes upstream (if it supports aclose).
+    """
+    __slots__ = ('_aiterator', '_max_size', '_max_delay', '_batcher', '_finished', '_error')
+
+    def __init__(self, aiterable: AsyncIterable, max_size: int, max_delay: float=None):
+        if max_size < 1:
+            raise ValueError('max_size should be positive, got {}'.format(max_size))
+        if max_delay is not None and max_delay < 0:
+            raise ValueError('max_delay should be non-negative, got {}'.format(max_delay))
+        self._aiterator = aiter(aiterable)
+        self._max_size, self._max_delay = max_size, max_delay
+        self._batcher = None  # task taking upstream's values with max_delay
+        self._finished = False  # upstream exhausted or closed
+        self._error = None  # upstream's exception to raise after values taken before it
+
+    def __del__(self):
+        batcher = getattr(self, '_batcher', None)
+        if batcher is not None:
+            batcher.stop()
+
+    async def __anext__(self):
+        if self._max_delay is not None:
+            batcher = self._batcher if self._batcher is not None else self._start()
+            return await batcher.next_batch()
+        elif self._finished:
+            error, self._error = self._error, None
+            raise error if error is not None else StopAsyncIteration()
+        batch = []
+        try:
+            anext_batch = getattr(self._aiterator, '__anext_batch__', None)
+            if anext_batch is not None:
+                while len(batch) < self._max_size:
+                    batch.extend(await anext_batch(self._max_size - len(batch)))
+            else:
+                anext_, batch_append = self._aiterator.__anext__, batch.append
+                for _ in range(self._max_size):
+                    batch_append(await anext_())
+        except StopAsyncIteration:
+            self._finished = True
+        except aio.CancelledError:
+            raise
+        except Exception as exc:
+            if not batch:
+                raise
+            self._finished, self._error = True, exc
+        if not batch:
+            raise StopAsyncIteration()
+        return batch
+
+    async def aclose(self):
+        finished, self._finished = self._finished, True
+        batcher, self._batcher = self._batcher, None
+        if batcher is not None:
+            await batcher.aclose()
+        elif not finished:
+            await _aclose(self._aiterator)
+
+    def _start(self):
+        if self._finished:
+            raise StopAsyncIteration()
+        self._batcher = _Batcher(aio.get_event_loop(), self._aiterator, self._max_size, self._max_delay)
+        self._finished = True
+        return self._batcher
+
+
+class _Batcher:
+    """Values of abatch with max_delay taken by task.
+
+    Task doesn't reference abatch, so it can be garbage collected. Cancelled task closes upstream.
+    """
+    def __init__(self, loop, aiterator, max_size, max_delay):
+        self.loop = loop
+        self.aiterator = aiterator
+        self.max_size, self.max_delay = max_size, max_delay
+        self.buffer = []  # values taken by task
+        self.first = None  # loop's time buffer's first value was taken
+        self.waiter = None  # consumer waits for values with
+        self.space = None  # task waits for free space in buffer with
+        self.finished = False  # upstream exhausted, failed or closed
+        self.error = None  # upstream's exception to raise after values taken before it
+        self.task = loop.create_task(self._take())
+
+    async def next_batch(self):
+        loop = self.loop
+        while not self.buffer and not self.finished:
+            await self._wait()
+        # Delay starts with the first value:
+        while len(self.buffer) < self.max_size and not self.finished:
+            deadline = self.first + self.max_delay
+            if loop.time() >= deadline:
+                break
+            await self._wait(deadline)
+        batch, self.buffer = self.buffer, []
+        self.first = None
+        _set_result(self.space)
+        if not batch:
+            error, self.error = self.error, None
+            raise error if error is not None else StopAsyncIteration()
+        return batch
+
+    def stop(self):
+        self.buffer = []
+        self.task.cancel()
+
+    async def aclose(self):
+        self.stop()
+        await aio.wait((self.task,))
+
+    async def _wait(self, deadline=None):
+        loop = self.loop
+        waiter = self.waiter = loop.create_future()
+        timer = loop.call_at(deadline, _set_result, waiter) if deadline is not None else None
+        try:
+            await waiter
+        finally:
+            self.waiter = None
+            if timer is not None:
+                timer.cancel()
+
+    async def _take(self):
+        loop, aiterator = self.loop, self.aiterator
+        anext_batch = getattr(aiterator, '__anext_batch__', None)
+        try:
+            while True:
+                room = self.max_size - len(self.buffer)
+                if room <= 0:
+                    self.space = loop.create_future()
+                    await self.space
+                    self.space = None
+                    continue
+                if anext_batch is not None:
+                    values = await anext_batch(room)
+                else:
+                    values = (await aiterator.__anext__(),)
+                # Note: consumer replaces buffer while task is suspended:
+                buffer = self.buffer
+                if not buffer:
+                    self.first = loop.time()
+                buffer.extend(values)
+                if len(buffer) == len(values) or len(buffer) >= self.max_size:
+                    _set_result(self.waiter)
+        except StopAsyncIteration:
+            pass
+        except aio.CancelledError:
+            await _aclose(aiterator)
+            raise
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.finished = True
+            _set_result(self.waiter)
+
+
+def _set_result(future):
+    if future is not None and not future.done():
+        future.set_result(None)
+
+
+async def acounter(
+        aiterable: AsyncIterable, key: Callable=None, *, max_keys: int=None, partitions: int=16
+) -> Awaitable[Union[Counter, AsyncIterator]]:
+    """Counter of values (or their keys: key(value)), values aren't kept.
+
+    Note: with max_keys acounter returns async iterator of (key, count) pairs instead of Counter,
+    counts are spilled to temporary files as aggregate_by's accumulators are.
+    """
+    if max_keys is not None:
+        return await aggregate_by(
+            aiterable, key if key is not None else _identity, _increment, 0,
+            combine=operator.add, max_keys=max_keys, partitions=partitions
+        )
+    counter = Counter()
+    async for chunk in _chunks(aiter(aiterable)):
+        counter.update(chunk if key is None else map(key, chunk))
+    return counter
+
+
+def _identity(value):
+    return value
+
+
+def _increment(count, _):
+    return count + 1
+
+
 async def adict(aiterable: AsyncIterable) -> Awaitable[Dict]:
     return dict(await alist(aiterable))
 
 
-@agenerator
-async def aenumerate(aiterable: AsyncIterable, start: int=0) -> AsyncIterator:
-    n = start
-    async for element in aiterable:
-        await async_yield((n, element,))
-        n += 1
+class aenumerate(AsyncIterator):
+    __slots__ = ('_anext', '_n')
+
+    def __init__(self, aiterable: AsyncIterable, start: int=0):
+        self._anext = aiter(aiterable).__anext__
+        self._n = start
+
+    async def __anext__(self):
+        element = await self._anext()
+        n = self._n
+        self._n = n + 1
+        return n, element
+
+
+class afilter(AsyncIterator):
+    __slots__ = ('_function', '_anext')
+
+    def __init__(self, function: Callable, aiterable: AsyncIterable):
+        self._function = function if function is not None else bool
+        self._anext = aiter(aiterable).__anext__
+
+    async def __anext__(self):
+        function, anext_ = self._function, self._anext
+        while True:
+            element = await anext_()
+            if function(element):
+                return element
+
+
+class aflatten(AsyncIterator):
+    """Values of iterables aiterable yields (lists of abatch, for example).
+
+    Note: __anext_batch__ returns iterables' values by lists, without taking them one by one.
+    """
+    __slots__ = ('_anext', '_items', '_index')
+
+    def __init__(self, aiterable: AsyncIterable):
+        self._anext = aiter(aiterable).__anext__
+        self._items, self._index = [], 0  # current iterable's values and index of the next one
+
+    async def __anext__(self):
+        while self._index == len(self._items):
+            await self._next_items()
+        index = self._index
+        self._index = index + 1
+        return self._items[index]
+
+    async def __anext_batch__(self, max_items):
+        while self._index == len(self._items):
+            await self._next_items()
+        index = self._index
+        self._index = min(index + max_items, len(self._items))
+        if not index and self._index == len(self._items):
+            return self._items
+        return self._items[index:self._index]
+
+    async def _next_items(self):
+        items = await self._anext()
+        self._items, self._index = items if type(items) is list else list(items), 0
 
 
-@agenerator
-async def afilter(function: Callable, aiterable: AsyncIterable) -> AsyncIterator:
-    function = function if function is not None else bool
-    async for element in aiterable:
-        if function(element):
-            await async_yield(element)
+# abatch's inverse:
+aunbatch = aflatten
 
 
 async def afrozenset(aiterable: AsyncIterable) -> Awaitable[FrozenSet]:
     return frozenset(await alist(aiterable))
 
 
+async def aggregate_by(
+        aiterable: AsyncIterable, key: Callable, reducer: Callable, initial=_MISSING, *,
+        combine: Callable=None, max_keys: int=None, partitions: int=16
+) -> Awaitable[Union[Dict, AsyncIterator]]:
+    """Dict of keys (key(value)) to accumulators of their values, values aren't kept.
+
+    Accumulator starts with initial (or key's first value without it) and is replaced
+    by reducer(accumulator, value) for every value, so reducer shouldn't modify initial.
+    Note: with max_keys aggregate_by returns async iterator of (key, accumulator) pairs instead of dict.
+    Accumulators are spilled to temporary files (one per partition of keys by hash) once
+    there're max_keys of them and new key comes, iterator merges partitions one by one
+    with combine(accumulator, accumulator). Partition having more than max_keys keys is
+    spilled again to partitions of its own, so at most max_keys accumulators are kept at once.
+    Reducer is used as combine by default without initial, with initial combine is required.
+    Files are written and read with blocking I/O, as asorted's runs are.
+    """
+    if max_keys is not None:
+        if max_keys < 1:
+            raise ValueError('max_keys should be positive, got {}'.format(max_keys))
+        elif partitions < 1:
+            raise ValueError('partitions should be positive, got {}'.format(partitions))
+        elif combine is None:
+            if initial is not _MISSING:
+                raise ValueError('combine is required to spill accumulators with initial')
+            combine = reducer
+    accumulators = {}
+    get = accumulators.get
+    files = None  # partitions' temporary files once spilled
+    async for chunk in _chunks(aiter(aiterable)):
+        for value in chunk:
+            k = key(value)
+            accumulator = get(k, _MISSING)
+            if accumulator is not _MISSING:
+                accumulators[k] = reducer(accumulator, value)
+                continue
+            # Note: len is never equal to max_keys=None:
+            if len(accumulators) == max_keys:
+                files = _spill(accumulators, files or [None] * partitions, 0)
+            accumulators[k] = value if initial is _MISSING else reducer(initial, value)
+    if max_keys is None:
+        return accumulators
+    elif files is None:
+        return _Aggregates(accumulators, [], combine, max_keys, partitions)
+    return _Aggregates({}, _spill(accumulators, files, 0), combine, max_keys, partitions)
+
+
+def _spill(accumulators, files, level):
+    """Append (key, accumulator) pairs to files by partition of key, clear accumulators.
+
+    Partition is level's digit of key's hash in base of number of partitions, so pairs of single
+    partition are spread over partitions of the next level. Files are created once partition
+    gets its first pair (None before), return files.
+    """
+    partitions = len(files)
+    divisor = partitions ** level
+    buckets = [[] for _ in range(partitions)]
+    for pair in accumulators.items():
+        buckets[hash(pair[0]) // divisor % partitions].append(pair)
+    accumulators.clear()
+    for i, pairs in enumerate(buckets):
+        if pairs:
+            if files[i] is None:
+                files[i] = tempfile.TemporaryFile()
+            pickle.dump(pairs, files[i], pickle.HIGHEST_PROTOCOL)
+    return files
+
+
+class _Aggregates(AsyncIterator):
+    """(key, accumulator) pairs of aggregate_by, merged partition by partition if spilled."""
+    __slots__ = ('_items', '_pending', '_combine', '_max_keys', '_partitions')
+
+    def __init__(self, accumulators, files, combine, max_keys, partitions):
+        self._items = iter(accumulators.items())
+        # Stack of partitions' files not merged yet and levels to spill them again with:
+        self._pending = [(1, file) for file in reversed(files) if file is not None]
+        self._combine, self._max_keys, self._partitions = combine, max_keys, partitions
+
+    async def __anext__(self):
+        while True:
+            item = next(self._items, None)
+            if item is not None:
+                return item
+            elif not self._pending:
+                raise StopAsyncIteration()
+            self._items = iter(self._merge(*self._pending.pop()).items())
+
+    def _merge(self, level, file):
+        combine, max_keys = self._combine, self._max_keys
+        # Keys of partition can't be split anymore, all digits of their hashes are used:
+        if self._partitions == 1 or self._partitions ** level > 1 << 64:
+            max_keys = None
+        merged = {}
+        get = merged.get
+        files = None  # partitions of the next level once partition is spilled again
+        with file:
+            for k, accumulator in _load_pairs(file):
+                previous = get(k, _MISSING)
+                if previous is not _MISSING:
+                    merged[k] = combine(previous, accumulator)
+                    continue
+                if len(merged) == max_keys:
+                    files = _spill(merged, files or [None] * self._partitions, level)
+                merged[k] = accumulator
+        if files is not None:
+            # Pairs of the same key are appended in order, so they're combined in order:
+            _spill(merged, files, level)
+            self._pending.extend((level + 1, file) for file in reversed(files) if file is not None)
+        return merged
+
+
+def _load_pairs(file):
+    """Yield spilled (key, accumulator) pairs in order they were spilled."""
+    file.seek(0)
+    while True:
+        try:
+            pairs = pickle.load(file)
+        except EOFError:
+            return
+        yield from pairs
+
+
 def aiter(*args) -> AsyncIterator:
     """Note: aiter expect first arg coroutine function if two arguments passed."""
     if len(args) == 1:
@@ -58,15 +502,7 @@ def aiter(*args) -> AsyncIterator:
         return aiterable.__aiter__()
     elif len(args) == 2:
         coro_func, sentinel, *_ = args
-        @agenerator
-        async def iterator():
-            while True:
-                res = await coro_func()
-                if res != sentinel:
-                    await async_yield(res)
-                else:
-                    break
-        return iterator()
+        return _CallableAsyncIterator(coro_func, sentinel)
     else:
         raise TypeError(
             '{fname} expected at most {most} arguments, got {got}'
@@ -74,33 +510,439 @@ def aiter(*args) -> AsyncIterator:
         )
 
 
+class _CallableAsyncIterator(AsyncIterator):
+    """Async iterator of aiter(coro_func, sentinel)."""
+    __slots__ = ('_coro_func', '_sentinel')
+
+    def __init__(self, coro_func, sentinel):
+        self._coro_func, self._sentinel = coro_func, sentinel
+
+    async def __anext__(self):
+        coro_func = self._coro_func
+        if coro_func is not None:
+            res = await coro_func()
+            if res != self._sentinel:
+                return res
+            self._coro_func = None
+        raise StopAsyncIteration()
+
+
+class aiter_from_sync(AsyncIterator):
+    """Async iterator of blocking iterable iterated in dedicated thread.
+
+    Thread takes values by batches of batch values and passes every batch
+    to event loop with single call_soon_threadsafe, waiting while buffer batches
+    are not taken yet. aclose (or garbage collection) stops thread once it got
+    value it's waiting for, thread closes iterator if it has close.
+    Use it to pass blocking iterables (files, DB cursors) to azip, amap and others.
+    """
+    __slots__ = ('_iterable', '_batch', '_buffer', '_feed')
+
+    def __init__(self, iterable: Iterable, batch: int=256, buffer: int=4):
+        if batch < 1:
+            raise ValueError('batch should be positive, got {}'.format(batch))
+        if buffer < 1:
+            raise ValueError('buffer should be positive, got {}'.format(buffer))
+        self._iterable = iterable  # None once thread started or iterator closed
+        self._batch, self._buffer = batch, buffer
+        self._feed = None
+
+    def __del__(self):
+        feed = getattr(self, '_feed', None)
+        if feed is not None:
+            feed.stop()
+
+    async def __anext__(self):
+        feed = self._feed if self._feed is not None else self._start()
+        index = feed.index
+        if index == len(feed.items):
+            await feed.refill()
+            index = 0
+        feed.index = index + 1
+        return feed.items[index]
+
+    async def __anext_batch__(self, max_items):
+        feed = self._feed if self._feed is not None else self._start()
+        index = feed.index
+        if index == len(feed.items):
+            await feed.refill()
+            index = 0
+        feed.index = min(index + max_items, len(feed.items))
+        return feed.items[index:feed.index]
+
+    async def aclose(self):
+        """Stop thread and wait for it to finish."""
+        self._iterable = None
+        if self._feed is not None:
+            self._feed.stop()
+            await self._feed.finish()
+
+    def _start(self):
+        if self._iterable is None:
+            raise StopAsyncIteration()
+        self._feed = _SyncFeed(aio.get_event_loop(), self._iterable, self._batch, self._buffer)
+        self._iterable = None
+        return self._feed
+
+
+class _SyncFeed:
+    """Batches of aiter_from_sync passed from its thread to event loop.
+
+    Thread doesn't reference aiter_from_sync, so it can be garbage collected.
+    """
+    def __init__(self, loop, iterable, batch, buffer):
+        self.loop = loop
+        self.items, self.index = [], 0  # batch being taken and index of next value
+        self.batches = deque()  # batches passed by thread
+        self.error = None  # exception iterable raised
+        self.finished = False  # thread finished
+        self.waiter = None  # consumer waits for batch or thread finished
+        self.space = threading.Semaphore(buffer)  # batches thread can pass without waiting
+        self.stopped = threading.Event()
+        thread = threading.Thread(target=self._run, args=(iterable, batch), daemon=True)
+        thread.start()
+
+    async def refill(self):
+        """Take next batch passed by thread, raise StopAsyncIteration if there're no more."""
+        while not self.batches:
+            if self.finished:
+                self.items, self.index = [], 0
+                if self.error is not None:
+                    error, self.error = self.error, None
+                    raise error
+                raise StopAsyncIteration()
+            await self._wait()
+        self.items, self.index = self.batches.popleft(), 0
+        self.space.release()
+
+    def stop(self):
+        self.stopped.set()
+        self.batches.clear()
+        self.items, self.index = [], 0
+        # Let thread waiting for space see it's stopped:
+        self.space.release()
+
+    async def finish(self):
+        while not self.finished:
+            await self._wait()
+
+    async def _wait(self):
+        self.waiter = self.loop.create_future()
+        try:
+            await self.waiter
+        finally:
+            self.waiter = None
+
+    def _wakeup(self):
+        waiter = self.waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _on_batch(self, batch):
+        if not self.stopped.is_set():
+            self.batches.append(batch)
+            self._wakeup()
+
+    def _on_finished(self, error):
+        self.finished = True
+        if not self.stopped.is_set():
+            self.error = error
+        self._wakeup()
+
+    # Runs in thread:
+    def _run(self, iterable, batch):
+        iterator, error = None, None
+        try:
+            iterator = iter(iterable)
+            while not self.stopped.is_set():
+                values = list(islice(iterator, batch))
+                if values:
+                    self.space.acquire()
+                    if self.stopped.is_set():
+                        break
+                    self._post(self._on_batch, values)
+                if len(values) < batch:
+                    break
+            # Stopped before exhausted:
+            if self.stopped.is_set() and hasattr(iterator, 'close'):
+                iterator.close()
+        except BaseException as exc:
+            error = exc
+        finally:
+            self._post(self._on_finished, error)
+
+    def _post(self, callback, *args):
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+        # Event loop is closed already:
+        except RuntimeError:
+            pass
+
+
 async def alist(aiterable: AsyncIterable) -> Awaitable[List]:
-    d = deque()
-    d_append = d.append
-    async for element in aiterable:
-        d_append(element)
-    return list(d)
+    aiterator = aiter(aiterable)
+    batches = _batches(aiterator)
+    if batches is not None:
+        result = []
+        result_extend = result.extend
+        async for batch in batches:
+            result_extend(batch)
+        return result
+    result = []
+    result_append = result.append
+    async for element in aiterator:
+        result_append(element)
+    return result
 
 
-@agenerator
-async def amap(function: Callable, *iterables: List[Union[Iterable, AsyncIterable]]) -> AsyncIterator:
+class amap(AsyncIterator):
     """Note: amap supports both iterables and aiterables."""
-    async for args in azip(*iterables):
-        await async_yield(function(*args))
+    __slots__ = ('_function', '_anext', '_star')
+
+    def __init__(self, function: Callable, *iterables: List[Union[Iterable, AsyncIterable]]):
+        self._function = function
+        # Single aiterable doesn't need azip:
+        self._star = len(iterables) != 1 or isinstance(iterables[0], Iterable)
+        if self._star:
+            self._anext = azip(*iterables).__anext__
+        else:
+            self._anext = aiter(iterables[0]).__anext__
+
+    async def __anext__(self):
+        if self._star:
+            return self._function(*(await self._anext()))
+        return self._function(await self._anext())
+
+
+class amap_concurrent(AsyncIterator):
+    """Like amap for coroutine function, but runs up to limit calls concurrently.
+
+    Arguments are taken from iterables only when there's room for another call.
+    With ordered=True results come in order of arguments, otherwise in order calls finished.
+    Call's exception is raised to consumer in place of call's result; it, consumer's
+    cancellation or aclose cancel calls still running, iterator is exhausted after that.
+    Note: amap_concurrent supports both iterables and aiterables.
+    """
+    __slots__ = ('_coro_func', '_anext', '_limit', '_ordered', '_running', '_finished', '_waiter')
+
+    def __init__(
+            self, coro_func: Callable, *iterables: List[Union[Iterable, AsyncIterable]],
+            limit: int, ordered: bool=True
+    ):
+        if limit < 1:
+            raise ValueError('limit should be positive, got {}'.format(limit))
+        self._coro_func = coro_func
+        self._anext = azip(*iterables).__anext__  # None once arguments exhausted
+        self._limit, self._ordered = limit, ordered
+        self._running = deque()  # calls' tasks in order of arguments
+        self._finished = deque()  # finished tasks in order they finished (ordered=False only)
+        self._waiter = None  # consumer waits for call finished
+
+    async def __anext__(self):
+        try:
+            await self._fill()
+            running = self._running
+            if not running:
+                raise StopAsyncIteration()
+            elif self._ordered:
+                task = running[0]
+                while not task.done():
+                    await self._wait()
+                running.popleft()
+            else:
+                while not self._finished:
+                    await self._wait()
+                task = self._finished.popleft()
+                running.remove(task)
+            return task.result()
+        except StopAsyncIteration:
+            raise
+        except BaseException:
+            self._cancel()
+            raise
+
+    async def aclose(self):
+        """Cancel calls still running and wait for them to finish."""
+        tasks = self._cancel()
+        if tasks:
+            await aio.wait(tasks)
+
+    async def _fill(self):
+        # Start calls until limit reached:
+        running = self._running
+        while self._anext is not None and len(running) < self._limit:
+            try:
+                args = await self._anext()
+            except StopAsyncIteration:
+                self._anext = None
+                break
+            task = aio.ensure_future(self._coro_func(*args))
+            task.add_done_callback(self._on_done)
+            running.append(task)
+
+    async def _wait(self):
+        self._waiter = aio.get_event_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    def _on_done(self, task):
+        # Exception is raised to consumer or ignored when iterator cancelled:
+        if not task.cancelled():
+            task.exception()
+        # Tasks cancelled by _cancel aren't running anymore:
+        if not self._ordered and self._running:
+            self._finished.append(task)
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _cancel(self):
+        tasks = list(self._running)
+        for task in tasks:
+            task.cancel()
+        self._anext = None
+        self._running.clear()
+        self._finished.clear()
+        return tasks
+
+
+class amap_executor(AsyncIterator):
+    """Like amap, but calls function in executor (default one if None) by chunks of values.
+
+    Every chunksize values are passed to executor at once, so process pool pickles
+    single list per chunk. Up to max_pending chunks (twice number of CPUs by default)
+    are processed at once, values are taken from aiterable only when there's room
+    for another chunk. Results come in order of values, chunk's exception
+    is raised in place of its results and, as aclose does, cancels chunks still pending.
+    Note: with ProcessPoolExecutor function should be picklable (defined at module level).
+    """
+    __slots__ = (
+        '_func', '_aiterator', '_executor', '_chunksize', '_max_pending',
+        '_pending', '_results', '_index'
+    )
+
+    def __init__(
+            self, func: Callable, aiterable: AsyncIterable, executor=None,
+            chunksize: int=256, max_pending: int=None
+    ):
+        if chunksize < 1:
+            raise ValueError('chunksize should be positive, got {}'.format(chunksize))
+        if max_pending is None:
+            max_pending = 2 * (os.cpu_count() or 1)
+        elif max_pending < 1:
+            raise ValueError('max_pending should be positive, got {}'.format(max_pending))
+        self._func = func
+        self._aiterator = aiter(aiterable)  # None once values exhausted
+        self._executor, self._chunksize, self._max_pending = executor, chunksize, max_pending
+        self._pending = deque()  # futures of chunks' results in order of values
+        self._results, self._index = [], 0  # results of current chunk and index of next one
+
+    async def __anext__(self):
+        if self._index == len(self._results):
+            await self._next_chunk()
+        index = self._index
+        self._index = index + 1
+        return self._results[index]
+
+    async def __anext_batch__(self, max_items):
+        if self._index == len(self._results):
+            await self._next_chunk()
+        index = self._index
+        self._index = min(index + max_items, len(self._results))
+        return self._results[index:self._index]
+
+    async def aclose(self):
+        """Cancel pending chunks, chunks already processed by executor can't be interrupted though."""
+        futures = self._cancel()
+        if futures:
+            await aio.wait(futures)
+
+    async def _next_chunk(self):
+        try:
+            await self._fill()
+            if not self._pending:
+                raise StopAsyncIteration()
+            results = await self._pending[0]
+        except StopAsyncIteration:
+            raise
+        except BaseException:
+            self._cancel()
+            raise
+        self._pending.popleft()
+        self._results, self._index = results, 0
+
+    async def _fill(self):
+        # Pass chunks to executor until max_pending reached:
+        aiterator, pending = self._aiterator, self._pending
+        while aiterator is not None and len(pending) < self._max_pending:
+            chunk = await self._take(aiterator, self._chunksize)
+            if len(chunk) < self._chunksize:
+                aiterator = self._aiterator = None
+            if chunk:
+                loop = aio.get_event_loop()
+                pending.append(loop.run_in_executor(self._executor, _map_chunk, self._func, chunk))
+
+    @staticmethod
+    async def _take(aiterator, size):
+        chunk = []
+        anext_batch = getattr(aiterator, '__anext_batch__', None)
+        try:
+            while len(chunk) < size:
+                if anext_batch is not None:
+                    chunk.extend(await anext_batch(size - len(chunk)))
+                else:
+                    chunk.append(await aiterator.__anext__())
+        except StopAsyncIteration:
+            pass
+        return chunk
+
+    def _cancel(self):
+        futures = list(self._pending)
+        for future in futures:
+            future.cancel()
+        self._aiterator = None
+        self._pending.clear()
+        self._results, self._index = [], 0
+        return futures
+
+
+def _map_chunk(func, chunk):
+    """Function amap_executor calls in executor."""
+    return [func(value) for value in chunk]
 
 
 async def amax(*args, **kwargs) -> Awaitable:
+    """Note: amax reduces single aiterable without keeping its values."""
     if len(args) == 1:
-        args = (await alist(args[0]), )
+        return await _extreme(amax.__name__, max, operator.gt, args[0], **kwargs)
     return max(*args, **kwargs)
 
 
 async def amin(*args, **kwargs) -> Awaitable:
+    """Note: amin reduces single aiterable without keeping its values."""
     if len(args) == 1:
-        args = (await alist(args[0]), )
+        return await _extreme(amin.__name__, min, operator.lt, args[0], **kwargs)
     return min(*args, **kwargs)
 
 
+async def _extreme(fname, function, better, aiterable, *, key=None, default=_MISSING):
+    """Reduce aiterable with max/min batch by batch: first best value wins like in builtins."""
+    kwargs = {'key': key} if key is not None else {}
+    best = best_key = _MISSING
+    async for chunk in _chunks(aiter(aiterable)):
+        candidate = function(chunk, **kwargs)
+        candidate_key = key(candidate) if key is not None else candidate
+        if best is _MISSING or better(candidate_key, best_key):
+            best, best_key = candidate, candidate_key
+    if best is not _MISSING:
+        return best
+    elif default is not _MISSING:
+        return default
+    raise ValueError('{fname}() arg is an empty sequence'.format(fname=fname))
+
+
 async def anext(*args) -> Awaitable:
     if len(args) == 1:
         aiterator, *_ = args
@@ -121,37 +963,186 @@ async def anext(*args) -> Awaitable:
         )
 
 
+async def anlargest(n: int, aiterable: AsyncIterable, key: Callable=None) -> Awaitable[List]:
+    """Like heapq.nlargest: list of n largest values, keeps O(n) values at once."""
+    return await _nbest(heapq.nlargest, n, aiterable, key)
+
+
+async def ansmallest(n: int, aiterable: AsyncIterable, key: Callable=None) -> Awaitable[List]:
+    """Like heapq.nsmallest: list of n smallest values, keeps O(n) values at once."""
+    return await _nbest(heapq.nsmallest, n, aiterable, key)
+
+
+async def _nbest(function, n, aiterable, key):
+    # Best values found so far precede pending ones, so ties are resolved
+    # in favour of earlier values as in sorted(...)[:n]:
+    best, pending = [], []
+    pending_size = max(n, BATCH_SIZE)
+    async for chunk in _chunks(aiter(aiterable)):
+        pending.extend(chunk)
+        if len(pending) >= pending_size:
+            best = function(n, chain(best, pending), key=key)
+            pending = []
+    return function(n, chain(best, pending), key=key)
+
+
 async def aset(aiterable: AsyncIterable) -> Awaitable[Set]:
     return set(await alist(aiterable))
 
 
-async def asorted(aiterable: AsyncIterable, **kwargs) -> Awaitable[List]:
-    return sorted(await alist(aiterable), **kwargs)
+async def asorted(
+        aiterable: AsyncIterable, *, key: Callable=None, reverse: bool=False, max_memory_items: int=None
+) -> Awaitable[Union[List, AsyncIterator]]:
+    """Note: with max_memory_items asorted returns async iterator instead of list.
+
+    Values are sorted by runs of max_memory_items, every run but the last one
+    is spilled to temporary file. Returned async iterator merges runs
+    reading them back by blocks of BATCH_SIZE values (see amerge_sorted).
+    """
+    if max_memory_items is None:
+        return sorted(await alist(aiterable), key=key, reverse=reverse)
+    elif max_memory_items < 1:
+        raise ValueError('max_memory_items should be positive, got {}'.format(max_memory_items))
+    runs = []
+    pending = []
+    async for chunk in _chunks(aiter(aiterable)):
+        pending.extend(chunk)
+        while len(pending) >= max_memory_items:
+            run, pending = pending[:max_memory_items], pending[max_memory_items:]
+            run.sort(key=key, reverse=reverse)
+            runs.append(_SortedRun.spill(run))
+    pending.sort(key=key, reverse=reverse)
+    runs.append(_SortedRun(pending))
+    if len(runs) == 1:
+        return runs[0]
+    return amerge_sorted(*runs, key=key, reverse=reverse)
 
 
-async def asum(aiterable: AsyncIterable, *args) -> Awaitable:
-    return sum(await alist(aiterable), *args)
+class _SortedRun(AsyncIterator):
+    """Sorted values of asorted: kept in memory or read from temporary file by blocks."""
+    __slots__ = ('_block', '_index', '_file')
+
+    def __init__(self, block, file=None):
+        self._block, self._index, self._file = block, 0, file
+
+    @classmethod
+    def spill(cls, values):
+        file = tempfile.TemporaryFile()
+        for i in range(0, len(values), BATCH_SIZE):
+            pickle.dump(values[i:i + BATCH_SIZE], file, pickle.HIGHEST_PROTOCOL)
+        file.seek(0)
+        return cls([], file)
+
+    async def __anext__(self):
+        index = self._index
+        if index == len(self._block):
+            self._block, index = self._load(), 0
+        self._index = index + 1
+        return self._block[index]
+
+    def _load(self):
+        file = self._file
+        if file is not None:
+            try:
+                return pickle.load(file)
+            except EOFError:
+                file.close()
+                self._file = None
+        raise StopAsyncIteration()
+
+
+class amerge_sorted(AsyncIterator):
+    """Merge sorted aiterables lazily like heapq.merge.
+
+    Only single next value of every aiterable is kept, values equal by key
+    come in order of aiterables they're taken from.
+    """
+    __slots__ = ('_anexts', '_key', '_reverse', '_heap')
+
+    def __init__(self, *aiterables: List[AsyncIterable], key: Callable=None, reverse: bool=False):
+        self._anexts = [aiter(aiterable).__anext__ for aiterable in aiterables]
+        self._key, self._reverse = key, reverse
+        self._heap = None  # entries of (key, aiterable's order, value, __anext__)
+
+    async def __anext__(self):
+        heap = self._heap
+        # First value, take first value of every aiterable:
+        if heap is None:
+            heap = []
+            for order, anext_ in enumerate(self._anexts):
+                entry = await self._entry(order, anext_)
+                if entry is not None:
+                    heap.append(entry)
+            heapq.heapify(heap)
+            self._heap, self._anexts = heap, None
+        # Replace value returned last with next value of its aiterable:
+        elif heap:
+            _, order, _, anext_ = heap[0]
+            entry = await self._entry(order, anext_)
+            if entry is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, entry)
+        if not heap:
+            raise StopAsyncIteration()
+        return heap[0][2]
+
+    async def _entry(self, order, anext_):
+        try:
+            value = await anext_()
+        except StopAsyncIteration:
+            return None
+        key = self._key(value) if self._key is not None else value
+        return (_Reversed(key) if self._reverse else key), order, value, anext_
+
+
+class _Reversed:
+    """Key wrapper that inverts order, so heapq's min-heap gives max value first."""
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+async def asum(aiterable: AsyncIterable, start=0) -> Awaitable:
+    """Note: asum adds values batch by batch without keeping them."""
+    total = sum((), start)
+    async for chunk in _chunks(aiter(aiterable)):
+        total = sum(chunk, total)
+    return total
 
 
 async def atuple(aiterable: AsyncIterable) -> Awaitable[Tuple]:
     return tuple(await alist(aiterable))
 
 
-@agenerator
-async def azip(*iterables: List[Union[Iterable, AsyncIterable]]) -> AsyncIterator:
+class azip(AsyncIterator):
     """Note: azip supports both iterables and aiterables."""
-    iterators = [
-        iter(it) if isinstance(it, Iterable) else aiter(it)
-        for it in iterables
-    ]
-    sentinel = object()
-    while iterators:
-        result = deque()
-        for it in iterators:
-            elem = \
-                next(it, sentinel) if isinstance(it, Iterator) \
-                else await anext(it, sentinel)
-            if elem is sentinel:
-                return
-            result.append(elem)
-        await async_yield(tuple(result))
+    __slots__ = ('_steps',)
+
+    def __init__(self, *iterables: List[Union[Iterable, AsyncIterable]]):
+        # Pairs of (is async, __anext__ or __next__), None once any iterator exhausted:
+        self._steps = [
+            (False, iter(it).__next__) if isinstance(it, Iterable) else (True, aiter(it).__anext__)
+            for it in iterables
+        ] or None
+
+    async def __anext__(self):
+        steps = self._steps
+        if steps is None:
+            raise StopAsyncIteration()
+        result = []
+        result_append = result.append
+        try:
+            for is_async, step in steps:
+                result_append(await step() if is_async else step())
+        except (StopIteration, StopAsyncIteration):
+            self._steps = None
+            raise StopAsyncIteration() from None
+        return tuple(result)
@@ -14,6 +14,23 @@ class AContextDecorator:
         return inner
 
 
+class aclosing:
+    """Async context manager to aclose generator on block exit:
+
+    async with aclosing(gen()) as g:
+        async for val in g:
+            ...
+    """
+    def __init__(self, thing):
+        self.thing = thing
+
+    async def __aenter__(self):
+        return self.thing
+
+    async def __aexit__(self, *exc_info):
+        await self.thing.aclose()
+
+
 def acontextmanager(coro_func):
     @wraps(coro_func)
     def wrapper(*args, **kwargs):
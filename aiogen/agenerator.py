@@ -1,158 +1,811 @@
 from typing import AsyncIterator
 import asyncio as aio
 import sys
+import threading
+import weakref
+from abc import abstractmethod
 from functools import wraps
 
+from aiogen.ring import Ring
+
 
 class AsyncGeneratorExit(Exception):
     pass
 
 
-def agenerator(coro_func):
+ENGINES = ('task', 'native')
+
+# Bytes idle (not yet iterated) generator takes on 64-bit CPython,
+# including tuple and dict of arguments it was created with:
+IDLE_GENERATOR_SIZE = 256
+
+# Shared instead of empty dict of keyword arguments (empty dict takes 240 bytes on 3.5 and 3.6):
+_NO_KWARGS = {}
+
+
+def agenerator(coro_func=None, *, engine='task', prefetch=None):
+    """Decorate coroutine function to create asynchronous generator.
+
+    engine='task' runs generator's coroutine in separate asyncio Task,
+    engine='native' steps it directly inside consumer's task like PEP 525 generator does.
+    prefetch=N lets task engine's coroutine run up to N values ahead of consumer
+    (see PrefetchingAsyncGenerator).
+    Can be used both as @agenerator and @agenerator(engine=..., prefetch=...).
+    """
+    if engine not in ENGINES:
+        raise ValueError('unknown agenerator engine: {!r}'.format(engine))
+    if prefetch is not None and engine != 'task':
+        raise ValueError('prefetch is supported only by task engine')
+    if prefetch is not None and prefetch < 1:
+        raise ValueError('prefetch should be positive, got {}'.format(prefetch))
+    if coro_func is None:
+        return lambda coro_func: agenerator(coro_func, engine=engine, prefetch=prefetch)
+    if prefetch is not None:
+        @wraps(coro_func)
+        def prefetching_wrapper(*args, **kwargs):
+            return PrefetchingAsyncGenerator(coro_func, args, kwargs, prefetch)
+        return prefetching_wrapper
     @wraps(coro_func)
     def wrapper(*args, **kwargs):
-        class AsyncGenerator(AsyncIterator):
-            def __init__(self):
-                self._task = None
-                self._loop = aio.get_event_loop()
-                self._incoming = aio.Future()  # incoming = async_yield()
-                self._outcoming = aio.Future()  # async_yield(outcoming)
-
-            def __aiter__(self):
-                return self
-
-            async def __anext__(self):
-                return await self.asend(None)
-
-            async def asend(self, incoming):
-                # First incoming value is not None:
-                if self._task is None and incoming is not None:
-                    raise TypeError('can\'t send non-None value to a just-started generator')
-                # First incoming value, start generator:
-                elif self._task is None:
-                    self._task = aio.ensure_future(coro_func(*args, **kwargs))
-                    self._task._gen = self
-                    # On outer done, we should start task to close generator:
-                    cleanup_done = aio.Event()
-                    async def cleanup():
-                        try:
-                            await self.aclose()
-                        except Exception as exc:
-                            # Emulate exception inside __del__,
-                            # see: http://stackoverflow.com/a/18637081/1113207
-                            print('Exception ignored in: {}'.format(self), file=sys.stderr)
-                            print('{!r}'.format(exc), file=sys.stderr)
-                            # Since we'll see warning, no need to keep task pending:
-                            if not self._task.done():
-                                self._task.set_result(None)
-                        finally:
-                            cleanup_done.set()
-                    outer = aio.Task.current_task()
-                    outer.add_done_callback(lambda _: aio.ensure_future(cleanup()))
-                    # We should sure cleanup done before event loop closed:
-                    def waiting_cleanup(func):
-                        @wraps(func)
-                        def wrapper(*args, **kwargs):
-                            self._loop.run_until_complete(cleanup_done.wait())
-                            return func(*args, **kwargs)
-                        return wrapper
-                    self._loop.close = waiting_cleanup(self._loop.close)
-                # Gen closed, raise StopAsyncIteration:
-                elif self._task.done():
-                    raise StopAsyncIteration()
-                # Set incoming value:
-                else:
-                    self._incoming.set_result(incoming)
-                # Wait for next step:
-                return await self._next_step()
-
-            async def athrow(self, exc_type, exc_val=None, exc_tb=None):
-                if exc_val is None and exc_tb is None:
-                    exc = exc_type
-                elif exc_val is None:
-                    exc = exc_type()
-                else:
-                    exc = exc_val
-                if exc_tb is not None:
-                    exc = exc.with_traceback(exc_tb)
-                # First incoming exception, create gen with exception:
-                if self._task is None:
-                    self._task = aio.Future()
-                    self._task.set_exception(exc)
-                # Gen closed, just raise:
-                elif self._task.done():
+        return generator_type(coro_func, args, kwargs)
+    generator_type = NativeAsyncGenerator if engine == 'native' else AsyncGenerator
+    return wrapper
+
+
+class _AsyncGeneratorBase(AsyncIterator):
+    """Asynchronous generator's methods shared by all engines.
+
+    Generator only keeps coroutine function and its arguments until first asend/athrow,
+    idle generator allocates nothing else (see IDLE_GENERATOR_SIZE). Started generator
+    keeps engine's state that never references generator itself: once generator
+    is garbage collected, its state is closed (see _Registry).
+    """
+    __slots__ = ('_coro_func', '_args', '_kwargs', '_state', '__weakref__')
+
+    def __init__(self, coro_func, args, kwargs):
+        self._coro_func, self._args, self._kwargs = coro_func, args, kwargs or _NO_KWARGS
+        self._state = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.asend(None)
+
+    async def asend(self, incoming):
+        state = self._state
+        # First incoming value is not None:
+        if state is None and incoming is not None:
+            raise TypeError('can\'t send non-None value to a just-started generator')
+        # First incoming value, start generator:
+        elif state is None:
+            state = self._begin()
+        # Values of async_yield_many are left:
+        elif state.items is not None:
+            return state.pop_item()
+        return await _resume(state, incoming, None)
+
+    async def athrow(self, exc_type, exc_val=None, exc_tb=None):
+        exc = _make_exception(exc_type, exc_val, exc_tb)
+        # First incoming exception, close gen with exception:
+        if self._state is None:
+            self._state = _FINISHED
+            if isinstance(exc, AsyncGeneratorExit):
+                raise StopAsyncIteration()
+            raise exc
+        state = self._state
+        state.items = None
+        return await _resume(state, None, exc)
+
+    async def aclose(self):
+        try:
+            await self.athrow(AsyncGeneratorExit())
+        except (AsyncGeneratorExit, StopAsyncIteration):
+            pass
+        else:
+            raise RuntimeError("generator ignored AsyncGeneratorExit")
+
+    async def __anext_batch__(self, max_items):
+        """Return list of at most max_items next values.
+
+        Values passed with async_yield_many are returned all at once,
+        while single async_yield results in single value list.
+        """
+        batch = [await self.asend(None)]
+        if max_items > 1:
+            batch.extend(self._state.take(max_items - 1))
+        return batch
+
+    def _begin(self):
+        """Return generator's state, starting generator if it wasn't started yet."""
+        if self._state is None:
+            loop = aio.get_event_loop()
+            self._state = self._start(loop, self._coro_func(*self._args, **self._kwargs))
+            _registry(loop).add(self, self._state)
+        return self._state
+
+    @abstractmethod
+    def _start(self, loop, coro):
+        """Return engine's state running coro."""
+
+
+class AsyncGenerator(_AsyncGeneratorBase):
+    """Asynchronous generator that runs decorated coroutine in separate asyncio Task."""
+    __slots__ = ()
+
+    def _start(self, loop, coro):
+        return _Channel(loop, coro)
+
+
+class NativeAsyncGenerator(_AsyncGeneratorBase):
+    """Asynchronous generator that steps decorated coroutine inside consumer's task.
+
+    Like PEP 525 generator, async_yield suspends coroutine and passes value
+    straight to awaiting asend/athrow: no Task or Future is created per generator or per value.
+    """
+    __slots__ = ()
+
+    def _start(self, loop, coro):
+        return _NativeFrame(loop, coro)
+
+
+class PrefetchingAsyncGenerator(_AsyncGeneratorBase):
+    """Asynchronous generator which task runs ahead of consumer into bounded ring buffer.
+
+    async_yield returns None right away while buffer has free space, otherwise
+    waits for consumer to take value. Values can't be sent to generator (asend accepts None only),
+    exception thrown with athrow drops buffered values and raised inside generator
+    at its next async_yield (or raised back if generator finishes before).
+    """
+    __slots__ = ('_prefetch',)
+
+    def __init__(self, coro_func, args, kwargs, prefetch):
+        super().__init__(coro_func, args, kwargs)
+        self._prefetch = prefetch
+
+    def _start(self, loop, coro):
+        return _Prefetch(loop, coro, self._prefetch)
+
+
+class _State:
+    """State of started generator: its coroutine, values of async_yield_many left
+    and states of generators it delegates to with async_yield_from (see _resume).
+    """
+    __slots__ = ('loop', 'coro', 'items', 'index', 'delegates')
+
+    def __init__(self, loop, coro):
+        self.loop, self.coro = loop, coro
+        self.items = None
+        self.index = 0
+        self.delegates = None
+
+    def pop_item(self):
+        items, index = self.items, self.index
+        self.index = index + 1
+        if self.index == len(items):
+            self.items = None
+        return items[index]
+
+    def take(self, max_items):
+        """Return list of at most max_items values available without resuming generator."""
+        items, index = self.items, self.index
+        if items is None:
+            return []
+        self.index = index + max_items
+        if self.index >= len(items):
+            self.items = None
+        return items[index:index + max_items]
+
+
+class _Finished(_State):
+    """State of generator closed before it was started."""
+    __slots__ = ()
+
+    async def asend(self, incoming):
+        raise StopAsyncIteration()
+
+    async def athrow(self, exc):
+        raise exc
+
+    def done(self):
+        return True
+
+
+_FINISHED = _Finished(None, None)
+
+
+class _Channel(_State):
+    """State of started AsyncGenerator: handoff between consumer and producer task.
+
+    Each async_yield wakes consumer's waiter and producer waits for single incoming future,
+    so value costs constant number of loop callbacks.
+    """
+    __slots__ = ('task', 'waiter', 'incoming', 'pending', 'kept')
+
+    def __init__(self, loop, coro):
+        super().__init__(loop, coro)
+        self.waiter = None  # consumer waits for async_yield or task done
+        self.incoming = None  # producer waits for asend/athrow
+        self.pending = None  # exception to throw at producer's next async_yield
+        self.kept = None  # (outcoming,) of async_yield happened while consumer didn't wait
+        self.task = loop.create_task(_produce(self, coro))
+        self.task.add_done_callback(self._on_done)
+
+    async def asend(self, incoming):
+        # Gen closed, raise StopAsyncIteration:
+        if self.task.done():
+            raise StopAsyncIteration()
+        # Value yielded after await of previous asend was cancelled:
+        elif self.kept is not None:
+            kept, self.kept = self.kept, None
+            return kept[0]
+        # Set incoming value (if it's not first step and producer isn't running already):
+        elif self.incoming is not None and not self.incoming.done():
+            self.incoming.set_result(incoming)
+        # Wait for next step:
+        return await self._next_step()
+
+    async def athrow(self, exc):
+        # Gen closed, just raise:
+        if self.task.done():
+            raise exc
+        # Producer is running (asend waiting for it was cancelled), throw at next async_yield:
+        elif self.incoming is None or self.incoming.done():
+            self.pending = exc
+        # Set incoming exception (thrown at kept value's async_yield if there's one):
+        else:
+            self.kept = None
+            self.incoming.set_exception(exc)
+        # Wait for next step:
+        return await self._next_step()
+
+    def done(self):
+        return self.task.done()
+
+    def abandon(self):
+        if not self.task.done():
+            self.task.cancel()
+
+    def wakeup(self, outcoming):
+        waiter = self.waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(outcoming)
+        # Consumer's await was cancelled, keep value for next asend:
+        elif outcoming is not _DONE:
+            self.kept = (outcoming,)
+
+    def _on_done(self, task):
+        _registry(self.loop).discard(self)
+        self.wakeup(_DONE)
+
+    async def _next_step(self):
+        # Wait for next outcoming value (async_yield) or task complete:
+        if not self.task.done():
+            waiter = self.waiter = self.loop.create_future()
+            try:
+                outcoming = await waiter
+            finally:
+                # Cancelled asend's cleanup may run after next asend set its own waiter:
+                if self.waiter is waiter:
+                    self.waiter = None
+            # async_yield happened:
+            if outcoming is not _DONE:
+                return outcoming
+        _raise_finished(self.task)
+
+
+class _Prefetch(_State):
+    """State of started PrefetchingAsyncGenerator: ring buffer filled by producer task."""
+    __slots__ = ('task', 'ring', 'waiter', 'space', 'pending', 'finished')
+
+    def __init__(self, loop, coro, prefetch):
+        super().__init__(loop, coro)
+        self.ring = Ring(prefetch)
+        self.waiter = None  # consumer waits for value when ring is empty
+        self.space = None  # producer waits for free space when ring is full
+        self.pending = None  # exception to throw at producer's next async_yield
+        self.finished = False
+        self.task = loop.create_task(_prefetch(self, coro))
+        self.task.add_done_callback(self._on_done)
+
+    async def asend(self, incoming):
+        if incoming is not None:
+            raise TypeError('can\'t send non-None value to a prefetching generator')
+        while True:
+            if self.ring:
+                value = self.ring.pop()
+                self._wakeup_producer()
+                return value
+            elif self.finished:
+                raise StopAsyncIteration()
+            elif self.task.done():
+                self.finished = True
+                if self.pending is not None:
+                    exc, self.pending = self.pending, None
+                    _retrieve(self.task)
                     raise exc
-                # Set incoming exception:
-                else:
-                    self._incoming.set_exception(exc)
-                # Wait for next step:
-                return await self._next_step()
-
-            async def aclose(self):
-                try:
-                    await self.athrow(AsyncGeneratorExit())
-                except (AsyncGeneratorExit, StopAsyncIteration):
-                    pass
-                else:
-                    raise RuntimeError("generator ignored AsyncGeneratorExit")
-
-            async def _next_step(self):
-                # Wait for next outcoming value (async_yield) or task complete:
-                await aio.wait([self._outcoming, self._task], return_when=aio.FIRST_COMPLETED)
-                # async_yield happened:
-                if self._outcoming.done():
+                _raise_finished(self.task)
+            waiter = self.waiter = self.loop.create_future()
+            try:
+                await waiter
+            finally:
+                # Cancelled asend's cleanup may run after next asend set its own waiter:
+                if self.waiter is waiter:
+                    self.waiter = None
+
+    async def athrow(self, exc):
+        self.ring.clear()
+        if self.finished or self.task.done():
+            self.finished = True
+            _retrieve(self.task)
+            raise exc
+        self.pending = exc
+        self._wakeup_producer()
+        return await self.asend(None)
+
+    def take(self, max_items):
+        values = self.ring.pop_many(max_items)
+        if values:
+            self._wakeup_producer()
+        return values
+
+    def done(self):
+        return self.finished or self.task.done()
+
+    def abandon(self):
+        if not self.task.done():
+            self.task.cancel()
+
+    def wakeup(self):
+        waiter = self.waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _wakeup_producer(self):
+        space = self.space
+        if space is not None and not space.done():
+            space.set_result(None)
+
+    def _on_done(self, task):
+        _registry(self.loop).discard(self)
+        self.wakeup()
+
+
+class _NativeFrame(_State):
+    """State of started NativeAsyncGenerator: its coroutine stepped inside consumer's task."""
+    __slots__ = ('closed', 'running')
+
+    def __init__(self, loop, coro):
+        super().__init__(loop, coro)
+        self.closed = False
+        self.running = False
+
+    def asend(self, incoming):
+        return _NativeStep(self, incoming, None)
+
+    def athrow(self, exc):
+        return _NativeStep(self, None, exc)
+
+    def done(self):
+        return self.closed
+
+    def abandon(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                self.coro.close()
+            except RuntimeError:
+                pass
+
+
+class _Yield:
+    """Awaitable that suspends generator's coroutine at async_yield."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __await__(self):
+        return (yield self)
+
+
+class _YieldMany:
+    """Awaitable that suspends generator's coroutine at async_yield_many."""
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __await__(self):
+        return (yield self)
+
+
+class _Delegate:
+    """Awaitable that suspends generator's coroutine at async_yield_from."""
+    __slots__ = ('gen',)
+
+    def __init__(self, gen):
+        self.gen = gen
+
+    def __await__(self):
+        return (yield self)
+
+
+# Object producer task finished with, see _Channel._next_step:
+_DONE = object()
+
+# State of generator which coroutine is being stepped in current thread:
+_stepping = threading.local()
+
+
+def _advance(state, coro, value, exc):
+    """Step generator's coroutine until next async_yield and return yielded value.
+
+    Everything coroutine awaits except _Yield, _YieldMany and _Delegate is passed to running task as is,
+    _YieldMany and _Delegate are returned themselves.
+    On coroutine finish raises StopAsyncIteration (or exception coroutine raised).
+    """
+    while True:
+        previous, _stepping.state = getattr(_stepping, 'state', None), state
+        try:
+            if exc is None:
+                res = coro.send(value)
+            else:
+                res = coro.throw(exc)
+        # Generator finished successfully:
+        except StopIteration as stop:
+            raise StopAsyncIteration(stop.value) from None
+        # Generator finished with AsyncGeneratorExit:
+        except AsyncGeneratorExit:
+            raise StopAsyncIteration() from None
+        finally:
+            _stepping.state = previous
+        # async_yield happened:
+        if type(res) is _Yield:
+            return res.value
+        elif type(res) is _YieldMany or type(res) is _Delegate:
+            return res
+        # Coroutine awaits something else, let running task handle it:
+        try:
+            value, exc = (yield res), None
+        except GeneratorExit:
+            coro.close()
+            raise
+        except BaseException as e:
+            value, exc = None, e
+
+
+async def _resume(state, value, exc):
+    """Send value (or throw exception) to generator and return its next value.
+
+    Like yield from, async_yield_from makes generator's state remember generator
+    it delegates to, so value is passed between consumer and innermost delegate
+    directly, however deep delegation is. Delegate's return value (or exception)
+    is sent to generator that delegated to it once delegate finished.
+    """
+    while True:
+        delegates = state.delegates
+        level = delegates[-1] if delegates else state
+        try:
+            if exc is None:
+                outcoming = await level.asend(value)
+            else:
+                outcoming = await level.athrow(exc)
+        except BaseException as e:
+            # Consumer's error or delegate is still running (consumer was cancelled):
+            if level is state or not level.done():
+                raise
+            delegates.pop()
+            # Delegate was closed, close generator that delegated to it:
+            if isinstance(exc, AsyncGeneratorExit) and isinstance(e, StopAsyncIteration):
+                pass
+            # Delegate returned, send its return value:
+            elif isinstance(e, StopAsyncIteration):
+                value, exc = e.args[0] if e.args else None, None
+            else:
+                value, exc = None, e
+            continue
+        # Delegate ignored AsyncGeneratorExit:
+        if isinstance(exc, AsyncGeneratorExit) and level is not state:
+            delegates.pop()
+            value, exc = None, RuntimeError("generator ignored AsyncGeneratorExit")
+            continue
+        value, exc = None, None
+        if type(outcoming) is _Delegate:
+            _delegate(state, outcoming.gen._begin())
+            # Values of delegate's async_yield_many are left:
+            if state.items is not None:
+                return state.pop_item()
+        elif type(outcoming) is _YieldMany:
+            # Skip empty async_yield_many, keep other values for next steps:
+            items = outcoming.items
+            if items:
+                if len(items) > 1:
+                    state.items, state.index = items, 1
+                return items[0]
+        else:
+            return outcoming
+
+
+def _delegate(state, level):
+    """Make generator's state delegate to state of another generator."""
+    if state.delegates is None:
+        state.delegates = []
+    state.delegates.append(level)
+    # Delegate's own delegates are now driven by generator:
+    if level.delegates:
+        state.delegates.extend(level.delegates)
+        level.delegates = None
+    if level.items is not None:
+        state.items, state.index = level.items, level.index
+        level.items = None
+    # Delegate is closed along with generator, see _aclose:
+    if level.loop is not None:
+        _registry(level.loop).discard(level)
+
+
+class _NativeStep:
+    """Awaitable that runs NativeAsyncGenerator's coroutine until next async_yield."""
+    __slots__ = ('_frame', '_value', '_exc')
+
+    def __init__(self, frame, value, exc):
+        self._frame, self._value, self._exc = frame, value, exc
+
+    def __await__(self):
+        frame = self._frame
+        # Gen closed, raise StopAsyncIteration or just raise exception:
+        if frame.closed:
+            raise self._exc if self._exc is not None else StopAsyncIteration()
+        elif frame.running:
+            raise RuntimeError('asynchronous generator is already running')
+        frame.running = True
+        try:
+            return (yield from _advance(frame, frame.coro, self._value, self._exc))
+        except BaseException:
+            frame.closed = True
+            _registry(frame.loop).discard(frame)
+            raise
+        finally:
+            frame.running = False
+
+
+class _Producer:
+    """Awaitable that runs AsyncGenerator's coroutine inside generator's task."""
+    __slots__ = ('_channel', '_coro')
+
+    def __init__(self, channel, coro):
+        self._channel, self._coro = channel, coro
+
+    def __await__(self):
+        channel, coro = self._channel, self._coro
+        value, exc = None, None
+        while True:
+            outcoming = yield from _advance(channel, coro, value, exc)
+            # Consumer threw exception while coroutine was running:
+            if channel.pending is not None:
+                value, exc, channel.pending = None, channel.pending, None
+                continue
+            # Pass outcoming value to consumer and wait for next incoming value:
+            channel.incoming = incoming = channel.loop.create_future()
+            channel.wakeup(outcoming)
+            try:
+                value, exc = (yield from incoming), None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as e:
+                value, exc = None, e
+
+
+async def _produce(channel, coro):
+    return await _Producer(channel, coro)
+
+
+class _Prefetcher:
+    """Awaitable that runs PrefetchingAsyncGenerator's coroutine pushing values to ring."""
+    __slots__ = ('_state', '_coro')
+
+    def __init__(self, state, coro):
+        self._state, self._coro = state, coro
+
+    def __await__(self):
+        state, coro, ring = self._state, self._coro, self._state.ring
+        exc = None
+        while True:
+            outcoming = yield from _advance(state, coro, None, exc)
+            values = outcoming.items if type(outcoming) is _YieldMany else (outcoming,)
+            for value in values:
+                # Wait for free space unless consumer threw exception:
+                while ring.full() and state.pending is None:
+                    state.space = space = state.loop.create_future()
                     try:
-                        return self._outcoming.result()
+                        yield from space
+                    except GeneratorExit:
+                        coro.close()
+                        raise
+                    except BaseException as e:
+                        state.pending = e
                     finally:
-                        self._outcoming = aio.Future()
-                # Generator was cancelled:
-                elif self._task.cancelled():
-                    raise aio.CancelledError()
-                # Generator finished with AsyncGeneratorExit:
-                elif isinstance(self._task.exception(), AsyncGeneratorExit):
-                    raise StopAsyncIteration()
-                # Generator finished with exception:
-                elif self._task.exception():
-                    raise self._task.exception()
-                # Generator finished successfully:
-                else:
-                    raise StopAsyncIteration(self._task.result())
-        return AsyncGenerator()
-    return wrapper
+                        state.space = None
+                if state.pending is not None:
+                    break
+                ring.push(value)
+                state.wakeup()
+            exc, state.pending = state.pending, None
+
+
+async def _prefetch(state, coro):
+    return await _Prefetcher(state, coro)
+
+
+def _raise_finished(task):
+    """Raise exception generator's task finished with to consumer."""
+    # Generator was cancelled:
+    if task.cancelled():
+        raise aio.CancelledError()
+    # Generator finished with AsyncGeneratorExit:
+    elif isinstance(task.exception(), AsyncGeneratorExit):
+        raise StopAsyncIteration()
+    # Generator finished with exception (StopAsyncIteration if finished successfully):
+    else:
+        raise task.exception()
+
+
+def _retrieve(task):
+    """Mark exception of finished task retrieved, since it won't be raised to consumer."""
+    if not task.cancelled():
+        task.exception()
+
+
+def _make_exception(exc_type, exc_val=None, exc_tb=None):
+    if exc_val is None and exc_tb is None:
+        exc = exc_type
+    elif exc_val is None:
+        exc = exc_type()
+    else:
+        exc = exc_val
+    if exc_tb is not None:
+        exc = exc.with_traceback(exc_tb)
+    return exc
+
+
+def _running_loop():
+    get_running_loop = getattr(aio, '_get_running_loop', None)
+    return get_running_loop() if get_running_loop is not None else None
+
+
+class _GeneratorRef(weakref.ref):
+    """Weak reference to started generator that keeps generator's state."""
+    __slots__ = ('state',)
+
+    def __new__(cls, gen, callback, state):
+        self = super().__new__(cls, gen, callback)
+        self.state = state
+        return self
+
+    def __init__(self, gen, callback, state):
+        super().__init__(gen, callback)
+
+
+class _Registry:
+    """Started but unfinished generators of single event loop.
+
+    Generators are tracked weakly and forgotten once finished, so registry's
+    size (and shutdown_agenerators' work) depends only on generators still alive.
+    Generator garbage collected before finished is closed in separate task right away.
+    """
+    def __init__(self):
+        self._live = {}  # generator's state: weak reference to generator
+        self._closing = set()  # tasks closing generators
+
+    def __len__(self):
+        return len(self._live) + len(self._closing)
+
+    def add(self, gen, state):
+        self._live[state] = _GeneratorRef(gen, self._collected, state)
+
+    def discard(self, state):
+        self._live.pop(state, None)
+
+    def close(self, state):
+        """Start closing generator's state in separate task."""
+        task = state.loop.create_task(_aclose(state))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _collected(self, ref):
+        state = ref.state
+        if self._live.pop(state, None) is None or state.loop.is_closed():
+            return
+        # Garbage collector may run in any thread:
+        if _running_loop() is state.loop:
+            self.close(state)
+        else:
+            state.loop.call_soon_threadsafe(self.close, state)
+
+    async def shutdown(self):
+        while self._live:
+            state, _ = self._live.popitem()
+            self.close(state)
+        if self._closing:
+            await aio.gather(*self._closing)
+
+
+_registries = weakref.WeakKeyDictionary()  # event loop: _Registry
+
+
+def _registry(loop):
+    try:
+        return _registries[loop]
+    except KeyError:
+        registry = _registries[loop] = _Registry()
+        return registry
+
+
+async def _aclose(state):
+    state.items = None
+    try:
+        await _resume(state, None, AsyncGeneratorExit())
+    except (AsyncGeneratorExit, StopAsyncIteration):
+        return
+    except Exception as exc:
+        error = exc
+    else:
+        error = RuntimeError("generator ignored AsyncGeneratorExit")
+    # Emulate exception inside __del__,
+    # see: http://stackoverflow.com/a/18637081/1113207
+    print('Exception ignored in: {!r}'.format(state.coro), file=sys.stderr)
+    print('{!r}'.format(error), file=sys.stderr)
+    # Since we've shown warning, no need to keep generator pending:
+    state.abandon()
+
+
+async def shutdown_agenerators(loop=None):
+    """Close all started but unfinished generators of event loop concurrently.
+
+    Like loop.shutdown_asyncgens should be called before event loop closed:
+    loop.run_until_complete(shutdown_agenerators(loop))
+    """
+    loop = loop if loop is not None else aio.get_event_loop()
+    registry = _registries.get(loop)
+    if registry is not None:
+        await registry.shutdown()
 
 
 async def async_yield(outcoming=None):
-    # Get generator:
-    task = aio.Task.current_task()
-    if not hasattr(task, '_gen'):
+    if getattr(_stepping, 'state', None) is None:
         raise RuntimeError('async_yield outside agenerator')
-    self = task._gen
-    # Set outcoming value:
-    self._outcoming.set_result(outcoming)
-    # Wait for next incoming value:
-    try:
-        return await self._incoming
-    finally:
-        self._incoming = aio.Future()
+    return await _Yield(outcoming)
+
+
+async def async_yield_many(iterable):
+    """Yield all values of iterable with single handoff to consumer.
+
+    Consumer gets values one by one (or all at once with __anext_batch__),
+    generator resumes after the last one was taken. Returns value sent with asend
+    that resumed generator, values sent before are ignored.
+    """
+    if getattr(_stepping, 'state', None) is None:
+        raise RuntimeError('async_yield_many outside agenerator')
+    return await _YieldMany(iterable if type(iterable) is list else list(iterable))
 
 
 async def async_yield_from(gen):
-    # Get generator:
-    task = aio.Task.current_task()
-    if not hasattr(task, '_gen'):
+    """Yield all values of gen and return its return value.
+
+    Delegation to another agenerator makes consumer pass values to it directly
+    (except inside prefetching generator, which runs ahead of consumer).
+    """
+    state = getattr(_stepping, 'state', None)
+    if state is None:
         raise RuntimeError('async_yield_from outside agenerator')
-    self = task._gen
+    elif isinstance(gen, _AsyncGeneratorBase) and type(state) is not _Prefetch:
+        return await _Delegate(gen)
     # Pass values from generator to current generator:
     try:
         incoming = None
         while True:
             outcoming = await gen.asend(incoming)
-            # Set outcoming value:
-            self._outcoming.set_result(outcoming)
-            # Wait for next incoming value:
-            try:
-                incoming = await self._incoming
-            finally:
-                self._incoming = aio.Future()
+            incoming = await _Yield(outcoming)
     except StopAsyncIteration as exc:
         return exc.args[0]
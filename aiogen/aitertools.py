@@ -0,0 +1,751 @@
+from typing import Union, Callable, Iterable, Sequence, Tuple, AsyncIterable, AsyncIterator
+from collections import deque
+import asyncio as aio
+import heapq
+import operator
+
+from aiogen.abuiltins import aiter, _aclose
+from aiogen.ring import Ring
+
+
+__all__ = (
+    'aaccumulate', 'achain', 'acompress', 'acount', 'adropwhile', 'agroupby',
+    'aislice', 'amerge', 'apairwise', 'apartition', 'arepeat', 'astarmap', 'atakewhile', 'atee',
+)
+
+
+def _classify(iterable: Union[Iterable, AsyncIterable]):
+    """Return pair of (is async, iterator) for iterable or aiterable."""
+    if isinstance(iterable, Iterable):
+        return False, iter(iterable)
+    return True, aiter(iterable)
+
+
+class _Stage(AsyncIterator):
+    """Async iterator taking values of single upstream aiterable.
+
+    aclose closes upstream (if it supports aclose), stage is exhausted after that.
+    """
+    __slots__ = ('_aiterator', '_anext')
+
+    def __init__(self, aiterable: AsyncIterable):
+        self._aiterator = aiter(aiterable)
+        self._anext = self._aiterator.__anext__
+
+    async def aclose(self):
+        if self._anext is not None:
+            self._anext = None
+            await _aclose(self._aiterator)
+
+    async def _finish(self):
+        # Upstream's values aren't needed anymore, let it stop producing them:
+        await self.aclose()
+        raise StopAsyncIteration()
+
+
+class achain(AsyncIterator):
+    """Note: achain supports both iterables and aiterables."""
+    __slots__ = ('_sources', '_current')
+
+    def __init__(self, *iterables: Union[Iterable, AsyncIterable]):
+        self._sources = _classify(iterables)
+        self._current = None  # pair of (is async, iterator) of current iterable
+
+    @classmethod
+    def from_iterable(cls, iterables: Union[Iterable, AsyncIterable]) -> 'achain':
+        """Note: iterables itself can be iterable or aiterable."""
+        self = cls()
+        self._sources = _classify(iterables)
+        return self
+
+    async def __anext__(self):
+        while True:
+            current = self._current
+            if current is not None:
+                is_async, it = current
+                try:
+                    return (await it.__anext__()) if is_async else next(it)
+                except (StopIteration, StopAsyncIteration):
+                    self._current = None
+            is_async, sources = self._sources
+            try:
+                iterable = (await sources.__anext__()) if is_async else next(sources)
+            except (StopIteration, StopAsyncIteration):
+                raise StopAsyncIteration() from None
+            self._current = _classify(iterable)
+
+    async def aclose(self):
+        """Close current aiterable (if it supports aclose), achain is exhausted after that."""
+        current = self._current
+        self._current, self._sources = None, (False, iter(()))
+        if current is not None and current[0]:
+            await _aclose(current[1])
+
+
+class amerge(AsyncIterator):
+    """Values of aiterables in order they're ready.
+
+    Every source has single pending __anext__ call, next one is made only once its value
+    was taken, so ready sources are served in order they got ready and chatty source
+    can't starve quiet one. With max_concurrent only that many sources are iterated at once,
+    next source is started when one is exhausted. With priority (number per aiterable)
+    ready sources of lower priority go first, sources of equal priority take turns.
+    Source's exception is raised to consumer; it, consumer's cancellation or aclose
+    cancel pending calls and close all sources, iterator is exhausted after that.
+    Note: task engine agenerator keeps running after its pending call is cancelled,
+    so it's closed at its next async_yield.
+    """
+    __slots__ = (
+        '_waiting', '_running', '_ready', '_active', '_max_concurrent', '_priority', '_order', '_waiter'
+    )
+
+    def __init__(self, *aiterables: AsyncIterable, max_concurrent: int=None, priority: Sequence=None):
+        if max_concurrent is not None and max_concurrent < 1:
+            raise ValueError('max_concurrent should be positive, got {}'.format(max_concurrent))
+        if priority is not None:
+            priority = tuple(priority)
+            if len(priority) != len(aiterables):
+                raise ValueError(
+                    'priority should have value per aiterable, got {} for {}'
+                    .format(len(priority), len(aiterables))
+                )
+        self._waiting = deque(enumerate(aiterables))  # pairs of (index, aiterable) not started yet
+        self._running = {}  # pending __anext__ calls' tasks to pairs of (index, aiterator)
+        # Triples of (task, index, aiterator) in order tasks finished or
+        # heap of (priority, order, task, index, aiterator) with priority:
+        self._ready = deque() if priority is None else []
+        self._active = 0  # number of sources started and not exhausted
+        self._max_concurrent, self._priority = max_concurrent, priority
+        self._order = 0  # number of tasks finished, keeps heap FIFO for equal priorities
+        self._waiter = None  # consumer waits for task finished
+
+    async def __anext__(self):
+        try:
+            self._start()
+            ready = self._ready
+            while True:
+                if not ready:
+                    if not self._running:
+                        raise StopAsyncIteration()
+                    await self._wait()
+                    continue
+                if self._priority is None:
+                    task, index, aiterator = ready.popleft()
+                else:
+                    _, _, task, index, aiterator = heapq.heappop(ready)
+                try:
+                    value = task.result()
+                except StopAsyncIteration:
+                    self._active -= 1
+                    self._start()
+                    continue
+                except BaseException:
+                    # Others are closed below:
+                    await _aclose(aiterator)
+                    raise
+                self._request(index, aiterator)
+                return value
+        except StopAsyncIteration:
+            raise
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        """Cancel pending calls and close all sources (which support aclose)."""
+        running, self._running = self._running, {}
+        sources = [aiterator for _, aiterator in running.values()]
+        sources.extend(entry[-1] for entry in self._ready)
+        sources.extend(aiterable for _, aiterable in self._waiting)
+        self._ready.clear()
+        self._waiting.clear()
+        self._active = 0
+        for task in running:
+            task.cancel()
+        if running:
+            await aio.wait(list(running))
+        if sources:
+            await aio.gather(*(_aclose(source) for source in sources))
+
+    def _start(self):
+        # Start sources until max_concurrent reached:
+        waiting, max_concurrent = self._waiting, self._max_concurrent
+        while waiting and (max_concurrent is None or self._active < max_concurrent):
+            index, aiterable = waiting.popleft()
+            self._active += 1
+            self._request(index, aiter(aiterable))
+
+    def _request(self, index, aiterator):
+        task = aio.ensure_future(aiterator.__anext__())
+        task.add_done_callback(self._on_done)
+        self._running[task] = (index, aiterator)
+
+    async def _wait(self):
+        self._waiter = aio.get_event_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    def _on_done(self, task):
+        # Exception is raised to consumer or ignored when iterator closed:
+        if not task.cancelled():
+            task.exception()
+        source = self._running.pop(task, None)
+        # Tasks cancelled by aclose aren't running anymore:
+        if source is None:
+            return
+        index, aiterator = source
+        if self._priority is None:
+            self._ready.append((task, index, aiterator))
+        else:
+            heapq.heappush(self._ready, (self._priority[index], self._order, task, index, aiterator))
+            self._order += 1
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+
+class aislice(_Stage):
+    """Note: aislice closes upstream right after its last value was taken."""
+    __slots__ = ('_index', '_next', '_stop', '_step')
+
+    def __init__(self, aiterable: AsyncIterable, *args):
+        if not 1 <= len(args) <= 3:
+            raise TypeError(
+                '{fname} expected at most {most} arguments, got {got}'
+                .format(fname=aislice.__name__, most=4, got=len(args) + 1)
+            )
+        s = slice(*args)
+        start = s.start if s.start is not None else 0
+        step = s.step if s.step is not None else 1
+        if start < 0 or (s.stop is not None and s.stop < 0):
+            raise ValueError('Indices for aislice() must be None or an integer: 0 <= x <= sys.maxsize.')
+        if step < 1:
+            raise ValueError('Step for aislice() must be a positive integer or None.')
+        super().__init__(aiterable)
+        self._index = 0  # index of upstream's next value
+        self._next, self._stop, self._step = start, s.stop, step
+
+    async def __anext__(self):
+        anext_ = self._anext
+        if anext_ is None:
+            raise StopAsyncIteration()
+        elif self._stop is not None and self._next >= self._stop:
+            await self._finish()
+        # Skip values between returned ones:
+        while self._index < self._next:
+            await anext_()
+            self._index += 1
+        value = await anext_()
+        self._index += 1
+        self._next += self._step
+        if self._stop is not None and self._next >= self._stop:
+            await self.aclose()
+        return value
+
+
+class atakewhile(_Stage):
+    """Note: atakewhile closes upstream right after predicate failed."""
+    __slots__ = ('_predicate',)
+
+    def __init__(self, predicate: Callable, aiterable: AsyncIterable):
+        super().__init__(aiterable)
+        self._predicate = predicate
+
+    async def __anext__(self):
+        anext_ = self._anext
+        if anext_ is None:
+            raise StopAsyncIteration()
+        value = await anext_()
+        if self._predicate(value):
+            return value
+        await self._finish()
+
+
+class adropwhile(_Stage):
+    __slots__ = ('_predicate',)
+
+    def __init__(self, predicate: Callable, aiterable: AsyncIterable):
+        super().__init__(aiterable)
+        self._predicate = predicate
+
+    async def __anext__(self):
+        anext_ = self._anext
+        if anext_ is None:
+            raise StopAsyncIteration()
+        predicate = self._predicate
+        if predicate is None:
+            return await anext_()
+        while True:
+            value = await anext_()
+            if not predicate(value):
+                self._predicate = None
+                return value
+
+
+class acompress(_Stage):
+    """Note: selectors can be iterable or aiterable, data is closed once selectors are exhausted."""
+    __slots__ = ('_selectors',)
+
+    def __init__(self, data: AsyncIterable, selectors: Union[Iterable, AsyncIterable]):
+        super().__init__(data)
+        self._selectors = _classify(selectors)
+
+    async def __anext__(self):
+        anext_ = self._anext
+        if anext_ is None:
+            raise StopAsyncIteration()
+        is_async, selectors = self._selectors
+        while True:
+            value = await anext_()
+            try:
+                selector = (await selectors.__anext__()) if is_async else next(selectors)
+            except (StopIteration, StopAsyncIteration):
+                await self._finish()
+            if selector:
+                return value
+
+
+# Value not taken yet (no initial value of aaccumulate, no previous value of apairwise, no key of agroupby):
+_MISSING = object()
+
+
+class aaccumulate(_Stage):
+    __slots__ = ('_func', '_total')
+
+    def __init__(self, aiterable: AsyncIterable, func: Callable=operator.add, *, initial=None):
+        super().__init__(aiterable)
+        self._func = func if func is not None else operator.add
+        self._total = _MISSING if initial is None else _Initial(initial)
+
+    async def __anext__(self):
+        total = self._total
+        # Initial value goes first:
+        if type(total) is _Initial:
+            self._total = total.value
+            return total.value
+        anext_ = self._anext
+        if anext_ is None:
+            raise StopAsyncIteration()
+        value = await anext_()
+        total = self._total = value if total is _MISSING else self._func(total, value)
+        return total
+
+
+class _Initial:
+    """Initial value of aaccumulate not returned yet."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class apairwise(_Stage):
+    __slots__ = ('_previous',)
+
+    def __init__(self, aiterable: AsyncIterable):
+        super().__init__(aiterable)
+        self._previous = _MISSING
+
+    async def __anext__(self):
+        anext_ = self._anext
+        if anext_ is None:
+            raise StopAsyncIteration()
+        previous = self._previous
+        if previous is _MISSING:
+            previous = await anext_()
+        value = self._previous = await anext_()
+        return previous, value
+
+
+class agroupby(_Stage):
+    """Like itertools.groupby: pairs of (key, group) for every run of values with the same key.
+
+    Group is async iterator taking its values from upstream lazily, so no values are kept
+    (input is expected to be sorted by key). Group is exhausted once the next pair is taken.
+    """
+    __slots__ = ('_key', '_target', '_current', '_value', '_group')
+
+    def __init__(self, aiterable: AsyncIterable, key: Callable=None):
+        super().__init__(aiterable)
+        self._key = key
+        self._target = self._current = _MISSING  # key of the last group and key of value
+        self._value = None  # the last value taken
+        self._group = None  # the last group
+
+    async def __anext__(self):
+        self._group = None
+        # Skip values of the last group:
+        while self._current == self._target:
+            await self._take()
+        self._target = self._current
+        self._group = _Group(self, self._target)
+        return self._target, self._group
+
+    async def _take(self):
+        anext_ = self._anext
+        if anext_ is None:
+            raise StopAsyncIteration()
+        try:
+            value = await anext_()
+        except StopAsyncIteration:
+            self._anext = None
+            raise
+        self._value = value
+        self._current = self._key(value) if self._key is not None else value
+
+
+class _Group(AsyncIterator):
+    __slots__ = ('_groups', '_key', '_started')
+
+    def __init__(self, groups, key):
+        self._groups, self._key = groups, key  # groups is None once group is exhausted
+        self._started = False
+
+    async def __anext__(self):
+        groups = self._groups
+        if groups is None or groups._group is not self:
+            raise StopAsyncIteration()
+        # The first value was taken by agroupby already:
+        if self._started:
+            try:
+                await groups._take()
+            except StopAsyncIteration:
+                self._groups = None
+                raise
+        self._started = True
+        if groups._current != self._key:
+            self._groups = None
+            raise StopAsyncIteration()
+        return groups._value
+
+
+class astarmap(_Stage):
+    __slots__ = ('_function',)
+
+    def __init__(self, function: Callable, aiterable: AsyncIterable):
+        super().__init__(aiterable)
+        self._function = function
+
+    async def __anext__(self):
+        anext_ = self._anext
+        if anext_ is None:
+            raise StopAsyncIteration()
+        return self._function(*(await anext_()))
+
+
+class acount(AsyncIterator):
+    __slots__ = ('_n', '_step')
+
+    def __init__(self, start=0, step=1):
+        self._n, self._step = start, step
+
+    async def __anext__(self):
+        n = self._n
+        self._n = n + self._step
+        return n
+
+
+class arepeat(AsyncIterator):
+    __slots__ = ('_object', '_times')
+
+    def __init__(self, object, times: int=None):
+        self._object = object
+        self._times = max(times, 0) if times is not None else None
+
+    async def __anext__(self):
+        times = self._times
+        if times is not None:
+            if not times:
+                raise StopAsyncIteration()
+            self._times = times - 1
+        return self._object
+
+
+def atee(aiterable: AsyncIterable, n: int=2, max_lag: int=1024) -> Tuple[AsyncIterator, ...]:
+    """Return n independent async iterators of aiterable's values.
+
+    Upstream's __anext__ is called once per value for all iterators (or __anext_batch__
+    once per batch) and values are kept in single ring buffer until the slowest
+    iterator took them; iterator max_lag values ahead of the slowest one waits for it.
+    Upstream's exception is raised by every iterator in place of its next value.
+    Closed (or garbage collected) iterator doesn't hold others back, upstream is closed
+    once all iterators were closed with aclose.
+    """
+    if n < 0:
+        raise ValueError('n must be >= 0')
+    if max_lag < 1:
+        raise ValueError('max_lag should be positive, got {}'.format(max_lag))
+    tee = _Tee(aiter(aiterable), max_lag)
+    return tuple(_TeeIterator(tee, key) for key in range(n))
+
+
+class _Tee:
+    """Upstream and values buffered for atee's iterators."""
+    __slots__ = ('aiterator', 'ring', 'start', 'positions', 'fetching', 'waiters', 'error')
+
+    def __init__(self, aiterator, max_lag):
+        self.aiterator = aiterator
+        self.ring = Ring(max_lag)
+        self.start = 0  # upstream's index of ring's oldest value
+        self.positions = {}  # iterators' keys to upstream's index of their next value
+        self.fetching = False  # some iterator waits for upstream's value
+        self.waiters = []  # futures iterators wait for ring's change with
+        self.error = None  # upstream's exception, StopAsyncIteration once exhausted
+
+    async def take(self, key, max_items):
+        """Return up to max_items values starting at iterator's position."""
+        ring = self.ring
+        while True:
+            position = self.positions[key]
+            index = position - self.start
+            available = len(ring) - index
+            if available:
+                values = [ring[i] for i in range(index, index + min(available, max_items))]
+                self.advance(key, position + len(values))
+                return values
+            elif self.error is not None:
+                if isinstance(self.error, StopAsyncIteration):
+                    raise StopAsyncIteration()
+                raise self.error
+            # Another iterator fetches value or this one is max_lag values ahead:
+            elif self.fetching or ring.full():
+                await self._wait()
+            else:
+                await self._fetch()
+
+    def advance(self, key, position):
+        previous = self.positions[key]
+        self.positions[key] = position
+        if previous == self.start:
+            self._release()
+
+    def detach(self, key):
+        """Forget iterator, so it doesn't hold others back."""
+        if self.positions.pop(key, None) is not None:
+            self._release()
+
+    async def _fetch(self):
+        ring, aiterator = self.ring, self.aiterator
+        self.fetching = True
+        try:
+            anext_batch = getattr(aiterator, '__anext_batch__', None)
+            if anext_batch is not None:
+                values = await anext_batch(ring.capacity - len(ring))
+            else:
+                values = (await aiterator.__anext__(),)
+            for value in values:
+                ring.push(value)
+        except aio.CancelledError:
+            # Iterator was cancelled, another one will fetch value:
+            raise
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.fetching = False
+            self._notify()
+
+    def _release(self):
+        # Free values the slowest iterator passed:
+        ring = self.ring
+        slowest = min(self.positions.values()) if self.positions else self.start + len(ring)
+        if slowest > self.start:
+            for _ in range(slowest - self.start):
+                ring.pop()
+            self.start = slowest
+            self._notify()
+
+    async def _wait(self):
+        waiter = aio.get_event_loop().create_future()
+        self.waiters.append(waiter)
+        await waiter
+
+    def _notify(self):
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class _TeeIterator(AsyncIterator):
+    __slots__ = ('_tee', '_key')
+
+    def __init__(self, tee, key):
+        self._tee, self._key = tee, key  # tee is None once closed
+        tee.positions[key] = 0
+
+    def __del__(self):
+        tee = getattr(self, '_tee', None)
+        if tee is not None:
+            tee.detach(self._key)
+
+    async def __anext__(self):
+        tee = self._tee
+        if tee is None:
+            raise StopAsyncIteration()
+        # Value is buffered already:
+        position = tee.positions[self._key]
+        index = position - tee.start
+        if index < len(tee.ring):
+            value = tee.ring[index]
+            tee.advance(self._key, position + 1)
+            return value
+        return (await tee.take(self._key, 1))[0]
+
+    async def __anext_batch__(self, max_items):
+        tee = self._tee
+        if tee is None:
+            raise StopAsyncIteration()
+        return await tee.take(self._key, max_items)
+
+    async def aclose(self):
+        """Stop taking values, upstream is closed (if it supports aclose) with the last iterator."""
+        tee, self._tee = self._tee, None
+        if tee is not None:
+            tee.detach(self._key)
+            if not tee.positions:
+                await _aclose(tee.aiterator)
+
+
+def apartition(
+        aiterable: AsyncIterable, key: Callable, n: int, worker: Callable=None, buffer: int=64
+) -> Union[AsyncIterator, Tuple[AsyncIterator, ...]]:
+    """Route aiterable's values to n partitions by hash of key(value).
+
+    Without worker return n async iterators of partitions' values. With worker (coroutine
+    function) return async iterator of its results: partition's values are passed to worker
+    one by one, partitions run concurrently and their results are merged in order
+    they're ready (see amerge), so values of the same key are processed in order.
+    Every partition keeps up to buffer values, once value's partition is full upstream
+    isn't iterated until it has free space, so the slowest partition holds back
+    reading upstream. Values of closed partition are dropped, upstream is closed
+    once all partitions were closed with aclose.
+    """
+    if n < 1:
+        raise ValueError('n should be positive, got {}'.format(n))
+    if buffer < 1:
+        raise ValueError('buffer should be positive, got {}'.format(buffer))
+    partitions = _Partitions(aiter(aiterable), key, n, buffer)
+    iterators = tuple(_Partition(partitions, index) for index in range(n))
+    if worker is None:
+        return iterators
+    return amerge(*(_PartitionWorker(iterator, worker) for iterator in iterators))
+
+
+class _Partitions:
+    """Upstream and values buffered for apartition's partitions."""
+    __slots__ = ('aiterator', 'key', 'buffer', 'rings', 'held', 'pulling', 'waiters', 'error')
+
+    def __init__(self, aiterator, key, n, buffer):
+        self.aiterator = aiterator
+        self.key, self.buffer = key, buffer
+        self.rings = [Ring(buffer) for _ in range(n)]  # None for closed partitions
+        self.held = deque()  # pairs of (partition's index, value) waiting for free space
+        self.pulling = False  # some partition waits for upstream's value
+        self.waiters = []  # futures partitions wait for values with
+        self.error = None  # upstream's exception, StopAsyncIteration once exhausted
+
+    async def take(self, index):
+        ring = self.rings[index]
+        while True:
+            if ring:
+                value = ring.pop()
+                if self.held:
+                    self._release()
+                return value
+            elif self.held or self.pulling:
+                await self._wait()
+            elif self.error is not None:
+                if isinstance(self.error, StopAsyncIteration):
+                    raise StopAsyncIteration()
+                raise self.error
+            else:
+                await self._pull()
+
+    async def close(self, index):
+        """Drop partition's values, close upstream if it was the last one."""
+        self.rings[index] = None
+        self._release()
+        if not any(ring is not None for ring in self.rings):
+            await _aclose(self.aiterator)
+
+    async def _pull(self):
+        aiterator, held = self.aiterator, self.held
+        self.pulling = True
+        try:
+            anext_batch = getattr(aiterator, '__anext_batch__', None)
+            if anext_batch is not None:
+                values = await anext_batch(self.buffer)
+            else:
+                values = (await aiterator.__anext__(),)
+            key, n = self.key, len(self.rings)
+            for value in values:
+                held.append((hash(key(value)) % n, value))
+        except aio.CancelledError:
+            raise
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.pulling = False
+            self._release()
+            self._notify()
+
+    def _release(self):
+        # Move held values to partitions in order, until some partition is full:
+        held, rings = self.held, self.rings
+        moved = False
+        while held:
+            index, value = held[0]
+            ring = rings[index]
+            if ring is not None:
+                if ring.full():
+                    break
+                ring.push(value)
+                moved = True
+            held.popleft()
+        if moved:
+            self._notify()
+
+    async def _wait(self):
+        waiter = aio.get_event_loop().create_future()
+        self.waiters.append(waiter)
+        await waiter
+
+    def _notify(self):
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class _Partition(AsyncIterator):
+    __slots__ = ('_partitions', '_index')
+
+    def __init__(self, partitions, index):
+        self._partitions, self._index = partitions, index  # partitions is None once closed
+
+    async def __anext__(self):
+        partitions = self._partitions
+        if partitions is None:
+            raise StopAsyncIteration()
+        return await partitions.take(self._index)
+
+    async def aclose(self):
+        partitions, self._partitions = self._partitions, None
+        if partitions is not None:
+            await partitions.close(self._index)
+
+
+class _PartitionWorker(AsyncIterator):
+    """Results of apartition's worker for partition's values."""
+    __slots__ = ('_partition', '_worker')
+
+    def __init__(self, partition, worker):
+        self._partition, self._worker = partition, worker
+
+    async def __anext__(self):
+        return await self._worker(await self._partition.__anext__())
+
+    async def aclose(self):
+        await self._partition.aclose()
@@ -0,0 +1,272 @@
+from typing import AsyncIterable, AsyncIterator
+import asyncio as aio
+import heapq
+import weakref
+
+from aiogen.abuiltins import aiter, _aclose
+
+
+__all__ = ('Hub',)
+
+
+_POLICIES = frozenset(('block', 'drop_oldest', 'latest_only'))
+
+
+class Hub:
+    """Broadcast of source aiterable's values to subscribers joining and leaving at any time.
+
+    Source is iterated by single task (started with the first subscription) once for all
+    subscribers, and its values are kept in single log shared by them: every subscriber
+    only keeps its position there, so value costs the same however many subscribers
+    there are. Subscriber gets values came after it subscribed, its policy decides what
+    happens when it's buffer values behind:
+
+    - 'block' holds source (and so all subscribers) back until subscriber takes value;
+    - 'drop_oldest' skips oldest values, so subscriber stays buffer values behind;
+    - 'latest_only' skips all values but the latest one (buffer is ignored).
+
+    Source isn't iterated while there're no subscribers. Source's exception is raised by
+    subscribers after values they didn't take yet, as end of source is. Once hub and
+    its subscribers are garbage collected, source's task is cancelled and source is closed.
+
+        hub = Hub(decode(feed))
+        async for quote in hub.subscribe(buffer=100, policy='drop_oldest'):
+            await websocket.send(quote)
+    """
+    __slots__ = ('_state',)
+
+    def __init__(self, source: AsyncIterable):
+        self._state = _HubState(source)
+
+    def __del__(self):
+        state = getattr(self, '_state', None)
+        if state is not None:
+            state.stop()
+
+    def subscribe(self, buffer: int=64, policy: str='block') -> AsyncIterator:
+        """Return async iterator of source's values, aclose (or garbage collection) unsubscribes it."""
+        if policy not in _POLICIES:
+            raise ValueError('policy should be one of {}, got {!r}'.format(sorted(_POLICIES), policy))
+        if policy == 'latest_only':
+            buffer = 1
+        elif buffer < 1:
+            raise ValueError('buffer should be positive, got {}'.format(buffer))
+        return self._state.subscribe(self, buffer, policy == 'block')
+
+    async def aclose(self):
+        """Stop iterating source and close it, subscribers are exhausted after values they didn't take."""
+        await self._state.aclose()
+
+
+class _HubState:
+    """Source's values shared by Hub's subscribers.
+
+    Source's task only references state, not Hub, so Hub can be garbage collected.
+    """
+    __slots__ = (
+        '_source', '_iterator', '_task', '_log', '_offset', '_start', '_capacity', '_buffers',
+        '_count', '_blocking', '_order', '_waiters', '_pump_waiter', '_finished', '_error'
+    )
+
+    def __init__(self, source):
+        self._source = source
+        self._iterator = None  # source's async iterator once started
+        self._task = None  # task iterating source
+        self._log, self._offset = [], 0  # source's values and index of the oldest one still kept
+        self._start = 0  # source's index of the oldest value kept
+        self._capacity = 0  # number of values kept (the biggest subscriber's buffer)
+        self._buffers = {}  # subscribers' buffer sizes to their number
+        self._count = 0  # number of subscribers
+        self._blocking = []  # heap of (index source waits for, order, subscriber's weakref)
+        self._order = 0  # number of 'block' subscriptions, keeps heap entries comparable
+        self._waiters = []  # futures subscribers wait for values with
+        self._pump_waiter = None  # source's task waits for subscriber or free space
+        self._finished = False
+        self._error = None  # source's exception
+
+    def subscribe(self, hub, buffer, blocking):
+        subscriber = _Subscriber(self, hub, buffer, blocking)
+        self._count += 1
+        self._buffers[buffer] = self._buffers.get(buffer, 0) + 1
+        self._capacity = max(self._capacity, buffer)
+        if subscriber._blocking:
+            self._order += 1
+            heapq.heappush(self._blocking, (self._end() + buffer, self._order, weakref.ref(subscriber)))
+        if self._task is None and not self._finished:
+            self._task = aio.ensure_future(self._pump())
+        self._wakeup_pump()
+        return subscriber
+
+    async def aclose(self):
+        task, self._task = self._task, None
+        if not self._finished:
+            self._finished = True
+            self._notify()
+            # Cancelled task closes source itself:
+            if task is not None:
+                task.cancel()
+                await aio.wait((task,))
+            else:
+                await _aclose(self._source)
+
+    def stop(self):
+        """Cancel source's task without waiting for it (source isn't closed if it wasn't iterated)."""
+        task, self._task = self._task, None
+        if not self._finished:
+            self._finished = True
+            self._notify()
+            if task is not None:
+                task.cancel()
+
+    def _end(self):
+        # Source's index of the next value:
+        return self._start + len(self._log) - self._offset
+
+    async def _pump(self):
+        self._iterator = aiter(self._source)
+        anext_batch = getattr(self._iterator, '__anext_batch__', None)
+        try:
+            while True:
+                room = self._room()
+                if not room:
+                    self._pump_waiter = aio.get_event_loop().create_future()
+                    try:
+                        await self._pump_waiter
+                    finally:
+                        self._pump_waiter = None
+                    continue
+                if anext_batch is not None:
+                    values = await anext_batch(room)
+                else:
+                    values = (await self._iterator.__anext__(),)
+                self._append(values)
+        except StopAsyncIteration:
+            pass
+        except aio.CancelledError:
+            await _aclose(self._iterator)
+            raise
+        except Exception as exc:
+            self._error = exc
+        finally:
+            self._finished = True
+            self._notify()
+
+    def _room(self):
+        """Return number of values source can be asked for: 0 without subscribers or free space."""
+        if not self._count:
+            return 0
+        # The slowest 'block' subscriber limits source:
+        blocking = self._blocking
+        while blocking:
+            index, order, ref = blocking[0]
+            subscriber = ref()
+            if subscriber is None or subscriber._hub is None:
+                heapq.heappop(blocking)
+                continue
+            # Entry's index is updated only when it comes first:
+            actual = subscriber._position + subscriber._buffer
+            if actual != index:
+                heapq.heapreplace(blocking, (actual, order, ref))
+                continue
+            return min(index - self._end(), self._capacity)
+        return self._capacity
+
+    def _append(self, values):
+        log = self._log
+        log.extend(values)
+        # Forget values nobody can take anymore:
+        excess = len(log) - self._offset - self._capacity
+        if excess > 0:
+            self._offset += excess
+            self._start += excess
+            if self._offset > max(self._capacity, 1024):
+                del log[:self._offset]
+                self._offset = 0
+        self._notify()
+
+    def _unsubscribe(self, subscriber):
+        self._count -= 1
+        buffers, buffer = self._buffers, subscriber._buffer
+        buffers[buffer] -= 1
+        if not buffers[buffer]:
+            del buffers[buffer]
+            if buffer == self._capacity:
+                self._capacity = max(buffers, default=0)
+        if subscriber._blocking:
+            self._wakeup_pump()
+
+    def _notify(self):
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _wakeup_pump(self):
+        waiter = self._pump_waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+
+class _Subscriber(AsyncIterator):
+    __slots__ = ('_hub', '_owner', '_buffer', '_blocking', '_position', 'dropped', '__weakref__')
+
+    def __init__(self, hub, owner, buffer, blocking):
+        self._hub = hub  # hub's state, None once unsubscribed
+        self._owner = owner  # Hub isn't garbage collected while it has subscribers
+        self._buffer, self._blocking = buffer, blocking
+        self._position = hub._end()  # source's index of the next value
+        self.dropped = 0  # number of values skipped by 'drop_oldest' or 'latest_only' policy
+
+    def __del__(self):
+        hub = getattr(self, '_hub', None)
+        if hub is not None:
+            self._hub = None
+            hub._unsubscribe(self)
+
+    async def __anext__(self):
+        hub = self._hub
+        if hub is not None:
+            position = self._position
+            index = hub._offset + position - hub._start
+            # Value is kept already and subscriber isn't too far behind:
+            if 0 < len(hub._log) - index <= self._buffer:
+                self._position = position + 1
+                if self._blocking and hub._pump_waiter is not None:
+                    hub._wakeup_pump()
+                return hub._log[index]
+        return (await self._take(1))[0]
+
+    async def __anext_batch__(self, max_items):
+        return await self._take(max_items)
+
+    async def aclose(self):
+        """Unsubscribe."""
+        hub, self._hub, self._owner = self._hub, None, None
+        if hub is not None:
+            hub._unsubscribe(self)
+
+    async def _take(self, max_items):
+        while True:
+            hub = self._hub
+            if hub is None:
+                raise StopAsyncIteration()
+            end = hub._end()
+            behind = end - self._position
+            if behind:
+                if behind > self._buffer:
+                    self.dropped += behind - self._buffer
+                    self._position = end - self._buffer
+                position = self._position
+                index = hub._offset + position - hub._start
+                values = hub._log[index:index + min(end - position, max_items)]
+                self._position = position + len(values)
+                if self._blocking:
+                    hub._wakeup_pump()
+                return values
+            elif hub._finished:
+                if hub._error is not None:
+                    raise hub._error
+                raise StopAsyncIteration()
+            waiter = aio.get_event_loop().create_future()
+            hub._waiters.append(waiter)
+            await waiter
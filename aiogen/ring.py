@@ -0,0 +1,58 @@
+from typing import Any, Iterator, List
+
+
+class Ring:
+    """Fixed size FIFO buffer: list allocated once and reused as circle."""
+    __slots__ = ('_items', '_head', '_size')
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError('ring capacity should be positive, got {}'.format(capacity))
+        self._items = [None] * capacity
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._items)
+
+    def full(self) -> bool:
+        return self._size == len(self._items)
+
+    def __iter__(self) -> Iterator:
+        """Iterate items from the oldest one."""
+        items, head = self._items, self._head
+        for i in range(self._size):
+            yield items[(head + i) % len(items)]
+
+    def __getitem__(self, index: int) -> Any:
+        """Return index-th item counting from the oldest one."""
+        if not 0 <= index < self._size:
+            raise IndexError('ring index out of range')
+        return self._items[(self._head + index) % len(self._items)]
+
+    def push(self, item: Any):
+        if self._size == len(self._items):
+            raise IndexError('push to full ring')
+        self._items[(self._head + self._size) % len(self._items)] = item
+        self._size += 1
+
+    def pop(self) -> Any:
+        if not self._size:
+            raise IndexError('pop from empty ring')
+        items, head = self._items, self._head
+        item, items[head] = items[head], None
+        self._head = (head + 1) % len(items)
+        self._size -= 1
+        return item
+
+    def pop_many(self, max_items: int) -> List:
+        return [self.pop() for _ in range(min(max_items, self._size))]
+
+    def clear(self):
+        self._items[:] = [None] * len(self._items)
+        self._head = 0
+        self._size = 0
@@ -0,0 +1,363 @@
+from typing import Any, Callable, Iterable, List, AsyncIterable, AsyncIterator, Awaitable
+from collections import OrderedDict
+from operator import itemgetter
+import hashlib
+import math
+import random
+
+from aiogen.abuiltins import aiter, _chunks
+
+
+__all__ = (
+    'BloomFilter', 'HyperLogLog', 'KLL', 'Reservoir',
+    'acount_distinct', 'aquantiles', 'asample', 'aunique',
+)
+
+
+def _digest(value, size):
+    """Return hash of value as int of size (up to 16) bytes, the same in every process.
+
+    Note: equal numbers (1, 1.0 and True) hash the same, values of different types (1, '1' and b'1') don't.
+    """
+    if isinstance(value, bool) or isinstance(value, float) and value.is_integer():
+        value = int(value)
+    # Type tag keeps str, bytes and repr of other values with the same data apart:
+    if isinstance(value, str):
+        data = b's' + value.encode()
+    elif isinstance(value, (bytes, bytearray)):
+        data = b'b' + bytes(value)
+    else:
+        data = b'r' + repr(value).encode()
+    return int.from_bytes(hashlib.md5(data).digest()[:size], 'big')
+
+
+class HyperLogLog:
+    """Sketch of number of distinct values (str, bytes or values with stable repr).
+
+    Keeps 2 ** precision one-byte registers, standard error is 1.04 / sqrt(2 ** precision)
+    (0.8% for default precision 14 taking 16KB). Sketches of the same precision can be merged.
+    """
+    __slots__ = ('precision', '_registers')
+
+    def __init__(self, precision: int=14):
+        if not 4 <= precision <= 18:
+            raise ValueError('precision should be in range 4..18, got {}'.format(precision))
+        self.precision = precision
+        self._registers = bytearray(1 << precision)
+
+    def add(self, value):
+        self.update((value,))
+
+    def update(self, values: Iterable):
+        registers, rest_bits = self._registers, 64 - self.precision
+        mask = (1 << rest_bits) - 1
+        for value in values:
+            h = _digest(value, 8)
+            # Register is chosen by first bits, position of the first 1 bit in the rest is its rank:
+            index = h >> rest_bits
+            rank = rest_bits - (h & mask).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Add other sketch's values to this one, return this one."""
+        if other.precision != self.precision:
+            raise ValueError('can\'t merge sketches of precision {} and {}'.format(self.precision, other.precision))
+        self._registers = bytearray(map(max, self._registers, other._registers))
+        return self
+
+    def count(self) -> int:
+        registers = self._registers
+        m = len(registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in registers)
+        # Linear counting is more accurate for small numbers:
+        zeros = registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class KLL:
+    """Quantiles sketch of comparable values (KLL sketch).
+
+    Keeps about 3 * k values, rank error of quantiles is about 1.7 / k (under 1% for default
+    k=200). Values are kept in levels: full level is sorted and every other value of it
+    (starting from random one) goes to the next level, representing twice as many values.
+    Sketches of the same k can be merged.
+    """
+    __slots__ = ('k', '_levels', '_size', '_max_size', '_count', '_random')
+
+    def __init__(self, k: int=200, seed=None):
+        if k < 8:
+            raise ValueError('k should be at least 8, got {}'.format(k))
+        self.k = k
+        self._levels = [[]]  # level's values represent 2 ** level values each
+        self._size = 0  # number of values kept
+        self._max_size = self._capacities()
+        self._count = 0  # number of values added
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, value):
+        self._levels[0].append(value)
+        self._size += 1
+        self._count += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update(self, values: Iterable):
+        values = list(values)
+        self._levels[0].extend(values)
+        self._size += len(values)
+        self._count += len(values)
+        self._compress()
+
+    def merge(self, other: 'KLL') -> 'KLL':
+        """Add other sketch's values to this one, return this one."""
+        if other.k != self.k:
+            raise ValueError('can\'t merge sketches of k {} and {}'.format(self.k, other.k))
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for level, values in zip(self._levels, other._levels):
+            level.extend(values)
+        self._size += other._size
+        self._count += other._count
+        self._max_size = self._capacities()
+        self._compress()
+        return self
+
+    def quantile(self, q: float) -> Any:
+        return self.quantiles((q,))[0]
+
+    def quantiles(self, qs: Iterable[float]) -> List:
+        """Return approximate value for every quantile q in range 0..1."""
+        if not self._count:
+            raise ValueError('quantiles of empty sketch')
+        weighted = sorted(
+            ((value, 1 << level) for level, values in enumerate(self._levels) for value in values),
+            key=itemgetter(0)
+        )
+        result = []
+        for q in qs:
+            if not 0 <= q <= 1:
+                raise ValueError('quantile should be in range 0..1, got {}'.format(q))
+            target, total = q * self._count, 0
+            for value, weight in weighted:
+                total += weight
+                if total >= target:
+                    break
+            result.append(value)
+        return result
+
+    def _capacity(self, level):
+        # Lower levels keep less values:
+        depth = len(self._levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _capacities(self):
+        return sum(self._capacity(level) for level in range(len(self._levels)))
+
+    def _compress(self):
+        levels = self._levels
+        while self._size >= self._max_size:
+            for level, values in enumerate(levels):
+                if len(values) >= self._capacity(level):
+                    break
+            if level + 1 == len(levels):
+                levels.append([])
+                self._max_size = self._capacities()
+            values.sort()
+            kept = [values.pop()] if len(values) % 2 else []
+            promoted = values[self._random.getrandbits(1)::2]
+            levels[level + 1].extend(promoted)
+            self._size -= len(values) - len(promoted)
+            levels[level] = kept
+
+
+class Reservoir:
+    """Uniform random sample of up to k values (reservoir sampling, algorithm L).
+
+    After reservoir is full random numbers are drawn only for values which replace
+    sampled ones, not for every value. Reservoirs of the same k can be merged.
+    """
+    __slots__ = ('k', 'sample', '_count', '_next', '_w', '_random')
+
+    def __init__(self, k: int, seed=None):
+        if k < 1:
+            raise ValueError('k should be positive, got {}'.format(k))
+        self.k = k
+        self.sample = []
+        self._count = 0  # number of values added
+        self._next = None  # number of values when the next one goes to sample
+        self._w = None
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, value):
+        self._count += 1
+        if len(self.sample) < self.k:
+            self.sample.append(value)
+            if len(self.sample) == self.k:
+                self._w = 1.0
+                self._skip()
+        elif self._count == self._next:
+            self.sample[self._random.randrange(self.k)] = value
+            self._skip()
+
+    def update(self, values: Iterable):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: 'Reservoir') -> 'Reservoir':
+        """Make this reservoir sample of both reservoirs' values, return this one."""
+        if other.k != self.k:
+            raise ValueError('can\'t merge reservoirs of k {} and {}'.format(self.k, other.k))
+        rnd = self._random
+        # Number of values taken from every sample is chosen as if values of both were sampled:
+        remaining, taken = [self._count, other._count], [0, 0]
+        for _ in range(min(self.k, sum(remaining))):
+            i = 0 if rnd.random() * sum(remaining) < remaining[0] else 1
+            remaining[i] -= 1
+            taken[i] += 1
+        self.sample = rnd.sample(self.sample, taken[0]) + rnd.sample(other.sample, taken[1])
+        self._count += other._count
+        if len(self.sample) == self.k:
+            # The greatest of k least random keys of count values:
+            self._w = rnd.betavariate(self.k, self._count - self.k + 1)
+            self._next = self._count + int(math.log(_uniform(rnd)) / math.log(1 - self._w)) + 1
+        return self
+
+    def _skip(self):
+        rnd = self._random
+        self._w *= math.exp(math.log(_uniform(rnd)) / self.k)
+        self._next = self._count + int(math.log(_uniform(rnd)) / math.log(1 - self._w)) + 1
+
+
+def _uniform(rnd):
+    """Return random number in range (0, 1)."""
+    while True:
+        u = rnd.random()
+        if u:
+            return u
+
+
+class BloomFilter:
+    """Set of keys (str, bytes or values with stable repr) with false positives and fixed memory.
+
+    Sized for capacity keys to answer wrongly that key was added with probability error_rate,
+    it grows once more keys were added. Filters of the same capacity and error_rate can be merged.
+    """
+    __slots__ = ('capacity', 'error_rate', '_bits', '_size', '_hashes')
+
+    def __init__(self, capacity: int, error_rate: float=0.01):
+        if capacity < 1:
+            raise ValueError('capacity should be positive, got {}'.format(capacity))
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate should be in range (0, 1), got {}'.format(error_rate))
+        self.capacity, self.error_rate = capacity, error_rate
+        self._size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))  # bits
+        self._hashes = max(int(round(self._size / capacity * math.log(2))), 1)
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def __contains__(self, key) -> bool:
+        bits = self._bits
+        return all(bits[i >> 3] & (1 << (i & 7)) for i in self._positions(key))
+
+    def add(self, key):
+        bits = self._bits
+        for i in self._positions(key):
+            bits[i >> 3] |= 1 << (i & 7)
+
+    def merge(self, other: 'BloomFilter') -> 'BloomFilter':
+        """Add other filter's keys to this one, return this one."""
+        if (other.capacity, other.error_rate) != (self.capacity, self.error_rate):
+            raise ValueError('can\'t merge filters of different capacity or error_rate')
+        self._bits = bytearray(a | b for a, b in zip(self._bits, other._bits))
+        return self
+
+    def _positions(self, key):
+        # Double hashing: positions are h1 + i * h2 for two halves of 128 bits hash:
+        h = _digest(key, 16)
+        h1, h2, size = h >> 64, h & 0xFFFFFFFFFFFFFFFF, self._size
+        return [(h1 + i * h2) % size for i in range(self._hashes)]
+
+
+async def acount_distinct(aiterable: AsyncIterable, precision: int=14, sketch: HyperLogLog=None) -> Awaitable[int]:
+    """Return approximate number of distinct values (see HyperLogLog).
+
+    Values are added to sketch if it's given, so sketches of shards can be merged later.
+    """
+    sketch = sketch if sketch is not None else HyperLogLog(precision)
+    async for chunk in _chunks(aiter(aiterable)):
+        sketch.update(chunk)
+    return sketch.count()
+
+
+async def aquantiles(
+        aiterable: AsyncIterable, quantiles: Iterable[float]=(0.5, 0.9, 0.99), k: int=200, sketch: KLL=None
+) -> Awaitable[List]:
+    """Return approximate values of quantiles (see KLL), values are added to sketch if it's given."""
+    sketch = sketch if sketch is not None else KLL(k)
+    async for chunk in _chunks(aiter(aiterable)):
+        sketch.update(chunk)
+    return sketch.quantiles(quantiles)
+
+
+async def asample(aiterable: AsyncIterable, k: int, seed=None, sketch: Reservoir=None) -> Awaitable[List]:
+    """Return uniform random sample of up to k values (see Reservoir), values are added to sketch if it's given."""
+    sketch = sketch if sketch is not None else Reservoir(k, seed)
+    async for chunk in _chunks(aiter(aiterable)):
+        sketch.update(chunk)
+    return list(sketch.sample)
+
+
+class aunique(AsyncIterator):
+    """Values of aiterable which keys (key(value) or value itself) weren't seen before.
+
+    Without max_size all keys are kept in set. With max_size memory is bounded:
+    mode='lru' keeps max_size recently seen keys, so value which key was seen long ago
+    is passed again; mode='bloom' keeps BloomFilter sized for max_size keys, so new value
+    is dropped with probability error_rate. Seen keys are available as seen attribute
+    (set, OrderedDict or BloomFilter).
+    """
+    __slots__ = ('_anext', '_key', '_max_size', '_lru', 'seen')
+
+    def __init__(
+            self, aiterable: AsyncIterable, key: Callable=None, max_size: int=None,
+            mode: str='lru', error_rate: float=0.01
+    ):
+        if mode not in ('lru', 'bloom'):
+            raise ValueError('mode should be \'lru\' or \'bloom\', got {!r}'.format(mode))
+        if max_size is not None and max_size < 1:
+            raise ValueError('max_size should be positive, got {}'.format(max_size))
+        self._anext = aiter(aiterable).__anext__
+        self._key, self._max_size = key, max_size
+        self._lru = max_size is not None and mode == 'lru'
+        if max_size is None:
+            self.seen = set()
+        elif self._lru:
+            self.seen = OrderedDict()
+        else:
+            self.seen = BloomFilter(max_size, error_rate)
+
+    async def __anext__(self):
+        anext_, key, seen = self._anext, self._key, self.seen
+        while True:
+            value = await anext_()
+            k = key(value) if key is not None else value
+            if k in seen:
+                if self._lru:
+                    seen.move_to_end(k)
+                continue
+            if self._lru:
+                seen[k] = None
+                if len(seen) > self._max_size:
+                    seen.popitem(last=False)
+            else:
+                seen.add(k)
+            return value
@@ -0,0 +1,153 @@
+from typing import List, Callable, Awaitable, AsyncIterable
+from itertools import count
+
+from aiogen.abuiltins import abatch, aiter, alist, amax, amin, asum
+from aiogen.aitertools import aislice, _Stage
+
+
+__all__ = ('Stream',)
+
+
+class Stream(AsyncIterable):
+    """Chainable pipeline of stages over aiterable.
+
+    Stages only describe pipeline, it's built once Stream is iterated:
+    consecutive map, filter and enumerate stages are fused into single
+    async iterator applying them to every value in plain loop (or to whole batches
+    when upstream supports __anext_batch__), so they cost single await per value.
+    Since values may go through fused stages by batches, functions passed to
+    stages are expected not to depend on each other's calls order.
+
+        await Stream(aiterable).map(f).filter(p).enumerate().take(10).to_list()
+    """
+    __slots__ = ('_aiterable', '_stages')
+
+    def __init__(self, aiterable: AsyncIterable, _stages: tuple=()):
+        self._aiterable = aiterable
+        self._stages = _stages  # pairs of (stage name, argument)
+
+    def __aiter__(self):
+        aiterator = aiter(self._aiterable)
+        fused = []
+        for name, arg in self._stages:
+            if name in _FUSED_STAGES:
+                fused.append((name, arg))
+                continue
+            if fused:
+                aiterator, fused = _fuse(aiterator, fused), []
+            if name == 'take':
+                aiterator = aislice(aiterator, arg)
+            elif name == 'batch':
+                aiterator = abatch(aiterator, *arg)
+        if fused:
+            aiterator = _fuse(aiterator, fused)
+        return aiterator
+
+    def map(self, function: Callable) -> 'Stream':
+        return self._stage('map', function)
+
+    def filter(self, function: Callable=None) -> 'Stream':
+        return self._stage('filter', function if function is not None else bool)
+
+    def enumerate(self, start: int=0) -> 'Stream':
+        return self._stage('enumerate', start)
+
+    def take(self, n: int) -> 'Stream':
+        """Take first n values, upstream is closed after that (see aislice)."""
+        return self._stage('take', n)
+
+    def batch(self, size: int, max_delay: float=None) -> 'Stream':
+        """Group values into lists of size values (last one may be shorter), see abatch for max_delay."""
+        if size < 1:
+            raise ValueError('batch size should be positive, got {}'.format(size))
+        return self._stage('batch', (size, max_delay))
+
+    async def to_list(self) -> Awaitable[List]:
+        return await alist(self)
+
+    async def sum(self, start=0) -> Awaitable:
+        return await asum(self, start)
+
+    async def max(self, **kwargs) -> Awaitable:
+        return await amax(self, **kwargs)
+
+    async def min(self, **kwargs) -> Awaitable:
+        return await amin(self, **kwargs)
+
+    def _stage(self, name, arg):
+        return Stream(self._aiterable, self._stages + ((name, arg),))
+
+
+_FUSED_STAGES = frozenset(('map', 'filter', 'enumerate'))
+
+
+def _fuse(aiterator, stages):
+    """Return async iterator applying map, filter and enumerate stages to aiterator's values."""
+    ops = []
+    for name, arg in stages:
+        if name == 'enumerate':
+            # Counter is created per pipeline, so Stream can be iterated again:
+            arg = _enumerator(count(arg))
+        ops.append((name == 'filter', arg))
+    fused_type = _FusedBatches if hasattr(aiterator, '__anext_batch__') else _Fused
+    return fused_type(aiterator, tuple(ops))
+
+
+def _enumerator(counter):
+    return lambda value: (next(counter), value)
+
+
+# Value filtered out by fused stages:
+_SKIPPED = object()
+
+
+class _Fused(_Stage):
+    __slots__ = ('_ops',)
+
+    def __init__(self, aiterator, ops):
+        super().__init__(aiterator)
+        self._ops = ops  # pairs of (is filter, function)
+
+    async def __anext__(self):
+        anext_ = self._anext
+        if anext_ is None:
+            raise StopAsyncIteration()
+        while True:
+            value = self._apply(await anext_())
+            if value is not _SKIPPED:
+                return value
+
+    def _apply(self, value):
+        """Return value passed through all stages or _SKIPPED if it was filtered out."""
+        for is_filter, function in self._ops:
+            if not is_filter:
+                value = function(value)
+            elif not function(value):
+                return _SKIPPED
+        return value
+
+
+class _FusedBatches(_Fused):
+    __slots__ = ()
+
+    async def __anext_batch__(self, max_items):
+        if self._anext is None:
+            raise StopAsyncIteration()
+        anext_batch, ops = self._aiterator.__anext_batch__, self._ops
+        while True:
+            values = await anext_batch(max_items)
+            # Single value batch (async_yield), list operations aren't worth it:
+            if len(values) == 1:
+                value = self._apply(values[0])
+                if value is not _SKIPPED:
+                    return [value]
+                continue
+            for is_filter, function in ops:
+                if not is_filter:
+                    values = list(map(function, values))
+                else:
+                    values = list(filter(function, values))
+            # Skip batch filtered out completely:
+            if values:
+                return values
+
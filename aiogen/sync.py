@@ -0,0 +1,205 @@
+from typing import Iterator, AsyncIterable
+import asyncio as aio
+import threading
+
+from aiogen.abuiltins import aiter, _aclose
+
+
+__all__ = ('iterate',)
+
+
+def iterate(aiterable: AsyncIterable, prefetch: int=64) -> Iterator:
+    """Return blocking iterator of aiterable's values for synchronous code.
+
+    Aiterable (agenerator, for example) is iterated by shared event loop running in background
+    thread, started on first use. Up to prefetch values are taken ahead and passed to iterator
+    by batches. Iterator's close (or its garbage collection) closes aiterable with aclose.
+
+        for value in iterate(agen()):
+            print(value)
+    """
+    if prefetch < 1:
+        raise ValueError('prefetch should be positive, got {}'.format(prefetch))
+    return _SyncIterator(aiterable, prefetch)
+
+
+_lock = threading.Lock()
+_loop = None
+_thread = None
+
+
+def _background_loop():
+    """Return event loop of background thread, starting it if needed."""
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            _loop = aio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name='aiogen.sync', daemon=True)
+            _thread.start()
+        return _loop
+
+
+class _SyncIterator(Iterator):
+    __slots__ = ('_aiterable', '_prefetch', '_pump', '_items', '_index')
+
+    def __init__(self, aiterable, prefetch):
+        self._aiterable, self._prefetch = aiterable, prefetch  # None once started or closed
+        self._pump = None
+        self._items, self._index = [], 0  # batch being taken and index of next value
+
+    def __del__(self):
+        pump = getattr(self, '_pump', None)
+        if pump is not None:
+            pump.stop()
+
+    def __next__(self):
+        index = self._index
+        if index == len(self._items):
+            pump = self._pump if self._pump is not None else self._start()
+            self._items, index = pump.take(), 0
+        self._index = index + 1
+        return self._items[index]
+
+    def close(self):
+        """Close aiterable and wait until it's closed."""
+        self._aiterable = None
+        self._items, self._index = [], 0
+        if self._pump is not None:
+            self._pump.stop()
+            self._pump.join()
+
+    def _start(self):
+        if self._aiterable is None:
+            raise StopIteration()
+        elif threading.current_thread() is _thread:
+            raise RuntimeError('iterate can\'t be used inside its own event loop')
+        self._pump = _Pump(_background_loop(), self._aiterable, self._prefetch)
+        self._aiterable = None
+        return self._pump
+
+
+class _Pump:
+    """Values passed from aiterable iterated by background loop to synchronous iterator.
+
+    Pump doesn't reference iterator, so iterator can be garbage collected.
+    stop cancels aiterable's task, so aiterable is closed even if it's waiting for something.
+    """
+    def __init__(self, loop, aiterable, prefetch):
+        self.loop = loop
+        self.prefetch = prefetch
+        self.cond = threading.Condition()
+        # Guarded by cond:
+        self.items = []  # values taken from aiterable
+        self.space = None  # future aiterable's task waits for free space with
+        self.stopped = False  # iterator was closed
+        self.finished = False  # aiterable's task finished
+        self.error = None  # exception aiterable raised
+        # Used by background loop only:
+        self.pending = []  # values not passed to iterator yet
+        self.flushing = False  # _flush is scheduled
+        self.task = None  # aiterable's task once started, None once it's closing aiterable
+        aio.run_coroutine_threadsafe(self._run(aiterable), loop)
+
+    # Runs in iterator's thread:
+    def take(self):
+        """Wait for values and return all values taken, raise StopIteration if there're no more."""
+        with self.cond:
+            while not self.items and not self.finished:
+                self.cond.wait()
+            if self.items:
+                items, self.items = self.items, []
+                self._wakeup()
+                return items
+            elif self.error is not None:
+                error, self.error = self.error, None
+                raise error
+            raise StopIteration()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.items = []
+            self._wakeup()
+        self.loop.call_soon_threadsafe(self._cancel)
+
+    def join(self):
+        with self.cond:
+            while not self.finished:
+                self.cond.wait()
+
+    def _wakeup(self):
+        # Let aiterable's task waiting for free space continue:
+        if self.space is not None:
+            space, self.space = self.space, None
+            self.loop.call_soon_threadsafe(_set_done, space)
+
+    # Runs in background loop:
+    async def _run(self, aiterable):
+        self.task = _current_task()
+        error = None
+        try:
+            aiterator = aiter(aiterable)
+            anext_batch = getattr(aiterator, '__anext_batch__', None)
+            try:
+                while not self.stopped:
+                    room = self.prefetch - len(self.items) - len(self.pending)
+                    if room <= 0:
+                        self._flush()
+                        with self.cond:
+                            full = len(self.items) >= self.prefetch and not self.stopped
+                            if full:
+                                space = self.space = self.loop.create_future()
+                        if full:
+                            await space
+                        continue
+                    # Note: _flush replaces pending while task is suspended:
+                    if anext_batch is not None:
+                        values = await anext_batch(room)
+                        self.pending.extend(values)
+                    else:
+                        value = await aiterator.__anext__()
+                        self.pending.append(value)
+                    # Values are passed once task suspends or there's no more room,
+                    # so iterator's thread isn't woken up for every value:
+                    if not self.flushing:
+                        self.flushing = True
+                        self.loop.call_soon(self._flush)
+            # Stopped while waiting for aiterable or free space:
+            except aio.CancelledError:
+                if not self.stopped:
+                    raise
+            # Closed before exhausted, closing isn't cancelled:
+            self.task = None
+            await _aclose(aiterator)
+        except StopAsyncIteration:
+            pass
+        except BaseException as exc:
+            error = exc
+        finally:
+            self._flush()
+            with self.cond:
+                self.finished = True
+                if not self.stopped:
+                    self.error = error
+                self.cond.notify_all()
+
+    def _cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def _flush(self):
+        self.flushing = False
+        if self.pending:
+            with self.cond:
+                if not self.stopped:
+                    self.items.extend(self.pending)
+                    self.cond.notify()
+            self.pending = []
+
+
+_current_task = getattr(aio, 'current_task', None) or aio.Task.current_task
+
+
+def _set_done(future):
+    if not future.done():
+        future.set_result(None)
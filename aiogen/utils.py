@@ -3,6 +3,8 @@ import asyncio as aio
 import unittest
 from functools import wraps
 
+from aiogen.agenerator import shutdown_agenerators
+
 
 # SIMPLE EVENT LOOP:
 def run_until_complete(coro):
@@ -13,6 +15,7 @@ def run_until_complete(coro):
     try:
         loop.run_until_complete(coro)
     finally:
+        loop.run_until_complete(shutdown_agenerators(loop))
         loop.close()
 
 
@@ -29,8 +32,9 @@ class AsyncTestCase(unittest.TestCase):
             return wrapper
         # All coroutines should be executed in event loop:
         names = unittest.TestLoader().getTestCaseNames(cls)
-        for name, obj in vars(cls).items():
-            if (name in names) and aio.iscoroutinefunction(obj):
+        for name in names:
+            obj = getattr(cls, name)
+            if aio.iscoroutinefunction(obj):
                 setattr(cls, name, run_in_loop(obj))
 
 
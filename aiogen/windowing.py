@@ -0,0 +1,168 @@
+from typing import Any, Callable, Iterator, AsyncIterable, AsyncIterator
+from collections import deque
+import asyncio as aio
+
+from aiogen.abuiltins import aiter
+from aiogen.ring import Ring
+
+
+__all__ = ('Window', 'atimewindow', 'awindow')
+
+
+class Window:
+    """View of values in window, updated in place when next window is taken.
+
+    Reducers are maintained incrementally once used: sum (and mean) by adding taken
+    value and subtracting evicted one, min and max by monotonic deques, so value costs
+    amortized O(1) however big window is. Sum is recomputed once as many values as
+    window has were evicted, so float rounding errors don't accumulate.
+    Note: window is shared by all windows of iterator, use list(window) to keep values.
+    """
+    __slots__ = ('_values', '_append', '_popleft', '_start', '_sum', '_evicted', '_mins', '_maxs')
+
+    def __init__(self, values):
+        self._values = values  # Ring or deque of values from the oldest one
+        if isinstance(values, Ring):
+            self._append, self._popleft = values.push, values.pop
+        else:
+            self._append, self._popleft = values.append, values.popleft
+        self._start = 0  # number of values evicted (index of the oldest one)
+        # None until reducer is used:
+        self._sum = None
+        self._evicted = 0  # values evicted since sum was computed
+        self._mins = None  # pairs of (index, value) with increasing values
+        self._maxs = None  # pairs of (index, value) with decreasing values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._values)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, list(self._values))
+
+    def sum(self) -> Any:
+        if self._sum is None:
+            self._sum, self._evicted = sum(self._values), 0
+        return self._sum
+
+    def mean(self) -> Any:
+        return self.sum() / len(self._values)
+
+    def min(self) -> Any:
+        if self._mins is None:
+            self._mins = deque()
+            for index, value in enumerate(self._values, self._start):
+                _push_increasing(self._mins, index, value)
+        return self._mins[0][1]
+
+    def max(self) -> Any:
+        if self._maxs is None:
+            self._maxs = deque()
+            for index, value in enumerate(self._values, self._start):
+                _push_decreasing(self._maxs, index, value)
+        return self._maxs[0][1]
+
+    def _push(self, value):
+        self._append(value)
+        if self._sum is not None:
+            self._sum += value
+        if self._mins is not None:
+            _push_increasing(self._mins, self._start + len(self._values) - 1, value)
+        if self._maxs is not None:
+            _push_decreasing(self._maxs, self._start + len(self._values) - 1, value)
+
+    def _evict(self):
+        value = self._popleft()
+        index = self._start
+        self._start = index + 1
+        if self._sum is not None:
+            self._evicted += 1
+            if self._evicted > len(self._values):
+                self._sum, self._evicted = sum(self._values), 0
+            else:
+                self._sum -= value
+        if self._mins is not None and self._mins[0][0] == index:
+            self._mins.popleft()
+        if self._maxs is not None and self._maxs[0][0] == index:
+            self._maxs.popleft()
+
+
+def _push_increasing(pairs, index, value):
+    # Values greater than new one can't be min anymore:
+    while pairs and pairs[-1][1] >= value:
+        pairs.pop()
+    pairs.append((index, value))
+
+
+def _push_decreasing(pairs, index, value):
+    # Values less than new one can't be max anymore:
+    while pairs and pairs[-1][1] <= value:
+        pairs.pop()
+    pairs.append((index, value))
+
+
+class awindow(AsyncIterator):
+    """Windows of size latest values, taken every step values.
+
+    Windows slide by step values: with step=size they're tumbling, with step > size values
+    between windows are skipped. Only full windows are returned. Values are kept
+    in single ring buffer of size values, the same Window is returned every time.
+    """
+    __slots__ = ('_anext', '_window', '_size', '_step', '_remaining')
+
+    def __init__(self, aiterable: AsyncIterable, size: int, step: int=1):
+        if size < 1:
+            raise ValueError('size should be positive, got {}'.format(size))
+        if step < 1:
+            raise ValueError('step should be positive, got {}'.format(step))
+        self._anext = aiter(aiterable).__anext__
+        self._window = Window(Ring(size))
+        self._size, self._step = size, step
+        self._remaining = size  # values to take before next window
+
+    async def __anext__(self):
+        anext_, window, size = self._anext, self._window, self._size
+        while self._remaining:
+            value = await anext_()
+            if len(window) == size:
+                window._evict()
+            window._push(value)
+            self._remaining -= 1
+        self._remaining = self._step
+        return window
+
+
+class atimewindow(AsyncIterator):
+    """Windows of values of the last seconds, taken on every value.
+
+    Window ends with value just taken and contains values which timestamps (timestamp(value)
+    or loop's time value was taken at by default) are later than its one minus seconds.
+    Timestamps are expected not to decrease. The same Window is returned every time.
+    """
+    __slots__ = ('_anext', '_window', '_seconds', '_timestamp', '_times')
+
+    def __init__(self, aiterable: AsyncIterable, seconds: float, timestamp: Callable=None):
+        if seconds <= 0:
+            raise ValueError('seconds should be positive, got {}'.format(seconds))
+        self._anext = aiter(aiterable).__anext__
+        self._window = Window(deque())
+        self._seconds, self._timestamp = seconds, timestamp
+        self._times = deque()  # timestamps of window's values
+
+    async def __anext__(self):
+        value = await self._anext()
+        if self._timestamp is not None:
+            now = self._timestamp(value)
+        else:
+            now = aio.get_event_loop().time()
+        window, times = self._window, self._times
+        window._push(value)
+        times.append(now)
+        # Evict values out of window:
+        oldest = now - self._seconds
+        while times[0] <= oldest:
+            times.popleft()
+            window._evict()
+        return window
@@ -0,0 +1,65 @@
+"""Compare writing values one by one with writing abatch's lists to sink costing round-trip per call.
+
+Run: python -m benchmarks.bench_abatch [count]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.agenerator import agenerator, async_yield, async_yield_many
+from aiogen.abuiltins import abatch
+
+
+@agenerator(engine='native')
+async def values(n):
+    for i in range(n):
+        await async_yield(i)
+
+
+@agenerator(engine='native')
+async def pages(n, page=100):
+    for i in range(0, n, page):
+        await async_yield_many(range(i, min(i + page, n)))
+
+
+async def write(rows):
+    # Bulk API call: round-trip costs the same for single row and for many:
+    await aio.sleep(0)
+
+
+async def one_by_one(aiterable):
+    async for value in aiterable:
+        await write([value])
+
+
+async def batched(aiterable, **kwargs):
+    async for batch in abatch(aiterable, 500, **kwargs):
+        await write(batch)
+
+
+def bench(coro, n):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        loop.run_until_complete(coro)
+        return n / (time.perf_counter() - start)
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 200000
+    variants = (
+        ('one by one', lambda: one_by_one(values(n))),
+        ('abatch', lambda: batched(values(n))),
+        ('abatch max_delay', lambda: batched(values(n), max_delay=0.05)),
+        ('abatch pages', lambda: batched(pages(n))),
+        ('abatch pages max_delay', lambda: batched(pages(n), max_delay=0.05)),
+    )
+    for name, make in variants:
+        print('{:<24} {:>12,.0f} values/s'.format(name, bench(make(), n)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
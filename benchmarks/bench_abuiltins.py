@@ -0,0 +1,45 @@
+"""Measure how many values per second pass through pipeline of abuiltins iterators.
+
+Run: python -m benchmarks.bench_abuiltins [count]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.agenerator import agenerator, async_yield
+from aiogen.abuiltins import aenumerate, afilter, alist, amap, azip
+
+
+@agenerator(engine='native')
+async def count(n):
+    for i in range(n):
+        await async_yield(i)
+
+
+def pipeline(n):
+    return aenumerate(afilter(lambda v: v % 3, amap(lambda v: v * 2, count(n))))
+
+
+def zipped(n):
+    return azip(count(n), range(n), count(n))
+
+
+def bench(make, n):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        loop.run_until_complete(alist(make(n)))
+        return n / (time.perf_counter() - start)
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 100000
+    print('{:<40} {:>12,.0f} values/s'.format('aenumerate(afilter(amap(source)))', bench(pipeline, n)))
+    print('{:<40} {:>12,.0f} values/s'.format('azip(source, range, source)', bench(zipped, n)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
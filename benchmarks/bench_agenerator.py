@@ -0,0 +1,55 @@
+"""Measure how many values per second agenerator passes to consumer.
+
+Run: python -m benchmarks.bench_agenerator [count]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.agenerator import agenerator, async_yield, async_yield_many
+from aiogen.abuiltins import alist
+
+
+def make_generator(engine):
+    @agenerator(engine=engine)
+    async def count(n):
+        for i in range(n):
+            await async_yield(i)
+    return count
+
+
+def make_pages_generator(engine, page=1000):
+    @agenerator(engine=engine)
+    async def count(n):
+        for i in range(0, n, page):
+            await async_yield_many(range(i, min(i + page, n)))
+    return count
+
+
+async def consume(gen):
+    async for _ in gen:
+        pass
+
+
+def bench(count, consume, n):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        loop.run_until_complete(consume(count(n)))
+        return n / (time.perf_counter() - start)
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 100000
+    for engine in ('task', 'native'):
+        print('{:<8} {:>12,.0f} yields/s'.format(engine, bench(make_generator(engine), consume, n)))
+    for engine in ('task', 'native'):
+        rate = bench(make_pages_generator(engine), alist, n)
+        print('{:<8} {:>12,.0f} values/s (async_yield_many pages of 1000, alist)'.format(engine, rate))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,83 @@
+"""Compare aggregate_by and acounter (in memory and spilled) with grouping values of alist.
+
+Run: python -m benchmarks.bench_aggregate [count]
+"""
+import asyncio as aio
+import operator
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+from aiogen.agenerator import agenerator, async_yield_many
+from aiogen.abuiltins import acounter, aggregate_by, alist
+
+
+@agenerator(engine='native')
+async def orders(n, keys, page=1000):
+    for i in range(0, n, page):
+        await async_yield_many([
+            ('customer{}'.format(random.randrange(keys)), random.random()) for _ in range(min(page, n - i))
+        ])
+
+
+def customer(order):
+    return order[0]
+
+
+def add_amount(total, order):
+    return total + order[1]
+
+
+async def grouped(n, keys):
+    groups = defaultdict(list)
+    for order in await alist(orders(n, keys)):
+        groups[order[0]].append(order[1])
+    return len({k: sum(v) for k, v in groups.items()})
+
+
+async def aggregated(n, keys):
+    return len(await aggregate_by(orders(n, keys), customer, add_amount, 0.0))
+
+
+async def spilled(n, keys):
+    totals = await aggregate_by(
+        orders(n, keys), customer, add_amount, 0.0, combine=operator.add, max_keys=keys // 20
+    )
+    count = 0
+    async for _ in totals:
+        count += 1
+    return count
+
+
+async def counted(n, keys):
+    return len(await acounter(orders(n, keys), customer))
+
+
+def bench(coro):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = loop.run_until_complete(coro)
+        return result, time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 500000
+    keys = n // 2
+    for name, func in (
+            ('alist+group', grouped), ('aggregate_by', aggregated), ('spilled', spilled), ('acounter', counted)
+    ):
+        random.seed(0)
+        result, seconds, peak = bench(func(n, keys))
+        print('{:<13} {:>10,.0f} values/s {:>8.1f}MB peak  {:,} keys'.format(name, n / seconds, peak / 2 ** 20, result))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,87 @@
+"""Compare amerge with fan-in by asyncio.wait(FIRST_COMPLETED) for many mostly idle sources.
+
+10 busy sources produce values while others wait for them to finish,
+so every value is taken with the rest of sources still pending.
+
+Run: python -m benchmarks.bench_amerge [values per busy source]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.agenerator import agenerator, async_yield
+from aiogen.abuiltins import alist
+from aiogen.aitertools import amerge
+
+
+BUSY = 10
+
+
+@agenerator(engine='native')
+async def busy(n, finished):
+    for i in range(n):
+        await aio.sleep(0)
+        await async_yield(i)
+    finished.append(None)
+    if len(finished) == BUSY:
+        finished.event.set()
+
+
+@agenerator(engine='native')
+async def idle(finished):
+    await finished.event.wait()
+
+
+async def wait_merge(*aiterables):
+    # Every wait scans all pending tasks:
+    pending = {aio.ensure_future(a.__anext__()): a for a in aiterables}
+    values = []
+    while pending:
+        done, _ = await aio.wait(pending, return_when=aio.FIRST_COMPLETED)
+        for task in done:
+            aiterator = pending.pop(task)
+            try:
+                values.append(task.result())
+            except StopAsyncIteration:
+                continue
+            pending[aio.ensure_future(aiterator.__anext__())] = aiterator
+    return values
+
+
+class _Finished(list):
+    def __init__(self):
+        super().__init__()
+        self.event = aio.Event()
+
+
+def bench(merge, sources, n):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        async def run():
+            finished = _Finished()
+            aiterables = [busy(n, finished) for _ in range(BUSY)]
+            aiterables.extend(idle(finished) for _ in range(sources - BUSY))
+            return await merge(*aiterables)
+        start = time.perf_counter()
+        values = loop.run_until_complete(run())
+        assert len(values) == BUSY * n
+        return len(values) / (time.perf_counter() - start)
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 1000
+    variants = (
+        ('amerge', lambda *a: alist(amerge(*a))),
+        ('asyncio.wait', wait_merge),
+    )
+    for sources in (10, 100, 1000, 5000):
+        for name, merge in variants:
+            rate = bench(merge, sources, n)
+            print('{:<14} {:>5} sources {:>12,.0f} values/s'.format(name, sources, rate))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
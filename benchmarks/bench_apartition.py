@@ -0,0 +1,50 @@
+"""Measure apartition's throughput for worker whose latency dominates, by number of partitions.
+
+Run: python -m benchmarks.bench_apartition [count]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.agenerator import agenerator, async_yield
+from aiogen.abuiltins import alist
+from aiogen.aitertools import apartition
+
+
+@agenerator(engine='native')
+async def events(n, accounts=1000):
+    for i in range(n):
+        await async_yield((i % accounts, i))
+
+
+async def worker(event):
+    # Remote call:
+    await aio.sleep(0.002)
+    return event
+
+
+def bench(n, partitions):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        results = loop.run_until_complete(alist(
+            apartition(events(n), key=lambda e: e[0], n=partitions, worker=worker)
+        ))
+        assert len(results) == n
+        return n / (time.perf_counter() - start)
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 2000
+    base = None
+    for partitions in (1, 2, 4, 8, 16, 32, 64):
+        rate = bench(n, partitions)
+        base = base or rate
+        print('n={:<4} {:>10,.0f} events/s {:>6.1f}x'.format(partitions, rate, rate / base))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
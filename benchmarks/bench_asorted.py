@@ -0,0 +1,56 @@
+"""Sort stream 10 times larger than asorted's memory budget.
+
+Run: python -m benchmarks.bench_asorted [count]
+"""
+import asyncio as aio
+import random
+import sys
+import time
+import tracemalloc
+
+from aiogen.agenerator import agenerator, async_yield_many
+from aiogen.abuiltins import asorted
+
+
+@agenerator(engine='native')
+async def shuffled(n, page=1000):
+    rnd = random.Random(n)
+    for _ in range(0, n, page):
+        await async_yield_many([rnd.random() for _ in range(page)])
+
+
+async def sort_spilled(n, max_memory_items):
+    last = -1.0
+    async for value in await asorted(shuffled(n), max_memory_items=max_memory_items):
+        assert value >= last
+        last = value
+
+
+async def sort_in_memory(n):
+    await asorted(shuffled(n))
+
+
+def bench(coro):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        loop.run_until_complete(coro)
+        return time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 200000
+    budget = n // 10
+    elapsed, peak = bench(sort_in_memory(n))
+    print('{:<40} {:>8.2f} s {:>12,} bytes peak'.format('in memory', elapsed, peak))
+    elapsed, peak = bench(sort_spilled(n, budget))
+    print('{:<40} {:>8.2f} s {:>12,} bytes peak'.format('max_memory_items={}'.format(budget), elapsed, peak))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
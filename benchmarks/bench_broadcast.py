@@ -0,0 +1,75 @@
+"""Compare Hub with fan-out by asyncio.Queue per subscriber.
+
+Run: python -m benchmarks.bench_broadcast [subscribers] [values]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.agenerator import agenerator, async_yield
+from aiogen.broadcast import Hub
+
+
+@agenerator(engine='native')
+async def feed(n):
+    for i in range(n):
+        await async_yield(i)
+
+
+async def consume(aiterator):
+    count = 0
+    async for _ in aiterator:
+        count += 1
+    return count
+
+
+async def hub_broadcast(subscribers, n, policy):
+    hub = Hub(feed(n))
+    tasks = [consume(hub.subscribe(buffer=64, policy=policy)) for _ in range(subscribers)]
+    return sum(await aio.gather(*tasks))
+
+
+async def queue_broadcast(subscribers, n):
+    queues = [aio.Queue(64) for _ in range(subscribers)]
+
+    async def pump():
+        async for value in feed(n):
+            for queue in queues:
+                await queue.put(value)
+        for queue in queues:
+            await queue.put(None)
+
+    async def consume_queue(queue):
+        count = 0
+        while (await queue.get()) is not None:
+            count += 1
+        return count
+    results = await aio.gather(pump(), *(consume_queue(q) for q in queues))
+    return sum(results[1:])
+
+
+def bench(coro):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        deliveries = loop.run_until_complete(coro)
+        return deliveries / (time.perf_counter() - start)
+    finally:
+        loop.close()
+
+
+def main(argv):
+    subscribers = int(argv[1]) if len(argv) > 1 else 10000
+    n = int(argv[2]) if len(argv) > 2 else 200
+    variants = (
+        ('Hub block', lambda: hub_broadcast(subscribers, n, 'block')),
+        ('Hub drop_oldest', lambda: hub_broadcast(subscribers, n, 'drop_oldest')),
+        ('asyncio.Queue', lambda: queue_broadcast(subscribers, n)),
+    )
+    for name, make in variants:
+        print('{:<16} {:>12,.0f} deliveries/s'.format(name, bench(make())))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
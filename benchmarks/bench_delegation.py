@@ -0,0 +1,47 @@
+"""Measure how async_yield_from throughput depends on depth of delegation.
+
+Run: python -m benchmarks.bench_delegation [count]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.agenerator import agenerator, async_yield, async_yield_from
+
+
+def make_generator(engine):
+    @agenerator(engine=engine)
+    async def count(n, depth):
+        if depth:
+            return await async_yield_from(count(n, depth - 1))
+        for i in range(n):
+            await async_yield(i)
+    return count
+
+
+async def consume(gen):
+    async for _ in gen:
+        pass
+
+
+def bench(count, n, depth):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        loop.run_until_complete(consume(count(n, depth)))
+        return n / (time.perf_counter() - start)
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 20000
+    for engine in ('task', 'native'):
+        count = make_generator(engine)
+        for depth in (0, 1, 4, 16, 64):
+            print('{:<8} depth={:<3} {:>12,.0f} yields/s'.format(engine, depth, bench(count, n, depth)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
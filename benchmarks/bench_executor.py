@@ -0,0 +1,68 @@
+"""Compare amap and amap_executor for CPU-bound function.
+
+Run: python -m benchmarks.bench_executor [count]
+"""
+import asyncio as aio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from aiogen.agenerator import agenerator, async_yield_many
+from aiogen.abuiltins import alist, amap, amap_executor
+
+
+def work(v):
+    total = 0
+    for i in range(2000):
+        total += (v * i) % 7
+    return total
+
+
+@agenerator(engine='native')
+async def count(n, page=1000):
+    for i in range(0, n, page):
+        await async_yield_many(range(i, min(i + page, n)))
+
+
+async def ticker(ticks):
+    # Measures how often event loop gets to run other coroutines:
+    while True:
+        await aio.sleep(0.001)
+        ticks.append(time.perf_counter())
+
+
+async def run(make, n):
+    ticks = [time.perf_counter()]
+    task = aio.ensure_future(ticker(ticks))
+    await alist(make(n))
+    ticks.append(time.perf_counter())
+    task.cancel()
+    return max(b - a for a, b in zip(ticks, ticks[1:]))
+
+
+def bench(make, n):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        gap = loop.run_until_complete(run(make, n))
+        return n / (time.perf_counter() - start), gap
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 5000
+    with ThreadPoolExecutor() as threads, ProcessPoolExecutor() as processes:
+        variants = (
+            ('amap', lambda n: amap(work, count(n))),
+            ('amap_executor threads', lambda n: amap_executor(work, count(n), threads)),
+            ('amap_executor processes', lambda n: amap_executor(work, count(n), processes)),
+        )
+        for name, make in variants:
+            rate, gap = bench(make, n)
+            print('{:<26} {:>10,.0f} values/s, max loop stall {:>8.3f} s'.format(name, rate, gap))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,48 @@
+"""Compare event loop per call with aiogen.sync.iterate for short streams.
+
+Run: python -m benchmarks.bench_iterate [calls] [values]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.agenerator import agenerator, async_yield, shutdown_agenerators
+from aiogen.abuiltins import alist
+from aiogen.sync import iterate
+
+
+@agenerator(engine='native')
+async def count(n):
+    for i in range(n):
+        await async_yield(i)
+
+
+def loop_per_call(n):
+    loop = aio.new_event_loop()
+    try:
+        return loop.run_until_complete(alist(count(n)))
+    finally:
+        loop.run_until_complete(shutdown_agenerators(loop))
+        loop.close()
+
+
+def background_loop(n):
+    return list(iterate(count(n)))
+
+
+def bench(func, calls, n):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func(n)
+    return calls / (time.perf_counter() - start)
+
+
+def main(argv):
+    calls = int(argv[1]) if len(argv) > 1 else 2000
+    n = int(argv[2]) if len(argv) > 2 else 10
+    for func in (loop_per_call, background_loop):
+        print('{:<16} {:>10,.0f} calls/s ({} values each)'.format(func.__name__, bench(func, calls, n), n))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
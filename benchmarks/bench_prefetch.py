@@ -0,0 +1,45 @@
+"""Compare total latency of slow producer and slow consumer with and without prefetch.
+
+Run: python -m benchmarks.bench_prefetch [count] [delay]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.agenerator import agenerator, async_yield
+
+
+def make_generator(prefetch, delay):
+    @agenerator(prefetch=prefetch)
+    async def produce(n):
+        for i in range(n):
+            await aio.sleep(delay)
+            await async_yield(i)
+    return produce
+
+
+async def consume(gen, delay):
+    async for _ in gen:
+        await aio.sleep(delay)
+
+
+def bench(prefetch, n, delay):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        loop.run_until_complete(consume(make_generator(prefetch, delay)(n), delay))
+        return time.perf_counter() - start
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 200
+    delay = float(argv[2]) if len(argv) > 2 else 0.001
+    for prefetch in (None, 1, 16):
+        print('prefetch={!s:<5} {:>8.3f} s'.format(prefetch, bench(prefetch, n, delay)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
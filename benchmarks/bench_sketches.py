@@ -0,0 +1,62 @@
+"""Compare sketches' speed, memory and error with exact set and sorted list.
+
+Run: python -m benchmarks.bench_sketches [count]
+"""
+import asyncio as aio
+import random
+import sys
+import time
+import tracemalloc
+
+from aiogen.agenerator import agenerator, async_yield_many
+from aiogen.abuiltins import alist, aset
+from aiogen.sketches import acount_distinct, aquantiles
+
+
+@agenerator(engine='native')
+async def user_ids(n, page=1000):
+    for i in range(0, n, page):
+        await async_yield_many(['user{}'.format(random.randrange(n)) for _ in range(min(page, n - i))])
+
+
+@agenerator(engine='native')
+async def latencies(n, page=1000):
+    for i in range(0, n, page):
+        await async_yield_many([random.expovariate(1) for _ in range(min(page, n - i))])
+
+
+async def exact_distinct(n):
+    return len(await aset(user_ids(n)))
+
+
+async def exact_quantiles(n):
+    values = sorted(await alist(latencies(n)))
+    return [values[int(q * (n - 1))] for q in (0.5, 0.99)]
+
+
+def bench(coro):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = loop.run_until_complete(coro)
+        return result, time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 300000
+    for name, func in (
+            ('acount_distinct', lambda: acount_distinct(user_ids(n))), ('aset', lambda: exact_distinct(n)),
+            ('aquantiles', lambda: aquantiles(latencies(n), (0.5, 0.99))), ('sorted', lambda: exact_quantiles(n)),
+    ):
+        random.seed(0)
+        result, seconds, peak = bench(func())
+        print('{:<16} {:>10,.0f} values/s {:>8.1f}MB peak  {}'.format(name, n / seconds, peak / 2 ** 20, result))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
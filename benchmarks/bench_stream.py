@@ -0,0 +1,71 @@
+"""Compare fused Stream pipeline with equivalent nested abuiltins iterators.
+
+Run: python -m benchmarks.bench_stream [count]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.agenerator import agenerator, async_yield, async_yield_many
+from aiogen.abuiltins import aenumerate, afilter, alist, amap
+from aiogen.aitertools import acount, aislice
+from aiogen.stream import Stream
+
+
+def arange(n):
+    return aislice(acount(), n)
+
+
+@agenerator(engine='native')
+async def count(n):
+    for i in range(n):
+        await async_yield(i)
+
+
+@agenerator(engine='native')
+async def count_pages(n, page=1000):
+    for i in range(0, n, page):
+        await async_yield_many(range(i, min(i + page, n)))
+
+
+def double(v):
+    return v * 2
+
+
+def odd(v):
+    return v % 3
+
+
+def first(v):
+    return v[0]
+
+
+def nested(source):
+    return amap(first, aenumerate(afilter(odd, amap(double, afilter(odd, amap(double, source))))))
+
+
+def fused(source):
+    return Stream(source).map(double).filter(odd).map(double).filter(odd).enumerate().map(first)
+
+
+def bench(source, pipeline, n):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        loop.run_until_complete(alist(pipeline(source(n))))
+        return n / (time.perf_counter() - start)
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 200000
+    for source in (arange, count, count_pages):
+        for pipeline in (nested, fused):
+            rate = bench(source, pipeline, n)
+            print('{:<12} {:<8} {:>12,.0f} values/s'.format(source.__name__, pipeline.__name__, rate))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,51 @@
+"""Compare run_in_executor per value with aiter_from_sync batched handoff.
+
+Run: python -m benchmarks.bench_sync [count]
+"""
+import asyncio as aio
+import sys
+import time
+
+from aiogen.abuiltins import alist, aiter_from_sync
+
+
+class PerValue:
+    """Blocking iterator passed to default executor value by value."""
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        value = await aio.get_event_loop().run_in_executor(None, next, self._iterator, self)
+        if value is self:
+            raise StopAsyncIteration()
+        return value
+
+
+async def consume(aiterable):
+    async for _ in aiterable:
+        pass
+
+
+def bench(make, consume, n):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        loop.run_until_complete(consume(make(range(n))))
+        return n / (time.perf_counter() - start)
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 100000
+    print('{:<32} {:>12,.0f} values/s'.format('run_in_executor per value', bench(PerValue, consume, n // 10)))
+    print('{:<32} {:>12,.0f} values/s'.format('aiter_from_sync', bench(aiter_from_sync, consume, n)))
+    print('{:<32} {:>12,.0f} values/s'.format('aiter_from_sync, alist', bench(aiter_from_sync, alist, n)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
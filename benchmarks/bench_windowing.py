@@ -0,0 +1,54 @@
+"""Compare awindow's incremental reducers with recomputing max and mean of every window.
+
+Run: python -m benchmarks.bench_windowing [count]
+"""
+import asyncio as aio
+import random
+import sys
+import time
+from collections import deque
+
+from aiogen.agenerator import agenerator, async_yield_many
+from aiogen.windowing import awindow
+
+
+@agenerator(engine='native')
+async def latencies(n, page=1000):
+    for i in range(0, n, page):
+        await async_yield_many([random.random() for _ in range(min(page, n - i))])
+
+
+async def incremental(n, size):
+    async for window in awindow(latencies(n), size):
+        window.max(), window.mean()
+
+
+async def recomputed(n, size):
+    window = deque(maxlen=size)
+    async for value in latencies(n):
+        window.append(value)
+        if len(window) == size:
+            max(window), sum(window) / size
+
+
+def bench(coro, n):
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        start = time.perf_counter()
+        loop.run_until_complete(coro)
+        return n / (time.perf_counter() - start)
+    finally:
+        loop.close()
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 100000
+    for size in (10, 100, 1000, 10000):
+        for name, func in (('awindow', incremental), ('recomputed', recomputed)):
+            rate = bench(func(n, size), n)
+            print('{:<11} size {:>6} {:>12,.0f} values/s'.format(name, size, rate))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
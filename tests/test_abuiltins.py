@@ -1,6 +1,14 @@
 from typing import AsyncIterator
+import asyncio as aio
+import heapq
+import operator
+import gc
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from aiogen.utils import AsyncTestCase
-from aiogen.agenerator import agenerator, async_yield
+from aiogen.agenerator import agenerator, async_yield, async_yield_many
 from aiogen.abuiltins import *
 
 
@@ -10,42 +18,76 @@ async def ag(iterable) -> AsyncIterator:
         await async_yield(i)
 
 
+@agenerator
+async def ag_many(iterable) -> AsyncIterator:
+    iterable = list(iterable)
+    await async_yield_many(iterable[:2])
+    await async_yield_many(iterable[2:])
+
+
+class Tally:
+    """Accumulator counting its instances alive."""
+    __slots__ = ('total',)
+    live = peak = 0
+
+    def __new__(cls, *args):
+        Tally.live += 1
+        Tally.peak = max(Tally.peak, Tally.live)
+        return super().__new__(cls)
+
+    def __init__(self, total=0):
+        self.total = total
+
+    def __del__(self):
+        Tally.live -= 1
+
+    @staticmethod
+    def add(tally, value):
+        return Tally(value) if tally is None else Tally(tally.total + value)
+
+    @staticmethod
+    def merge(tally, other):
+        return Tally(tally.total + other.total)
+
+
 class TestABuiltins(AsyncTestCase):
+    ag = staticmethod(ag)
+
     async def test_all(self):
         # All true:
         i = [True, True, True]
-        self.assertEqual(await aall(ag(i)), all(i))
+        self.assertEqual(await aall(self.ag(i)), all(i))
         # Single false:
         i = [True, False, True]
-        self.assertEqual(await aall(ag(i)), all(i))
+        self.assertEqual(await aall(self.ag(i)), all(i))
 
     async def test_any(self):
         # All true:
         i = [True, True, True]
-        self.assertEqual(await aany(ag(i)), any(i))
+        self.assertEqual(await aany(self.ag(i)), any(i))
         # Single false:
         i = [True, False, True]
-        self.assertEqual(await aany(ag(i)), any(i))
+        self.assertEqual(await aany(self.ag(i)), any(i))
         # All false:
         i = [False, False, False]
-        self.assertEqual(await aany(ag(i)), any(i))
+        self.assertEqual(await aany(self.ag(i)), any(i))
 
     async def test_adict(self):
         i = [(1, 2), (3, 4)]
-        self.assertEqual(await adict(ag(i)), dict(i))
+        self.assertEqual(await adict(self.ag(i)), dict(i))
 
     async def test_aenumerate(self):
         i = [1, 2, False]
-        self.assertEqual(await alist(aenumerate(ag(i))), list(enumerate(i)))
+        self.assertEqual(await alist(aenumerate(self.ag(i))), list(enumerate(i)))
 
     async def test_afilter(self):
         i = [7, 1, 4, 3, 2]
         f = lambda v: v > 3
-        self.assertEqual(await alist(afilter(f, ag(i))), list(filter(f, i)))
+        self.assertEqual(await alist(afilter(f, self.ag(i))), list(filter(f, i)))
 
     async def test_afrozenset(self):
         i = [7, 7, 0, 9, 2, 0, 7]
-        self.assertEqual(await afrozenset(ag(i)), frozenset(i))
+        self.assertEqual(await afrozenset(self.ag(i)), frozenset(i))
 
     async def test_aiter(self):
         i = [0, 1, 3, 4, 5]
@@ -53,54 +95,494 @@ class TestABuiltins(AsyncTestCase):
         it = iter(i)
         f = lambda: next(it)
         # af:
-        ait = aiter(ag(i))
+        ait = aiter(self.ag(i))
         af = lambda: anext(ait)  # coroutine
         # check:
         self.assertEqual(await alist(aiter(af, 3)), list(iter(f, 3)))
 
     async def test_alist(self):
         i = (0, True, 1, False, 2,)
-        self.assertEqual(await alist(ag(i)), list(i))
+        self.assertEqual(await alist(self.ag(i)), list(i))
 
     async def test_amap(self):
         i1 = [7, 1, 4, 3, 2]
         i2 = range(4)
         f = lambda v1, v2: v1 * v2
-        self.assertEqual(await alist(amap(f, ag(i1), i2)), list(map(f, i1, i2)))
+        self.assertEqual(await alist(amap(f, self.ag(i1), i2)), list(map(f, i1, i2)))
 
     async def test_amax(self):
         i = [7, 3, 0, 9, 2, 0, 9]
-        self.assertEqual(await amax(ag(i)), max(i))
+        self.assertEqual(await amax(self.ag(i)), max(i))
 
     async def test_amin(self):
         i = [7, 3, 0, 9, 2, 0, 9]
-        self.assertEqual(await amin(ag(i)), min(i))
+        self.assertEqual(await amin(self.ag(i)), min(i))
 
     async def test_anext(self):
         i = [1, 2]
         it = iter(i)
-        ait = aiter(ag(i))
+        ait = aiter(self.ag(i))
         self.assertEqual(await anext(ait), next(it))
         self.assertEqual(await anext(ait), next(it))
         self.assertEqual(await anext(ait, 3), next(it, 3))
 
     async def test_aset(self):
         i = [7, 7, 0, 9, 2, 0, 7]
-        self.assertEqual(await aset(ag(i)), set(i))
+        self.assertEqual(await aset(self.ag(i)), set(i))
 
     async def test_asorted(self):
         i = [7, 7, 0, 9, 2, 0, 7]
-        self.assertEqual(await asorted(ag(i)), sorted(i))
+        self.assertEqual(await asorted(self.ag(i)), sorted(i))
 
     async def test_asum(self):
         i = [7, 7, 0, 9, 2, 0, 7]
-        self.assertEqual(await asum(ag(i)), sum(i))
+        self.assertEqual(await asum(self.ag(i)), sum(i))
 
     async def test_atuple(self):
         i = [7, 7, 0, 9, 2, 0, 7]
-        self.assertEqual(await atuple(ag(i)), tuple(i))
+        self.assertEqual(await atuple(self.ag(i)), tuple(i))
 
     async def test_azip(self):
         i1 = [7, 1, 4, 3, 2]
         i2 = range(4)
-        self.assertEqual(await alist(azip(ag(i1), i2)), list(zip(i1, i2)))
+        self.assertEqual(await alist(azip(self.ag(i1), i2)), list(zip(i1, i2)))
+
+    async def test_amax_kwargs(self):
+        i = [7, -9, 3, 9, -7]
+        self.assertEqual(await amax(self.ag(i), key=abs), max(i, key=abs))
+        self.assertEqual(await amax(self.ag([]), default='d'), 'd')
+        self.assertEqual(await amax(1, 3, 2), 3)
+        with self.assertRaises(ValueError):
+            await amax(self.ag([]))
+
+    async def test_amin_kwargs(self):
+        i = [7, -9, 3, 9, -3]
+        self.assertEqual(await amin(self.ag(i), key=abs), min(i, key=abs))
+        self.assertEqual(await amin(self.ag([]), default='d'), 'd')
+        self.assertEqual(await amin(1, 3, 2), 1)
+        with self.assertRaises(ValueError):
+            await amin(self.ag([]))
+
+    async def test_asum_start(self):
+        i = [[1], [2, 3]]
+        self.assertEqual(await asum(self.ag(i), []), sum(i, []))
+        self.assertEqual(await asum(self.ag([]), 5), 5)
+        with self.assertRaises(TypeError):
+            await asum(self.ag([]), 'a')
+
+    async def test_anlargest(self):
+        i = [(v * 7) % 100 for v in range(1200)]
+        key = lambda v: v // 10
+        self.assertEqual(await anlargest(5, self.ag(i)), heapq.nlargest(5, i))
+        self.assertEqual(await anlargest(600, self.ag(i), key=key), heapq.nlargest(600, i, key=key))
+        self.assertEqual(await anlargest(0, self.ag(i)), [])
+
+    async def test_ansmallest(self):
+        i = [(v * 7) % 100 for v in range(1200)]
+        key = lambda v: v // 10
+        self.assertEqual(await ansmallest(5, self.ag(i)), heapq.nsmallest(5, i))
+        self.assertEqual(await ansmallest(600, self.ag(i), key=key), heapq.nsmallest(600, i, key=key))
+        self.assertEqual(await ansmallest(5000, self.ag(i)), sorted(i))
+
+    async def test_asorted_spill(self):
+        i = [((v * 37) % 50, v) for v in range(200)]
+        key = lambda v: v[0]
+        for n in (1, 7, 200, 1000):
+            for reverse in (False, True):
+                it = await asorted(self.ag(i), key=key, reverse=reverse, max_memory_items=n)
+                self.assertEqual(await alist(it), sorted(i, key=key, reverse=reverse))
+        self.assertEqual(await alist(await asorted(self.ag([]), max_memory_items=3)), [])
+        with self.assertRaises(ValueError):
+            await asorted(self.ag(i), max_memory_items=0)
+
+    async def test_acounter(self):
+        i = [v % 7 for v in range(100)]
+        self.assertEqual(await acounter(self.ag(i)), Counter(i))
+        self.assertEqual(await acounter(self.ag(i), key=lambda v: v % 2), Counter(v % 2 for v in i))
+        for n in (1, 3, 100):
+            self.assertEqual(dict(await alist(await acounter(self.ag(i), max_keys=n, partitions=3))), Counter(i))
+
+    async def test_aggregate_by(self):
+        i = [(v % 5, v) for v in range(100)]
+        key = lambda v: v[0]
+        totals = {k: sum(v for kv, v in i if kv == k) for k in range(5)}
+        add = lambda total, value: total + value[1]
+        self.assertEqual(await aggregate_by(self.ag(i), key, add, 0), totals)
+        # Without initial accumulator is the first value:
+        self.assertEqual(await aggregate_by(self.ag(i), key, max), {k: (k, 95 + k) for k in range(5)})
+        self.assertEqual(await aggregate_by(self.ag([]), key, add, 0), {})
+        for n in (1, 2, 10):
+            for partitions in (1, 4):
+                it = await aggregate_by(
+                    self.ag(i), key, add, 0, combine=operator.add, max_keys=n, partitions=partitions
+                )
+                self.assertEqual(dict(await alist(it)), totals)
+            # Lists of values are combined in order they were taken:
+            it = await aggregate_by(self.ag(i), key, lambda l, v: l + [v[1]], [], combine=operator.add, max_keys=n)
+            self.assertEqual(dict(await alist(it)), {k: list(range(k, 100, 5)) for k in range(5)})
+        with self.assertRaises(ValueError):
+            await aggregate_by(self.ag(i), key, add, 0, max_keys=2)
+        with self.assertRaises(ValueError):
+            await aggregate_by(self.ag(i), key, max, max_keys=0)
+
+    async def test_aggregate_by_bounded(self):
+        # Many more keys than partitions * max_keys:
+        i = [v % 3000 for v in range(6000)]
+        Tally.live = Tally.peak = 0
+        totals = await aggregate_by(
+            self.ag(i), lambda v: v, Tally.add, None, combine=Tally.merge, max_keys=20, partitions=4
+        )
+        result = {}
+        async for k, tally in totals:
+            result[k] = tally.total
+        del tally, totals
+        self.assertEqual(result, {k: 2 * k for k in range(3000)})
+        # Merged accumulators and spilled ones being loaded:
+        self.assertLessEqual(Tally.peak, 3 * 20)
+        self.assertEqual(Tally.live, 0)
+
+    async def test_amerge_sorted(self):
+        i1, i2, i3 = [1, 3, 5, 7], [2, 3, 4], []
+        self.assertEqual(await alist(amerge_sorted(self.ag(i1), self.ag(i2), self.ag(i3))), sorted(i1 + i2))
+        # Equal values come in order of aiterables:
+        i1, i2 = [(3, 'a'), (1, 'a')], [(3, 'b'), (2, 'b'), (1, 'b')]
+        key = lambda v: v[0]
+        merged = amerge_sorted(self.ag(i1), self.ag(i2), key=key, reverse=True)
+        self.assertEqual(await alist(merged), sorted(i1 + i2, key=key, reverse=True))
+        self.assertEqual(await alist(amerge_sorted()), [])
+
+    async def test_afilter_none(self):
+        i = [0, 1, False, 2, None]
+        self.assertEqual(await alist(afilter(None, self.ag(i))), list(filter(None, i)))
+
+    async def test_amap_single(self):
+        i = [7, 1, 4]
+        f = lambda v: (v,)
+        self.assertEqual(await alist(amap(f, self.ag(i))), list(map(f, i)))
+
+    async def test_abatch(self):
+        self.assertEqual(await alist(abatch(self.ag(range(7)), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(await alist(abatch(self.ag([]), 3)), [])
+        with self.assertRaises(ValueError):
+            abatch(self.ag([]), 0)
+
+    async def test_aflatten(self):
+        i = [[0, 1], (), range(2, 5)]
+        self.assertEqual(await alist(aflatten(self.ag(i))), [0, 1, 2, 3, 4])
+        self.assertEqual(await alist(aunbatch(abatch(self.ag(range(7)), 3))), list(range(7)))
+
+    async def test_exhausted(self):
+        az = azip(self.ag([1]), range(5))
+        self.assertEqual(await alist(az), [(1, 0)])
+        self.assertEqual(await alist(az), [])
+        self.assertEqual(await alist(azip()), [])
+        i = iter([1, 2, 3])
+        ait = aiter(lambda: anext(aiter(self.ag([next(i)]))), 2)
+        self.assertEqual(await alist(ait), [1])
+        self.assertEqual(await alist(ait), [])
+
+
+class TestABuiltinsBatches(TestABuiltins):
+    """Same tests for aiterables supporting __anext_batch__."""
+    ag = staticmethod(ag_many)
+
+
+class TestABatch(AsyncTestCase):
+    async def test_max_delay(self):
+        @agenerator
+        async def trickle():
+            for value, delay in (('a', 0), ('b', 0), ('c', 0), ('d', 0.05), ('e', 0.05), ('f', 0.1)):
+                await aio.sleep(delay)
+                await async_yield(value)
+        batches = await alist(abatch(trickle(), 3, max_delay=0.1))
+        # Full batch, batch returned 0.1s after its first value (pending value isn't lost):
+        self.assertEqual(batches, [['a', 'b', 'c'], ['d', 'e'], ['f']])
+
+    async def test_first_value_waits(self):
+        @agenerator
+        async def slow():
+            await aio.sleep(0.05)
+            await async_yield(1)
+        # Delay starts with the first value of batch:
+        self.assertEqual(await alist(abatch(slow(), 3, max_delay=0.01)), [[1]])
+
+    async def test_batches(self):
+        @agenerator
+        async def source():
+            await async_yield_many(range(5))
+            await aio.sleep(0.05)
+            await async_yield_many(range(5, 7))
+        batches = await alist(abatch(source(), 4, max_delay=0.01))
+        self.assertEqual(batches, [[0, 1, 2, 3], [4], [5, 6]])
+
+    async def test_exception(self):
+        @agenerator
+        async def failing():
+            await async_yield_many([1, 2])
+            raise ZeroDivisionError()
+        for max_delay in (None, 1):
+            batches = abatch(failing(), 5, max_delay=max_delay)
+            self.assertEqual(await anext(batches), [1, 2])
+            with self.assertRaises(ZeroDivisionError):
+                await anext(batches)
+            self.assertEqual(await alist(batches), [])
+
+    async def test_aclose(self):
+        state = []
+
+        @agenerator(engine='native')
+        async def source():
+            try:
+                await async_yield(1)
+                await aio.sleep(10)
+            finally:
+                state.append('closed')
+        batches = abatch(source(), 5, max_delay=0.01)
+        self.assertEqual(await anext(batches), [1])
+        await batches.aclose()
+        self.assertEqual(state, ['closed'])
+        self.assertEqual(await alist(batches), [])
+
+    async def test_garbage_collected(self):
+        state = []
+
+        @agenerator
+        async def source():
+            try:
+                for i in range(100):
+                    await async_yield(i)
+                    await aio.sleep(0.001)
+            finally:
+                state.append('closed')
+        batches = abatch(source(), 3, max_delay=0.01)
+        async for batch in batches:
+            break
+        self.assertEqual(batch, [0, 1, 2])
+        task = batches._batcher.task
+        del batches
+        gc.collect()
+        await aio.sleep(0.02)
+        self.assertTrue(task.cancelled())
+        self.assertEqual(state, ['closed'])
+
+
+class TestAMapConcurrent(AsyncTestCase):
+    async def test_ordered(self):
+        async def f(v):
+            await aio.sleep((10 - v) * 0.001)
+            return v * 2
+        self.assertEqual(await alist(amap_concurrent(f, ag(range(10)), limit=4)), [v * 2 for v in range(10)])
+
+    async def test_unordered(self):
+        async def f(v1, v2):
+            await aio.sleep((5 - v1) * 0.005)
+            return v1 + v2
+        results = await alist(amap_concurrent(f, ag(range(5)), range(0, 50, 10), limit=5, ordered=False))
+        self.assertEqual(results, [44, 33, 22, 11, 0])
+
+    async def test_limit(self):
+        running, pulled = [], []
+
+        @agenerator
+        async def source():
+            for i in range(20):
+                pulled.append(i)
+                await async_yield(i)
+
+        async def f(v):
+            running.append(v)
+            await aio.sleep(0.001)
+            self.assertLessEqual(len(running), 3)
+            running.remove(v)
+            return v
+        for ordered in (True, False):
+            pulled.clear()
+            it = amap_concurrent(f, source(), limit=3, ordered=ordered)
+            await anext(it)
+            self.assertEqual(len(pulled), 3)
+            self.assertEqual(sorted([await anext(it)] + await alist(it)), list(range(1, 20)))
+        with self.assertRaises(ValueError):
+            amap_concurrent(f, [], limit=0)
+
+    async def test_exception(self):
+        cancelled = []
+
+        async def f(v):
+            try:
+                if v == 0:
+                    raise ValueError()
+                await aio.sleep(1)
+            except aio.CancelledError:
+                cancelled.append(v)
+                raise
+        for ordered in (True, False):
+            cancelled.clear()
+            it = amap_concurrent(f, range(10), limit=3, ordered=ordered)
+            with self.assertRaises(ValueError):
+                await anext(it)
+            await aio.sleep(0)
+            self.assertEqual(sorted(cancelled), [1, 2])
+            self.assertEqual(await alist(it), [])
+
+    async def test_aclose(self):
+        cancelled = []
+
+        async def f(v):
+            try:
+                await aio.sleep(v)
+            except aio.CancelledError:
+                cancelled.append(v)
+                raise
+            return v
+        it = amap_concurrent(f, [0, 1, 1], limit=3)
+        self.assertEqual(await anext(it), 0)
+        await it.aclose()
+        self.assertEqual(cancelled, [1, 1])
+        self.assertEqual(await alist(it), [])
+
+    async def test_consumer_cancelled(self):
+        cancelled = []
+
+        async def f(v):
+            try:
+                await aio.sleep(1)
+            except aio.CancelledError:
+                cancelled.append(v)
+                raise
+        it = amap_concurrent(f, range(5), limit=2)
+        task = aio.ensure_future(anext(it))
+        await aio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(aio.CancelledError):
+            await task
+        await aio.sleep(0)
+        self.assertEqual(cancelled, [0, 1])
+
+
+class TestAMapExecutor(AsyncTestCase):
+    async def test_values(self):
+        i = list(range(100))
+        for source in (ag, ag_many):
+            for chunksize, max_pending in ((1, 1), (7, 2), (1000, None)):
+                it = amap_executor(str, source(i), chunksize=chunksize, max_pending=max_pending)
+                self.assertEqual(await alist(it), list(map(str, i)))
+        with self.assertRaises(ValueError):
+            amap_executor(str, ag(i), chunksize=0)
+        with self.assertRaises(ValueError):
+            amap_executor(str, ag(i), max_pending=0)
+
+    async def test_executor_thread(self):
+        threads = set()
+
+        def f(v):
+            threads.add(threading.current_thread())
+            return -v
+        with ThreadPoolExecutor(2) as executor:
+            self.assertEqual(await alist(amap_executor(f, ag(range(10)), executor, chunksize=3)), [-v for v in range(10)])
+        self.assertNotIn(threading.current_thread(), threads)
+
+    async def test_process_pool(self):
+        with ProcessPoolExecutor(2) as executor:
+            it = amap_executor(abs, ag(range(-50, 50)), executor, chunksize=10)
+            self.assertEqual(await alist(it), [abs(v) for v in range(-50, 50)])
+
+    async def test_pending(self):
+        pulled = []
+
+        @agenerator
+        async def source():
+            for i in range(100):
+                pulled.append(i)
+                await async_yield(i)
+        it = amap_executor(str, source(), chunksize=5, max_pending=2)
+        self.assertEqual(await anext(it), '0')
+        self.assertEqual(len(pulled), 10)
+        await it.aclose()
+        self.assertEqual(await alist(it), [])
+
+    async def test_exception(self):
+        it = amap_executor(lambda v: 1 / v, ag([1, 2, 0, 4]), chunksize=2, max_pending=1)
+        self.assertEqual(await anext(it), 1)
+        self.assertEqual(await anext(it), 0.5)
+        with self.assertRaises(ZeroDivisionError):
+            await anext(it)
+        self.assertEqual(await alist(it), [])
+
+
+class TestAIterFromSync(AsyncTestCase):
+    async def test_values(self):
+        i = list(range(1000))
+        for batch, buffer in ((1, 1), (7, 2), (5000, 4)):
+            self.assertEqual(await alist(aiter_from_sync(i, batch, buffer)), i)
+            self.assertEqual(await alist(aiter_from_sync(iter(i), batch=batch, buffer=buffer)), i)
+        self.assertEqual(await alist(aiter_from_sync([])), [])
+        with self.assertRaises(ValueError):
+            aiter_from_sync(i, batch=0)
+        with self.assertRaises(ValueError):
+            aiter_from_sync(i, buffer=0)
+
+    async def test_thread(self):
+        threads = set()
+
+        def blocking():
+            for i in range(5):
+                time.sleep(0.001)
+                threads.add(threading.current_thread())
+                yield i
+        self.assertEqual(await alist(aiter_from_sync(blocking(), batch=2)), list(range(5)))
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    async def test_azip(self):
+        it = azip(aiter_from_sync(range(10), batch=3), ag('abcd'))
+        self.assertEqual(await alist(amap(lambda v: v, it)), list(zip(range(10), 'abcd')))
+
+    async def test_exception(self):
+        def blocking():
+            yield 1
+            yield 2
+            raise ValueError()
+        it = aiter_from_sync(blocking(), batch=1)
+        self.assertEqual(await anext(it), 1)
+        self.assertEqual(await anext(it), 2)
+        with self.assertRaises(ValueError):
+            await anext(it)
+        self.assertEqual(await alist(it), [])
+
+    async def test_aclose(self):
+        state = []
+
+        def blocking():
+            try:
+                for i in range(1000000):
+                    yield i
+            finally:
+                state.append(threading.current_thread())
+        it = aiter_from_sync(blocking(), batch=10, buffer=2)
+        self.assertEqual(await anext(it), 0)
+        await it.aclose()
+        self.assertEqual(len(state), 1)
+        self.assertNotEqual(state[0], threading.current_thread())
+        state[0].join(1)
+        self.assertFalse(state[0].is_alive())
+        self.assertEqual(await alist(it), [])
+        await aiter_from_sync([1]).aclose()
+
+    async def test_collected(self):
+        state = []
+
+        def blocking():
+            try:
+                for i in range(1000000):
+                    yield i
+            finally:
+                state.append('closed')
+        it = aiter_from_sync(blocking(), batch=10, buffer=2)
+        await anext(it)
+        del it
+        gc.collect()
+        for _ in range(100):
+            if state:
+                break
+            await aio.sleep(0.01)
+        self.assertEqual(state, ['closed'])
@@ -2,7 +2,7 @@ from test import support
 
 from aiogen.utils import AsyncTestCase
 from aiogen.agenerator import agenerator, async_yield
-from aiogen.acontextlib import acontextmanager, AContextDecorator
+from aiogen.acontextlib import acontextmanager, aclosing, AContextDecorator
 
 
 class TestAContextmanager(AsyncTestCase):
@@ -129,6 +129,37 @@ class TestAContextmanager(AsyncTestCase):
             self.assertEqual(target, (11, 22, 33, 44))
 
 
+class TestAClosing(AsyncTestCase):
+    async def test_aclosing(self):
+        state = []
+        @agenerator
+        async def woohoo():
+            try:
+                await async_yield(1)
+                await async_yield(2)
+            finally:
+                state.append(999)
+        async with aclosing(woohoo()) as gen:
+            async for x in gen:
+                state.append(x)
+                break
+        self.assertEqual(state, [1, 999])
+
+    async def test_aclosing_error(self):
+        state = []
+        @agenerator
+        async def woohoo():
+            try:
+                await async_yield(1)
+            finally:
+                state.append(999)
+        with self.assertRaises(ZeroDivisionError):
+            async with aclosing(woohoo()) as gen:
+                state.append(await gen.__anext__())
+                raise ZeroDivisionError()
+        self.assertEqual(state, [1, 999])
+
+
 class mycontext(AContextDecorator):
     started = False
     exc = None
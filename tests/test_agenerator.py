@@ -1,41 +1,66 @@
 from typing import AsyncIterator
+import asyncio as aio
+import gc
+import tracemalloc
 from aiogen.utils import AsyncTestCase
-from aiogen.agenerator import agenerator, async_yield, async_yield_from
-from aiogen.abuiltins import anext
+from aiogen.agenerator import \
+    AsyncGeneratorExit, agenerator, async_yield, async_yield_many, async_yield_from, shutdown_agenerators, IDLE_GENERATOR_SIZE, _registry
+from aiogen.abuiltins import anext, alist
 
 
-@agenerator
-async def ay(start) -> AsyncIterator:
-    r1 = await async_yield(start)
-    r2 = await async_yield(r1)
-    return r2
+def make_generators(engine):
+    @agenerator(engine=engine)
+    async def ay(start) -> AsyncIterator:
+        r1 = await async_yield(start)
+        r2 = await async_yield(r1)
+        return r2
 
+    @agenerator(engine=engine)
+    async def ayf(start) -> AsyncIterator:
+        r1 = await async_yield_from(ay(start))
+        r2 = await async_yield_from(ay(r1))
+        return r2
 
-@agenerator
-async def ayf(start) -> AsyncIterator:
-    r1 = await async_yield_from(ay(start))
-    r2 = await async_yield_from(ay(r1))
-    return r2
+    return ay, ayf
+
+
+async def anext_after_cancel(gen):
+    """Cancel pending anext, then take next value right away (failing instead of hanging)."""
+    pending = aio.ensure_future(gen.__anext__())
+    await aio.sleep(0)
+    pending.cancel()
+    current_task = getattr(aio, 'current_task', None) or aio.Task.current_task
+    timer = aio.get_event_loop().call_later(1, current_task().cancel)
+    try:
+        return await gen.__anext__()
+    finally:
+        timer.cancel()
+
+
+ay, ayf = make_generators('task')
+native_ay, native_ayf = make_generators('native')
 
 
 class TestLoop(AsyncTestCase):
+    ay, ayf = staticmethod(ay), staticmethod(ayf)
+
     async def test_loop(self):
         i = 0
-        async for val in ay(1):
+        async for val in self.ay(1):
             if i == 0: self.assertEqual(val, 1)
             if i == 1: self.assertEqual(val, None)
             i += 1
 
     async def test_break(self):
         i = 0
-        async for val in ay(1):
+        async for val in self.ay(1):
             if i == 0: self.assertEqual(val, 1)
             if i > 0: break
             i += 1
 
     async def test_loop_ayf(self):
         i = 0
-        async for val in ayf(1):
+        async for val in self.ayf(1):
             if i == 0: self.assertEqual(val, 1)
             if i == 1: self.assertEqual(val, None)
             if i == 2: self.assertEqual(val, None)
@@ -44,7 +69,7 @@ class TestLoop(AsyncTestCase):
 
     async def test_break_ayf(self):
         i = 0
-        async for val in ayf(1):
+        async for val in self.ayf(1):
             if i == 0: self.assertEqual(val, 1)
             if i == 1: self.assertEqual(val, None)
             if i == 2: self.assertEqual(val, None)
@@ -53,8 +78,10 @@ class TestLoop(AsyncTestCase):
 
 
 class TestASend(AsyncTestCase):
+    ay, ayf = staticmethod(ay), staticmethod(ayf)
+
     async def test_asend(self):
-        gen = ay(1)
+        gen = self.ay(1)
         self.assertEqual(await anext(gen), 1)
         self.assertEqual(await gen.asend(2), 2)
         with self.assertRaises(StopAsyncIteration) as cm:
@@ -62,7 +89,7 @@ class TestASend(AsyncTestCase):
         self.assertEqual(cm.exception.args[0], 3)
 
     async def test_asend_ayf(self):
-        gen = ayf(1)
+        gen = self.ayf(1)
         self.assertEqual(await anext(gen), 1)
         self.assertEqual(await gen.asend(2), 2)
         self.assertEqual(await gen.asend(3), 3)
@@ -73,26 +100,28 @@ class TestASend(AsyncTestCase):
 
 
 class TestAThrow(AsyncTestCase):
+    ay, ayf = staticmethod(ay), staticmethod(ayf)
+
     async def test_athrow_first(self):
-        gen = ay(1)
+        gen = self.ay(1)
         with self.assertRaises(ValueError) as cm:
             await gen.athrow(ValueError())
 
     async def test_athrow_after_anext(self):
-        gen = ay(1)
+        gen = self.ay(1)
         await anext(gen)
         with self.assertRaises(ValueError) as cm:
             await gen.athrow(ValueError())
 
     async def test_anext_after_athrow(self):
-        gen = ay(1)
+        gen = self.ay(1)
         with self.assertRaises(ValueError) as cm:
             await gen.athrow(ValueError())
         with self.assertRaises(StopAsyncIteration) as cm:
             await anext(gen)
 
     async def test_athrow_after_athrow(self):
-        gen = ay(1)
+        gen = self.ay(1)
         with self.assertRaises(ValueError) as cm:
             await gen.athrow(ValueError())
         with self.assertRaises(TypeError) as cm:
@@ -100,21 +129,23 @@ class TestAThrow(AsyncTestCase):
 
 
 class TestAClose(AsyncTestCase):
+    ay, ayf = staticmethod(ay), staticmethod(ayf)
+
     async def test_aclose_first(self):
-        gen = ay(1)
+        gen = self.ay(1)
         await gen.aclose()
         with self.assertRaises(StopAsyncIteration) as cm:
             await anext(gen)
 
     async def test_aclose_after_anext(self):
-        gen = ay(1)
+        gen = self.ay(1)
         await anext(gen)
         await gen.aclose()
         with self.assertRaises(StopAsyncIteration) as cm:
             await anext(gen)
 
     async def test_anext_after_aclose(self):
-        gen = ay(1)
+        gen = self.ay(1)
         await gen.aclose()
         with self.assertRaises(StopAsyncIteration) as cm:
             await anext(gen)
@@ -122,9 +153,560 @@ class TestAClose(AsyncTestCase):
             await anext(gen)
 
     async def test_athrow_after_aclose(self):
-        gen = ay(1)
+        gen = self.ay(1)
         await gen.aclose()
         with self.assertRaises(StopAsyncIteration) as cm:
             await anext(gen)
         with self.assertRaises(ValueError) as cm:
             await gen.athrow(ValueError())
+
+
+# Same tests for native engine:
+class TestLoopNative(TestLoop):
+    ay, ayf = staticmethod(native_ay), staticmethod(native_ayf)
+
+
+class TestASendNative(TestASend):
+    ay, ayf = staticmethod(native_ay), staticmethod(native_ayf)
+
+
+class TestAThrowNative(TestAThrow):
+    ay, ayf = staticmethod(native_ay), staticmethod(native_ayf)
+
+
+class TestACloseNative(TestAClose):
+    ay, ayf = staticmethod(native_ay), staticmethod(native_ayf)
+
+
+class TestCancel(AsyncTestCase):
+    """Consumer's cancelled await leaves task engine's producer running."""
+
+    async def test_cancel_then_resume(self):
+        @agenerator
+        async def gen():
+            await async_yield(1)
+            await aio.sleep(0.05)
+            await async_yield(2)
+            await async_yield(3)
+        g = gen()
+        self.assertEqual(await anext(g), 1)
+        with self.assertRaises(aio.TimeoutError):
+            await aio.wait_for(anext(g), 0.01)
+        # Value yielded while nobody waited isn't lost:
+        await aio.sleep(0.1)
+        self.assertEqual(await alist(g), [2, 3])
+
+    async def test_cancel_then_resume_waiting(self):
+        @agenerator
+        async def gen():
+            await async_yield(1)
+            await aio.sleep(0.05)
+            await async_yield(2)
+        g = gen()
+        self.assertEqual(await anext(g), 1)
+        with self.assertRaises(aio.TimeoutError):
+            await aio.wait_for(anext(g), 0.01)
+        self.assertEqual(await alist(g), [2])
+
+    async def test_cancel_then_anext(self):
+        @agenerator
+        async def gen():
+            await aio.sleep(0.01)
+            await async_yield(1)
+            await async_yield(2)
+        g = gen()
+        self.assertEqual(await anext_after_cancel(g), 1)
+        self.assertEqual(await alist(g), [2])
+
+    async def test_cancel_then_aclose(self):
+        state = []
+
+        @agenerator
+        async def gen():
+            try:
+                await async_yield(1)
+                await aio.sleep(0.05)
+                state.append('running')
+                await async_yield(2)
+                state.append('resumed')
+            finally:
+                state.append('closed')
+        g = gen()
+        self.assertEqual(await anext(g), 1)
+        with self.assertRaises(aio.TimeoutError):
+            await aio.wait_for(anext(g), 0.01)
+        # Closed at its next async_yield:
+        await g.aclose()
+        self.assertEqual(state, ['running', 'closed'])
+        with self.assertRaises(StopAsyncIteration):
+            await anext(g)
+
+    async def test_cancel_then_finish(self):
+        @agenerator
+        async def gen():
+            await async_yield(1)
+            await aio.sleep(0.05)
+        g = gen()
+        self.assertEqual(await anext(g), 1)
+        with self.assertRaises(aio.TimeoutError):
+            await aio.wait_for(anext(g), 0.01)
+        await g.aclose()
+        self.assertEqual(await alist(g), [])
+
+
+class TestNativeEngine(AsyncTestCase):
+    async def test_await_inside(self):
+        @agenerator(engine='native')
+        async def g():
+            for i in range(3):
+                await aio.sleep(0)
+                await async_yield(i)
+        self.assertEqual(await alist(g()), [0, 1, 2])
+
+    async def test_mixed_engines(self):
+        @agenerator(engine='native')
+        async def native_from_task():
+            return await async_yield_from(ay(1))
+
+        @agenerator
+        async def task_from_native():
+            return await async_yield_from(native_ay(1))
+
+        for gen in (native_from_task(), task_from_native()):
+            self.assertEqual(await anext(gen), 1)
+            self.assertEqual(await gen.asend(2), 2)
+            with self.assertRaises(StopAsyncIteration) as cm:
+                await gen.asend(3)
+            self.assertEqual(cm.exception.args[0], 3)
+
+    async def test_exception_inside(self):
+        @agenerator(engine='native')
+        async def g():
+            await async_yield(1)
+            raise ValueError()
+        gen = g()
+        await anext(gen)
+        with self.assertRaises(ValueError):
+            await anext(gen)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(gen)
+
+    async def test_already_running(self):
+        @agenerator(engine='native')
+        async def g():
+            await aio.sleep(0.01)
+            await async_yield(1)
+        gen = g()
+        task = aio.ensure_future(anext(gen))
+        await aio.sleep(0)
+        with self.assertRaises(RuntimeError):
+            await anext(gen)
+        self.assertEqual(await task, 1)
+
+    async def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            agenerator(engine='thread')
+
+
+class TestAsyncYield(AsyncTestCase):
+    async def test_outside_agenerator(self):
+        with self.assertRaises(RuntimeError):
+            await async_yield(1)
+        with self.assertRaises(RuntimeError):
+            await async_yield_from(ay(1))
+
+    async def test_inside_nested_coroutine(self):
+        async def helper(value):
+            return await async_yield(value)
+
+        for engine in ('task', 'native'):
+            @agenerator(engine=engine)
+            async def g():
+                return await helper(await helper(1))
+            gen = g()
+            self.assertEqual(await anext(gen), 1)
+            self.assertEqual(await gen.asend(2), 2)
+            with self.assertRaises(StopAsyncIteration) as cm:
+                await gen.asend(3)
+            self.assertEqual(cm.exception.args[0], 3)
+
+
+class TestMemory(AsyncTestCase):
+    def test_idle_generator_size(self):
+        for gen_func in (ay, native_ay):
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                gens = [gen_func(i) for i in range(10000)]
+                size = (tracemalloc.get_traced_memory()[0] - before) / len(gens)
+            finally:
+                tracemalloc.stop()
+            self.assertLessEqual(size, IDLE_GENERATOR_SIZE)
+
+
+class TestShutdown(AsyncTestCase):
+    async def test_shutdown_agenerators(self):
+        loop = aio.get_event_loop()
+        for gen_func in (ay, native_ay):
+            finished, unfinished = [gen_func(1) for _ in range(10)], [gen_func(1) for _ in range(10)]
+            for gen in finished:
+                await alist(gen)
+            for gen in unfinished:
+                await anext(gen)
+            # Only unfinished generators tracked, event loop's close is untouched:
+            self.assertEqual(len(_registry(loop)), len(unfinished))
+            self.assertNotIn('close', vars(loop))
+            # All closed concurrently:
+            await shutdown_agenerators(loop)
+            self.assertEqual(len(_registry(loop)), 0)
+            for gen in unfinished:
+                with self.assertRaises(StopAsyncIteration):
+                    await anext(gen)
+
+
+class TestFinalization(AsyncTestCase):
+    ABANDONED = 50000
+
+    async def test_close_collected(self):
+        state = []
+        for engine in ('task', 'native'):
+            @agenerator(engine=engine)
+            async def g():
+                try:
+                    await async_yield(1)
+                    await async_yield(2)
+                finally:
+                    state.append(engine)
+            # Drop generator:
+            await anext(g())
+            # Break loop:
+            async for _ in g():
+                break
+            for _ in range(10):
+                await aio.sleep(0)
+            self.assertEqual(state, [engine, engine])
+            state.clear()
+
+    async def test_abandoned_memory_flat(self):
+        loop = aio.get_event_loop()
+        loop.set_debug(False)
+        for gen_func in (ay, native_ay):
+            objects = []
+            for i in range(self.ABANDONED):
+                await anext(gen_func(i))
+                if i % 100 == 0:
+                    await aio.sleep(0)
+                if i % (self.ABANDONED // 5) == 0:
+                    gc.collect()
+                    objects.append(len(gc.get_objects()))
+                    self.assertLess(len(_registry(loop)), 1000)
+            # Far less than object per abandoned generator:
+            self.assertLess(max(objects) - min(objects), self.ABANDONED // 10)
+
+
+class TestAsyncYieldMany(AsyncTestCase):
+    engine = 'task'
+
+    def make_generator(self):
+        @agenerator(engine=self.engine)
+        async def g():
+            r1 = await async_yield_many([1, 2, 3])
+            r2 = await async_yield_many(iter(()))
+            r3 = await async_yield_many(range(4, 6))
+            r4 = await async_yield(6)
+            return r1, r2, r3, r4
+        return g
+
+    async def test_anext(self):
+        self.assertEqual(await alist(self.make_generator()()), [1, 2, 3, 4, 5, 6])
+
+    async def test_asend(self):
+        gen = self.make_generator()()
+        self.assertEqual(await anext(gen), 1)
+        self.assertEqual(await gen.asend('a'), 2)
+        self.assertEqual(await gen.asend('b'), 3)
+        self.assertEqual(await gen.asend('c'), 4)
+        self.assertEqual(await gen.asend('d'), 5)
+        self.assertEqual(await gen.asend('e'), 6)
+        with self.assertRaises(StopAsyncIteration) as cm:
+            await gen.asend('f')
+        self.assertEqual(cm.exception.args[0], ('c', None, 'e', 'f'))
+
+    async def test_athrow(self):
+        @agenerator(engine=self.engine)
+        async def g():
+            try:
+                await async_yield_many([1, 2, 3])
+            except ValueError:
+                await async_yield_many([4, 5])
+        gen = g()
+        self.assertEqual(await anext(gen), 1)
+        self.assertEqual(await gen.athrow(ValueError()), 4)
+        self.assertEqual(await alist(gen), [5])
+
+    async def test_anext_batch(self):
+        gen = self.make_generator()()
+        self.assertEqual(await gen.__anext_batch__(2), [1, 2])
+        self.assertEqual(await gen.__anext_batch__(2), [3])
+        self.assertEqual(await gen.__anext_batch__(10), [4, 5])
+        self.assertEqual(await gen.__anext_batch__(10), [6])
+        with self.assertRaises(StopAsyncIteration):
+            await gen.__anext_batch__(10)
+
+    async def test_outside_agenerator(self):
+        with self.assertRaises(RuntimeError):
+            await async_yield_many([1])
+
+
+class TestAsyncYieldManyNative(TestAsyncYieldMany):
+    engine = 'native'
+
+
+class TestAsyncYieldFrom(AsyncTestCase):
+    engine = 'task'
+
+    async def test_deep(self):
+        @agenerator(engine=self.engine)
+        async def g(depth):
+            if depth:
+                return (await async_yield_from(g(depth - 1))) + 1
+            await async_yield_many([1, 2])
+            return await async_yield(3)
+        gen = g(100)
+        self.assertEqual(await gen.__anext_batch__(10), [1, 2])
+        self.assertEqual(await anext(gen), 3)
+        with self.assertRaises(StopAsyncIteration) as cm:
+            await gen.asend(0)
+        self.assertEqual(cm.exception.args[0], 100)
+
+    async def test_exception_to_delegating(self):
+        @agenerator(engine=self.engine)
+        async def inner():
+            await async_yield(1)
+            raise ValueError()
+
+        @agenerator(engine=self.engine)
+        async def outer():
+            try:
+                await async_yield_from(inner())
+            except ValueError:
+                await async_yield('caught')
+        self.assertEqual(await alist(outer()), [1, 'caught'])
+
+    async def test_athrow_to_innermost(self):
+        @agenerator(engine=self.engine)
+        async def inner():
+            try:
+                await async_yield(1)
+            except ValueError:
+                await async_yield('inner')
+            return 'result'
+
+        @agenerator(engine=self.engine)
+        async def outer():
+            result = await async_yield_from(inner())
+            await async_yield(result)
+        gen = outer()
+        self.assertEqual(await anext(gen), 1)
+        self.assertEqual(await gen.athrow(ValueError()), 'inner')
+        self.assertEqual(await anext(gen), 'result')
+        with self.assertRaises(KeyError):
+            await gen.athrow(KeyError())
+
+    async def test_aclose(self):
+        state = []
+
+        def make(name, delegate):
+            @agenerator(engine=self.engine)
+            async def g():
+                try:
+                    if delegate is None:
+                        await async_yield(1)
+                    else:
+                        await async_yield_from(delegate)
+                    await async_yield(2)
+                finally:
+                    state.append(name)
+            return g()
+        gen = make('outer', make('middle', make('inner', None)))
+        self.assertEqual(await anext(gen), 1)
+        await gen.aclose()
+        self.assertEqual(state, ['inner', 'middle', 'outer'])
+
+    async def test_ignored_aclose(self):
+        @agenerator(engine=self.engine)
+        async def inner():
+            try:
+                await async_yield(1)
+            except AsyncGeneratorExit:
+                await async_yield(2)
+
+        @agenerator(engine=self.engine)
+        async def outer():
+            try:
+                await async_yield_from(inner())
+            except RuntimeError:
+                await async_yield('ignored')
+        gen = outer()
+        await anext(gen)
+        with self.assertRaises(RuntimeError):
+            await gen.aclose()
+
+    async def test_started_delegate(self):
+        @agenerator(engine=self.engine)
+        async def inner():
+            await async_yield_many([1, 2, 3])
+            await async_yield(4)
+
+        @agenerator(engine=self.engine)
+        async def outer(gen):
+            await async_yield_from(gen)
+        gen = inner()
+        self.assertEqual(await anext(gen), 1)
+        self.assertEqual(await alist(outer(gen)), [2, 3, 4])
+
+    async def test_async_iterator(self):
+        class Countdown:
+            def __init__(self, n):
+                self.n = n
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                return await self.asend(None)
+
+            async def asend(self, value):
+                if not self.n:
+                    raise StopAsyncIteration('done')
+                self.n -= 1
+                return self.n
+
+        @agenerator(engine=self.engine)
+        async def g():
+            await async_yield(await async_yield_from(Countdown(3)))
+        self.assertEqual(await alist(g()), [2, 1, 0, 'done'])
+
+    async def test_prefetch(self):
+        @agenerator(prefetch=2)
+        async def g():
+            await async_yield_from(ay(1))
+        self.assertEqual(await alist(g()), [1, None])
+
+
+class TestAsyncYieldFromNative(TestAsyncYieldFrom):
+    engine = 'native'
+
+
+class TestPrefetch(AsyncTestCase):
+    async def test_values(self):
+        @agenerator(prefetch=3)
+        async def g():
+            await async_yield_many(range(5))
+            await async_yield(5)
+            return 'result'
+        gen = g()
+        self.assertEqual(await alist(g()), list(range(6)))
+        self.assertEqual(await anext(gen), 0)
+        await aio.sleep(0)
+        # Buffer holds at most prefetch values:
+        self.assertEqual(await gen.__anext_batch__(10), [1, 2, 3])
+        self.assertEqual(await alist(gen), [4, 5])
+        with self.assertRaises(StopAsyncIteration):
+            await anext(gen)
+
+    async def test_cancel_then_anext(self):
+        @agenerator(prefetch=3)
+        async def g():
+            await aio.sleep(0.01)
+            await async_yield(1)
+            await async_yield(2)
+        gen = g()
+        self.assertEqual(await anext_after_cancel(gen), 1)
+        self.assertEqual(await alist(gen), [2])
+
+    async def test_runs_ahead(self):
+        produced = []
+        @agenerator(prefetch=3)
+        async def g():
+            for i in range(10):
+                produced.append(i)
+                await async_yield(i)
+        gen = g()
+        self.assertEqual(await anext(gen), 0)
+        for _ in range(5):
+            await aio.sleep(0)
+        # One value taken, three in buffer, one waits for free space:
+        self.assertEqual(produced, [0, 1, 2, 3, 4])
+        self.assertEqual(await alist(gen), list(range(1, 10)))
+
+    async def test_asend(self):
+        @agenerator(prefetch=2)
+        async def g():
+            await async_yield(1)
+        gen = g()
+        with self.assertRaises(TypeError):
+            await gen.asend(1)
+        self.assertEqual(await gen.asend(None), 1)
+        with self.assertRaises(StopAsyncIteration):
+            await gen.asend(None)
+
+    async def test_athrow(self):
+        @agenerator(prefetch=2)
+        async def g():
+            try:
+                for i in range(10):
+                    await async_yield(i)
+            except ValueError:
+                await async_yield('caught')
+        gen = g()
+        self.assertEqual(await anext(gen), 0)
+        self.assertEqual(await gen.athrow(ValueError()), 'caught')
+        with self.assertRaises(StopAsyncIteration):
+            await anext(gen)
+        with self.assertRaises(ValueError):
+            await gen.athrow(ValueError())
+
+    async def test_athrow_after_finish(self):
+        @agenerator(prefetch=5)
+        async def g():
+            await async_yield(1)
+        gen = g()
+        self.assertEqual(await anext(gen), 1)
+        with self.assertRaises(ValueError):
+            await gen.athrow(ValueError())
+
+    async def test_exception_after_values(self):
+        @agenerator(prefetch=5)
+        async def g():
+            await async_yield(1)
+            await async_yield(2)
+            raise ValueError()
+        gen = g()
+        self.assertEqual(await anext(gen), 1)
+        await aio.sleep(0)
+        self.assertEqual(await anext(gen), 2)
+        with self.assertRaises(ValueError):
+            await anext(gen)
+
+    async def test_aclose(self):
+        state = []
+        @agenerator(prefetch=2)
+        async def g():
+            try:
+                for i in range(10):
+                    await async_yield(i)
+            finally:
+                state.append('closed')
+        gen = g()
+        await anext(gen)
+        await gen.aclose()
+        self.assertEqual(state, ['closed'])
+        with self.assertRaises(StopAsyncIteration):
+            await anext(gen)
+
+    async def test_arguments(self):
+        with self.assertRaises(ValueError):
+            agenerator(engine='native', prefetch=2)
+        with self.assertRaises(ValueError):
+            agenerator(prefetch=0)
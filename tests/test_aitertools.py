@@ -0,0 +1,471 @@
+from typing import AsyncIterator
+import asyncio as aio
+import itertools
+from aiogen.utils import AsyncTestCase
+from aiogen.agenerator import agenerator, async_yield, async_yield_many
+from aiogen.abuiltins import alist, anext
+from aiogen.aitertools import *
+
+
+@agenerator
+async def ag(iterable) -> AsyncIterator:
+    for i in iterable:
+        await async_yield(i)
+
+
+class TestAItertools(AsyncTestCase):
+    async def test_achain(self):
+        i1, i2 = [1, 2], [3]
+        self.assertEqual(await alist(achain(ag(i1), [], i2, ag(i2))), list(itertools.chain(i1, [], i2, i2)))
+        self.assertEqual(await alist(achain()), [])
+
+    async def test_achain_from_iterable(self):
+        i = [[1, 2], [], [3]]
+        chained = achain.from_iterable([ag(i[0]), i[1], ag(i[2])])
+        self.assertEqual(await alist(chained), list(itertools.chain.from_iterable(i)))
+        chained = achain.from_iterable(ag([ag(i[0]), i[2]]))
+        self.assertEqual(await alist(chained), [1, 2, 3])
+
+    async def test_aislice(self):
+        i = list(range(10))
+        for args in ((3,), (0,), (2, 8), (2, None, 3), (1, 8, 2), (20,), (None,)):
+            self.assertEqual(await alist(aislice(ag(i), *args)), list(itertools.islice(i, *args)), args)
+        with self.assertRaises(ValueError):
+            aislice(ag(i), -1)
+        with self.assertRaises(ValueError):
+            aislice(ag(i), 0, 5, 0)
+
+    async def test_atakewhile(self):
+        i = [1, 4, 6, 4, 1]
+        f = lambda v: v < 5
+        self.assertEqual(await alist(atakewhile(f, ag(i))), list(itertools.takewhile(f, i)))
+
+    async def test_early_close(self):
+        state = []
+
+        @agenerator
+        async def source():
+            try:
+                for i in range(10):
+                    await async_yield(i)
+            finally:
+                state.append('closed')
+        sliced = aislice(source(), 2)
+        self.assertEqual(await anext(sliced), 0)
+        self.assertEqual(state, [])
+        self.assertEqual(await anext(sliced), 1)
+        self.assertEqual(state, ['closed'])
+        taken = atakewhile(lambda v: v < 1, source())
+        self.assertEqual(await alist(taken), [0])
+        self.assertEqual(state, ['closed', 'closed'])
+        self.assertEqual(await alist(taken), [])
+
+    async def test_adropwhile(self):
+        i = [1, 4, 6, 4, 1]
+        f = lambda v: v < 5
+        self.assertEqual(await alist(adropwhile(f, ag(i))), list(itertools.dropwhile(f, i)))
+
+    async def test_acompress(self):
+        i, s = 'ABCDEF', [1, 0, 1, 0, 1]
+        self.assertEqual(await alist(acompress(ag(i), s)), list(itertools.compress(i, s)))
+        self.assertEqual(await alist(acompress(ag(i), ag(s))), list(itertools.compress(i, s)))
+
+    async def test_aaccumulate(self):
+        i = [3, 4, 6, 2, 1]
+        self.assertEqual(await alist(aaccumulate(ag(i))), list(itertools.accumulate(i)))
+        self.assertEqual(await alist(aaccumulate(ag(i), max)), list(itertools.accumulate(i, max)))
+        self.assertEqual(await alist(aaccumulate(ag(i), initial=100)), [100, 103, 107, 113, 115, 116])
+        self.assertEqual(await alist(aaccumulate(ag([]), initial=100)), [100])
+
+    async def test_apairwise(self):
+        self.assertEqual(await alist(apairwise(ag('ABCD'))), [('A', 'B'), ('B', 'C'), ('C', 'D')])
+        self.assertEqual(await alist(apairwise(ag('A'))), [])
+
+    async def test_agroupby(self):
+        async def groups(aiterable, key=None):
+            result = []
+            async for k, group in agroupby(aiterable, key):
+                result.append((k, await alist(group)))
+            return result
+        i = 'AAAABBBCCDAABBB'
+        self.assertEqual(await groups(ag(i)), [(k, list(g)) for k, g in itertools.groupby(i)])
+        self.assertEqual(
+            await groups(ag('aAbBBc'), str.lower), [('a', ['a', 'A']), ('b', ['b', 'B', 'B']), ('c', ['c'])]
+        )
+        self.assertEqual(await alist(agroupby(ag(''))), [])
+
+    async def test_agroupby_lazy(self):
+        taken = []
+
+        @agenerator
+        async def source():
+            for value in 'AABBBC':
+                taken.append(value)
+                await async_yield(value)
+        groups = agroupby(source())
+        key, a = await anext(groups)
+        self.assertEqual((key, await anext(a)), ('A', 'A'))
+        self.assertEqual(taken, ['A'])
+        # Taking the next group skips values of the previous one and exhausts it:
+        key, b = await anext(groups)
+        self.assertEqual(key, 'B')
+        self.assertEqual(taken, ['A', 'A', 'B'])
+        self.assertEqual(await alist(a), [])
+        rest = await alist(groups)
+        self.assertEqual([k for k, _ in rest], ['C'])
+        self.assertEqual(await alist(b), [])
+
+    async def test_astarmap(self):
+        i = [(2, 5), (3, 2)]
+        self.assertEqual(await alist(astarmap(pow, ag(i))), list(itertools.starmap(pow, i)))
+
+    async def test_acount(self):
+        self.assertEqual(await alist(aislice(acount(10, 2), 3)), [10, 12, 14])
+
+    async def test_arepeat(self):
+        self.assertEqual(await alist(arepeat('a', 3)), ['a', 'a', 'a'])
+        self.assertEqual(await alist(arepeat('a', -1)), [])
+        self.assertEqual(await alist(aislice(arepeat('a'), 2)), ['a', 'a'])
+
+    async def test_aclose(self):
+        state = []
+
+        @agenerator
+        async def source():
+            try:
+                await async_yield_many([1, 2])
+            finally:
+                state.append('closed')
+        stage = apairwise(source())
+        await stage.aclose()
+        chained = achain([0], source())
+        self.assertEqual(await anext(chained), 0)
+        self.assertEqual(await anext(chained), 1)
+        await chained.aclose()
+        self.assertEqual(state, ['closed'])
+        self.assertEqual(await alist(chained), [])
+
+
+class TestAMerge(AsyncTestCase):
+    async def test_completion_order(self):
+        @agenerator
+        async def delayed(delays, tag):
+            for delay in delays:
+                await aio.sleep(delay)
+                await async_yield(tag)
+        merged = amerge(delayed([0.03, 0.03], 'slow'), delayed([0.01, 0.01, 0.01], 'fast'))
+        self.assertEqual(await alist(merged), ['fast', 'fast', 'slow', 'fast', 'slow'])
+        self.assertEqual(await alist(amerge()), [])
+
+    async def test_fairness(self):
+        @agenerator
+        async def chatty():
+            while True:
+                await async_yield('chatty')
+
+        @agenerator
+        async def quiet():
+            for _ in range(5):
+                await aio.sleep(0)
+                await async_yield('quiet')
+        taken = await alist(aislice(amerge(chatty(), quiet()), 20))
+        self.assertEqual(taken.count('quiet'), 5)
+
+    async def test_many_sources(self):
+        sources = [ag(range(i, 900, 300)) for i in range(300)]
+        self.assertEqual(sorted(await alist(amerge(*sources))), list(range(900)))
+
+    async def test_max_concurrent(self):
+        state = {'active': 0, 'max': 0}
+
+        @agenerator
+        async def source(i):
+            state['active'] += 1
+            state['max'] = max(state['max'], state['active'])
+            for j in range(3):
+                await aio.sleep(0)
+                await async_yield((i, j))
+            state['active'] -= 1
+        merged = amerge(*(source(i) for i in range(5)), max_concurrent=2)
+        self.assertEqual(sorted(await alist(merged)), [(i, j) for i in range(5) for j in range(3)])
+        self.assertEqual(state['max'], 2)
+        with self.assertRaises(ValueError):
+            amerge(max_concurrent=0)
+
+    async def test_priority(self):
+        self.assertEqual(await alist(amerge(ag('ace'), ag('bdf'))), list('abcdef'))
+        self.assertEqual(await alist(amerge(ag('ace'), ag('bdf'), priority=(1, 0))), list('badcfe'))
+        with self.assertRaises(ValueError):
+            amerge(ag('a'), priority=(1, 2))
+
+    async def test_aclose(self):
+        state = []
+
+        @agenerator
+        async def task_source(i):
+            # Task engine's source keeps running, it's closed at its next async_yield:
+            try:
+                await async_yield(i)
+                await aio.sleep(0.05)
+                await async_yield(i)
+            finally:
+                state.append(i)
+
+        @agenerator(engine='native')
+        async def native_source(i):
+            try:
+                await async_yield(i)
+                await aio.sleep(10)
+            finally:
+                state.append(i)
+
+        class plain_source(AsyncIterator):
+            def __init__(self, i):
+                self.i = i
+
+            async def __anext__(self):
+                if self.i is None:
+                    await aio.sleep(10)
+                i, self.i = self.i, None
+                return i
+
+            async def aclose(self):
+                state.append(2)
+        not_started = task_source(3)
+        merged = amerge(task_source(0), native_source(1), plain_source(2), not_started, max_concurrent=3)
+        taken = []
+        for _ in range(3):
+            taken.append(await anext(merged))
+        self.assertEqual(sorted(taken), [0, 1, 2])
+        # Let sources run, so they're closed while waiting for next value:
+        await aio.sleep(0.01)
+        await merged.aclose()
+        self.assertEqual(sorted(state), [0, 1, 2])
+        self.assertEqual(await alist(merged), [])
+        self.assertEqual(await alist(not_started), [])
+
+    async def test_error(self):
+        state = []
+
+        @agenerator
+        async def failing():
+            await aio.sleep(0)
+            raise ZeroDivisionError()
+
+        @agenerator
+        async def endless():
+            try:
+                while True:
+                    await aio.sleep(0.01)
+                    await async_yield(1)
+            finally:
+                state.append('closed')
+        with self.assertRaises(ZeroDivisionError):
+            await alist(amerge(endless(), failing()))
+        self.assertEqual(state, ['closed'])
+
+
+class TestATee(AsyncTestCase):
+    async def test_atee(self):
+        a, b, c = atee(ag(range(10)), 3)
+        self.assertEqual(await alist(a), list(range(10)))
+        self.assertEqual(await alist(b), list(range(10)))
+        self.assertEqual([await anext(c), await anext(c)], [0, 1])
+        self.assertEqual(await alist(c), list(range(2, 10)))
+        self.assertEqual(atee(ag([]), 0), ())
+        with self.assertRaises(ValueError):
+            atee(ag([]), -1)
+
+    async def test_shared_upstream(self):
+        calls = []
+
+        @agenerator
+        async def source():
+            for i in range(6):
+                calls.append(i)
+                await async_yield([i])
+        a, b = atee(source())
+        first = []
+        for _ in range(3):
+            first.append(await anext(a))
+        self.assertIs(await anext(b), first[0])
+        await alist(a)
+        await alist(b)
+        self.assertEqual(calls, list(range(6)))
+
+    async def test_max_lag(self):
+        a, b = atee(ag(range(100)), max_lag=4)
+        taken = []
+        for _ in range(4):
+            taken.append(await anext(a))
+        self.assertEqual(taken, [0, 1, 2, 3])
+        # Leader waits for the slowest iterator:
+        with self.assertRaises(aio.TimeoutError):
+            await aio.wait_for(anext(a), 0.01)
+        self.assertEqual(await anext(b), 0)
+        self.assertEqual(await anext(a), 4)
+        results = await aio.gather(alist(a), alist(b))
+        self.assertEqual(results, [list(range(5, 100)), list(range(1, 100))])
+
+    async def test_concurrent_consumers(self):
+        async def consume(aiterator, delay):
+            values = []
+            async for value in aiterator:
+                values.append(value)
+                await aio.sleep(delay)
+            return values
+        tees = atee(ag(range(50)), 3, max_lag=3)
+        results = await aio.gather(*(consume(t, d) for t, d in zip(tees, (0, 0.001, 0))))
+        self.assertEqual(results, [list(range(50))] * 3)
+
+    async def test_batches(self):
+        @agenerator
+        async def source():
+            await async_yield_many(range(10))
+        a, b = atee(source(), max_lag=4)
+        self.assertEqual(await a.__anext_batch__(3), [0, 1, 2])
+        self.assertEqual(await b.__anext_batch__(10), [0, 1, 2, 3])
+        self.assertEqual(await a.__anext_batch__(10), [3])
+        results = await aio.gather(alist(a), alist(b))
+        self.assertEqual(results, [list(range(4, 10))] * 2)
+
+    async def test_error(self):
+        @agenerator
+        async def failing():
+            await async_yield(1)
+            raise ZeroDivisionError()
+        a, b = atee(failing())
+        for t in (a, b):
+            self.assertEqual(await anext(t), 1)
+            with self.assertRaises(ZeroDivisionError):
+                await anext(t)
+
+    async def test_aclose(self):
+        state = []
+
+        @agenerator
+        async def source():
+            try:
+                for i in range(100):
+                    await async_yield(i)
+            finally:
+                state.append('closed')
+        a, b, c = atee(source(), 3, max_lag=2)
+        await a.aclose()
+        del c  # garbage collected iterator doesn't hold others back too
+        taken = []
+        for _ in range(10):
+            taken.append(await anext(b))
+        self.assertEqual(taken, list(range(10)))
+        self.assertEqual(state, [])
+        await b.aclose()
+        self.assertEqual(state, ['closed'])
+        self.assertEqual(await alist(a), [])
+
+
+class TestAPartition(AsyncTestCase):
+    async def test_partitions(self):
+        parts = apartition(ag(range(20)), key=lambda v: v % 3, n=3)
+        results = await aio.gather(*(alist(p) for p in parts))
+        self.assertEqual(sorted(map(sorted, results)), [[v for v in range(20) if v % 3 == r] for r in range(3)])
+        # Values of the same key go to the same partition in order:
+        for values in results:
+            self.assertEqual(values, sorted(values))
+            self.assertEqual(len({hash(v % 3) % 3 for v in values}), 1)
+        with self.assertRaises(ValueError):
+            apartition(ag([]), key=str, n=0)
+
+    async def test_worker(self):
+        processed = []
+
+        async def worker(event):
+            account, number = event
+            await aio.sleep(0.001 * (3 - account))
+            processed.append(event)
+            return number
+        events = [(i % 3, i) for i in range(30)]
+        results = await alist(apartition(ag(events), key=lambda e: e[0], n=3, worker=worker, buffer=2))
+        self.assertEqual(sorted(results), list(range(30)))
+        for account in range(3):
+            self.assertEqual([e for e in processed if e[0] == account], [e for e in events if e[0] == account])
+
+    async def test_concurrency(self):
+        state = {'running': 0, 'max': 0}
+
+        async def worker(value):
+            state['running'] += 1
+            state['max'] = max(state['max'], state['running'])
+            await aio.sleep(0.01)
+            state['running'] -= 1
+            return value
+        results = await alist(apartition(ag(range(40)), key=lambda v: v, n=4, worker=worker))
+        self.assertEqual(sorted(results), list(range(40)))
+        self.assertEqual(state['max'], 4)
+
+    async def test_backpressure(self):
+        pulled = []
+
+        @agenerator
+        async def source():
+            for i in range(100):
+                pulled.append(i)
+                await async_yield(i)
+        fast, slow = apartition(source(), key=lambda v: v % 2, n=2, buffer=3)
+        if hash(0) % 2:
+            fast, slow = slow, fast
+        # Odd values fill slow partition, upstream isn't iterated after that:
+        taken = []
+        for _ in range(4):
+            taken.append(await anext(fast))
+        self.assertEqual(taken, [0, 2, 4, 6])
+        with self.assertRaises(aio.TimeoutError):
+            await aio.wait_for(anext(fast), 0.01)
+        self.assertEqual(pulled, list(range(8)))
+        self.assertEqual(await anext(slow), 1)
+        self.assertEqual(await anext(fast), 8)
+
+    async def test_batches(self):
+        @agenerator
+        async def source():
+            await async_yield_many(range(10))
+        parts = apartition(source(), key=lambda v: v % 2, n=2, buffer=2)
+        results = await aio.gather(*(alist(p) for p in parts))
+        self.assertEqual(sorted(results), [[0, 2, 4, 6, 8], [1, 3, 5, 7, 9]])
+
+    async def test_error(self):
+        async def worker(value):
+            if value == 5:
+                raise ZeroDivisionError()
+            return value
+        state = []
+
+        @agenerator
+        async def source():
+            try:
+                for i in range(100):
+                    await async_yield(i)
+            finally:
+                state.append('closed')
+        with self.assertRaises(ZeroDivisionError):
+            await alist(apartition(source(), key=lambda v: v, n=3, worker=worker))
+        self.assertEqual(state, ['closed'])
+
+    async def test_aclose(self):
+        state = []
+
+        @agenerator
+        async def source():
+            try:
+                for i in range(100):
+                    await async_yield(i)
+            finally:
+                state.append('closed')
+        a, b = apartition(source(), key=lambda v: v % 2, n=2, buffer=2)
+        await a.aclose()
+        # Values of closed partition are dropped:
+        for _ in range(10):
+            await anext(b)
+        self.assertEqual(state, [])
+        await b.aclose()
+        self.assertEqual(state, ['closed'])
+        self.assertEqual(await alist(b), [])
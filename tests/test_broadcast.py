@@ -0,0 +1,168 @@
+import asyncio as aio
+import gc
+from aiogen.utils import AsyncTestCase
+from aiogen.agenerator import agenerator, async_yield, async_yield_many
+from aiogen.abuiltins import alist, anext
+from aiogen.broadcast import Hub
+
+
+class TestHub(AsyncTestCase):
+    async def test_broadcast(self):
+        calls = []
+
+        @agenerator
+        async def source():
+            for i in range(20):
+                calls.append(i)
+                await async_yield(i)
+        hub = Hub(source())
+        subscribers = [hub.subscribe(buffer=4) for _ in range(3)]
+        results = await aio.gather(*(alist(s) for s in subscribers))
+        self.assertEqual(results, [list(range(20))] * 3)
+        self.assertEqual(calls, list(range(20)))
+        # Source is exhausted:
+        self.assertEqual(await alist(hub.subscribe()), [])
+
+    async def test_block(self):
+        hub = Hub(ag_count())
+        fast, slow = hub.subscribe(buffer=3), hub.subscribe(buffer=3)
+        self.assertEqual(await alist_n(fast, 3), [0, 1, 2])
+        # Source waits for the slowest 'block' subscriber:
+        with self.assertRaises(aio.TimeoutError):
+            await aio.wait_for(anext(fast), 0.01)
+        self.assertEqual(await anext(slow), 0)
+        self.assertEqual(await anext(fast), 3)
+        await slow.aclose()
+        self.assertEqual(await alist_n(fast, 10), list(range(4, 14)))
+        await hub.aclose()
+
+    async def test_drop_oldest(self):
+        hub = Hub(ag_count())
+        fast, slow = hub.subscribe(buffer=2), hub.subscribe(buffer=3, policy='drop_oldest')
+        self.assertEqual(await alist_n(fast, 10), list(range(10)))
+        self.assertEqual(await alist_n(slow, 3), [7, 8, 9])
+        self.assertEqual(slow.dropped, 7)
+        await hub.aclose()
+
+    async def test_latest_only(self):
+        hub = Hub(ag_count())
+        fast, latest = hub.subscribe(buffer=2), hub.subscribe(policy='latest_only')
+        self.assertEqual(await alist_n(fast, 10), list(range(10)))
+        self.assertEqual(await anext(latest), 9)
+        self.assertEqual(await anext(fast), 10)
+        self.assertEqual(await anext(latest), 10)
+        await hub.aclose()
+        with self.assertRaises(ValueError):
+            hub.subscribe(policy='unknown')
+        with self.assertRaises(ValueError):
+            hub.subscribe(buffer=0)
+
+    async def test_no_subscribers(self):
+        calls = []
+
+        @agenerator(engine='native')
+        async def source():
+            for i in range(100):
+                calls.append(i)
+                await async_yield(i)
+        hub = Hub(source())
+        subscriber = hub.subscribe(buffer=2)
+        self.assertEqual(await anext(subscriber), 0)
+        await subscriber.aclose()
+        await aio.sleep(0.01)
+        pulled = len(calls)
+        await aio.sleep(0.01)
+        self.assertEqual(len(calls), pulled)
+        self.assertLessEqual(pulled, 3)
+        # Late subscriber gets values came after it subscribed:
+        subscriber = hub.subscribe(buffer=2)
+        self.assertEqual(await anext(subscriber), pulled)
+        await hub.aclose()
+        # Values taken from source before it was closed are still passed:
+        self.assertEqual(await alist(subscriber), [pulled + 1])
+
+    async def test_garbage_collected(self):
+        hub = Hub(ag_count())
+        subscriber = hub.subscribe(buffer=2)
+        abandoned = hub.subscribe(buffer=2)
+        del abandoned
+        gc.collect()
+        self.assertEqual(await alist_n(subscriber, 10), list(range(10)))
+        await hub.aclose()
+
+    async def test_hub_garbage_collected(self):
+        state = []
+
+        @agenerator
+        async def source():
+            try:
+                await async_yield_many(range(10))
+            finally:
+                state.append('closed')
+        hub = Hub(source())
+        subscriber = hub.subscribe(buffer=2)
+        self.assertEqual(await anext(subscriber), 0)
+        task = hub._state._task
+        # Subscriber keeps hub alive:
+        del hub
+        gc.collect()
+        self.assertEqual(await anext(subscriber), 1)
+        del subscriber
+        gc.collect()
+        await aio.sleep(0.01)
+        self.assertTrue(task.cancelled())
+        self.assertEqual(state, ['closed'])
+
+    async def test_batches(self):
+        @agenerator
+        async def source():
+            await async_yield_many(range(10))
+        hub = Hub(source())
+        subscriber = hub.subscribe(buffer=4)
+        self.assertEqual(await subscriber.__anext_batch__(10), [0, 1, 2, 3])
+        self.assertEqual(await alist(subscriber), list(range(4, 10)))
+
+    async def test_error(self):
+        @agenerator
+        async def failing():
+            await async_yield(1)
+            raise ZeroDivisionError()
+        hub = Hub(failing())
+        subscribers = [hub.subscribe(), hub.subscribe()]
+        for subscriber in subscribers:
+            self.assertEqual(await anext(subscriber), 1)
+            with self.assertRaises(ZeroDivisionError):
+                await anext(subscriber)
+
+    async def test_aclose(self):
+        state = []
+
+        @agenerator
+        async def source():
+            try:
+                while True:
+                    await async_yield(None)
+                    await aio.sleep(0)
+            finally:
+                state.append('closed')
+        hub = Hub(source())
+        subscriber = hub.subscribe(policy='drop_oldest')
+        await anext(subscriber)
+        await hub.aclose()
+        self.assertEqual(state, ['closed'])
+        await alist(subscriber)
+
+
+@agenerator
+async def ag_count():
+    i = 0
+    while True:
+        await async_yield(i)
+        i += 1
+
+
+async def alist_n(aiterator, n):
+    values = []
+    for _ in range(n):
+        values.append(await anext(aiterator))
+    return values
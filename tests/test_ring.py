@@ -0,0 +1,48 @@
+import unittest
+
+from aiogen.ring import Ring
+
+
+class TestRing(unittest.TestCase):
+    def test_fifo(self):
+        ring = Ring(3)
+        for i in range(10):
+            ring.push(i)
+            ring.push(-i)
+            self.assertEqual(ring.pop(), i)
+            self.assertEqual(ring.pop(), -i)
+        self.assertEqual(len(ring), 0)
+
+    def test_full(self):
+        ring = Ring(2)
+        ring.push(1)
+        self.assertFalse(ring.full())
+        ring.push(2)
+        self.assertTrue(ring.full())
+        with self.assertRaises(IndexError):
+            ring.push(3)
+        self.assertEqual(ring.pop_many(5), [1, 2])
+        with self.assertRaises(IndexError):
+            ring.pop()
+
+    def test_getitem(self):
+        ring = Ring(3)
+        for i in range(5):
+            ring.push(i)
+            if ring.full():
+                ring.pop()
+        self.assertEqual([ring[i] for i in range(len(ring))], [3, 4])
+        self.assertEqual(list(ring), [3, 4])
+        with self.assertRaises(IndexError):
+            ring[2]
+
+    def test_clear(self):
+        ring = Ring(2)
+        ring.push(1)
+        ring.clear()
+        self.assertEqual(len(ring), 0)
+        self.assertEqual(ring.capacity, 2)
+
+    def test_capacity(self):
+        with self.assertRaises(ValueError):
+            Ring(0)
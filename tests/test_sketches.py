@@ -0,0 +1,187 @@
+import random
+import unittest
+from collections import Counter
+from aiogen.utils import AsyncTestCase
+from aiogen.agenerator import agenerator, async_yield_many
+from aiogen.abuiltins import alist
+from aiogen.sketches import *
+
+
+@agenerator
+async def ag(iterable):
+    # Values by pages, so big streams don't take long:
+    values = list(iterable)
+    for i in range(0, len(values), 1000):
+        await async_yield_many(values[i:i + 1000])
+
+
+def rank_error(values, value, q):
+    """Return difference between q and value's rank in sorted values."""
+    below = sum(1 for v in values if v < value)
+    return abs(below / len(values) - q)
+
+
+class TestHyperLogLog(unittest.TestCase):
+    def test_accuracy(self):
+        for n in (10, 1000, 100000):
+            sketch = HyperLogLog()
+            sketch.update(str(i) for i in range(n))
+            sketch.update(str(i) for i in range(0, n, 2))  # duplicates aren't counted
+            self.assertLess(abs(sketch.count() - n) / n, 0.03, n)
+
+    def test_precision(self):
+        sketch = HyperLogLog(precision=8)
+        self.assertEqual(len(sketch._registers), 256)
+        sketch.update(range(50000))
+        self.assertLess(abs(sketch.count() - 50000) / 50000, 0.2)
+        with self.assertRaises(ValueError):
+            HyperLogLog(precision=3)
+
+    def test_merge(self):
+        a, b = HyperLogLog(), HyperLogLog()
+        a.update(range(0, 60000))
+        b.update(range(40000, 100000))
+        self.assertLess(abs(a.merge(b).count() - 100000) / 100000, 0.03)
+        with self.assertRaises(ValueError):
+            a.merge(HyperLogLog(10))
+
+    def test_mixed_types(self):
+        sketch = HyperLogLog()
+        sketch.update([1, '1', b'1', 1.0, True, 1.5])
+        self.assertEqual(sketch.count(), 4)
+
+
+class TestKLL(unittest.TestCase):
+    qs = (0.01, 0.1, 0.5, 0.9, 0.99)
+
+    def test_accuracy(self):
+        rnd = random.Random(1)
+        values = [rnd.gauss(0, 1) for _ in range(100000)]
+        sketch = KLL(seed=1)
+        sketch.update(values[:50000])
+        for value in values[50000:]:
+            sketch.add(value)
+        self.assertEqual(len(sketch), len(values))
+        self.assertLess(sketch._size, 3 * sketch.k)
+        for q, value in zip(self.qs, sketch.quantiles(self.qs)):
+            self.assertLess(rank_error(values, value, q), 0.02, q)
+
+    def test_merge(self):
+        rnd = random.Random(2)
+        shards = [[rnd.expovariate(1) for _ in range(20000)] for _ in range(4)]
+        sketches = [KLL(seed=i) for i in range(4)]
+        for sketch, values in zip(sketches, shards):
+            sketch.update(values)
+        merged = sketches[0]
+        for sketch in sketches[1:]:
+            merged.merge(sketch)
+        values = [v for shard in shards for v in shard]
+        for q, value in zip(self.qs, merged.quantiles(self.qs)):
+            self.assertLess(rank_error(values, value, q), 0.02, q)
+
+    def test_small(self):
+        sketch = KLL()
+        sketch.update([3, 1, 2])
+        self.assertEqual(sketch.quantiles((0, 0.5, 1)), [1, 2, 3])
+        with self.assertRaises(ValueError):
+            KLL().quantile(0.5)
+
+
+class TestReservoir(unittest.TestCase):
+    def test_uniform(self):
+        rnd = random.Random(3)
+        counts = Counter()
+        for _ in range(3000):
+            reservoir = Reservoir(3, seed=rnd.random())
+            reservoir.update(range(30))
+            self.assertEqual(len(reservoir.sample), 3)
+            counts.update(reservoir.sample)
+        # Every value is sampled with probability 3 / 30:
+        for value in range(30):
+            self.assertAlmostEqual(counts[value] / 3000, 0.1, delta=0.025)
+
+    def test_merge(self):
+        rnd = random.Random(4)
+        counts = Counter()
+        for _ in range(3000):
+            a, b = Reservoir(4, seed=rnd.random()), Reservoir(4, seed=rnd.random())
+            a.update(range(10))
+            b.update(range(10, 40))
+            merged = a.merge(b)
+            counts.update(merged.sample)
+            self.assertEqual(len(merged), 40)
+        for value in range(40):
+            self.assertAlmostEqual(counts[value] / 3000, 0.1, delta=0.025)
+
+    def test_short(self):
+        reservoir = Reservoir(5)
+        reservoir.update('ab')
+        self.assertEqual(reservoir.sample, ['a', 'b'])
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_error_rate(self):
+        bloom = BloomFilter(10000, 0.01)
+        for i in range(10000):
+            bloom.add(i)
+        self.assertTrue(all(i in bloom for i in range(10000)))
+        false_positives = sum(1 for i in range(10000, 30000) if i in bloom)
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_merge(self):
+        a, b = BloomFilter(100), BloomFilter(100)
+        a.add('a')
+        b.add('b')
+        merged = a.merge(b)
+        self.assertIn('a', merged)
+        self.assertIn('b', merged)
+        with self.assertRaises(ValueError):
+            a.merge(BloomFilter(200))
+
+    def test_mixed_types(self):
+        bloom = BloomFilter(100)
+        bloom.add(1)
+        self.assertIn(1.0, bloom)
+        self.assertIn(True, bloom)
+        self.assertNotIn('1', bloom)
+        self.assertNotIn(b'1', bloom)
+
+
+class TestReducers(AsyncTestCase):
+    async def test_acount_distinct(self):
+        values = [i % 5000 for i in range(20000)]
+        self.assertLess(abs(await acount_distinct(ag(values)) - 5000), 150)
+        sketch = HyperLogLog()
+        await acount_distinct(ag(range(3000)), sketch=sketch)
+        self.assertLess(abs(await acount_distinct(ag(range(2000, 5000)), sketch=sketch) - 5000), 150)
+        self.assertEqual(await acount_distinct(ag([1, '1', b'1'])), 3)
+        self.assertEqual(await acount_distinct(ag([1, 1.0, True])), 1)
+
+    async def test_aquantiles(self):
+        values = list(range(20000))
+        random.shuffle(values)
+        median, p99 = await aquantiles(ag(values), (0.5, 0.99))
+        self.assertLess(abs(median - 10000), 400)
+        self.assertLess(abs(p99 - 19800), 400)
+
+    async def test_asample(self):
+        sample = await asample(ag(range(1000)), 10, seed=1)
+        self.assertEqual(len(sample), 10)
+        self.assertEqual(len(set(sample)), 10)
+        self.assertEqual(sample, await asample(ag(range(1000)), 10, seed=1))
+
+    async def test_aunique(self):
+        values = [1, 2, 1, 3, 2, 4, 1]
+        self.assertEqual(await alist(aunique(ag(values))), [1, 2, 3, 4])
+        self.assertEqual(await alist(aunique(ag(values), key=lambda v: v % 2)), [1, 2])
+        # Only max_size recently seen keys are remembered:
+        self.assertEqual(await alist(aunique(ag(values), max_size=2)), [1, 2, 3, 2, 4, 1])
+        self.assertEqual(await alist(aunique(ag(values), max_size=10, mode='bloom')), [1, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            aunique(ag(values), mode='unknown')
+
+    async def test_aunique_bloom(self):
+        unique = aunique(ag(list(range(10000)) * 2), max_size=10000, mode='bloom', error_rate=0.01)
+        passed = await alist(unique)
+        self.assertGreater(len(passed), 9800)
+        self.assertEqual(len(set(passed)), len(passed))
@@ -0,0 +1,69 @@
+from typing import AsyncIterator
+from aiogen.utils import AsyncTestCase
+from aiogen.agenerator import agenerator, async_yield, async_yield_many
+from aiogen.stream import Stream
+
+
+@agenerator
+async def ag(iterable) -> AsyncIterator:
+    for i in iterable:
+        await async_yield(i)
+
+
+@agenerator
+async def ag_many(iterable) -> AsyncIterator:
+    iterable = list(iterable)
+    await async_yield_many(iterable[:3])
+    await async_yield_many(iterable[3:])
+
+
+class TestStream(AsyncTestCase):
+    ag = staticmethod(ag)
+
+    async def test_fused(self):
+        i = range(10)
+        stream = Stream(self.ag(i)).map(lambda v: v * 3).filter(lambda v: v % 2).enumerate(1).map(list)
+        expected = [list(v) for v in enumerate((v * 3 for v in i if (v * 3) % 2), 1)]
+        self.assertEqual(await stream.to_list(), expected)
+
+    async def test_filter_none(self):
+        self.assertEqual(await Stream(self.ag([0, 1, None, 2])).filter().to_list(), [1, 2])
+
+    async def test_take(self):
+        state = []
+
+        @agenerator
+        async def source():
+            try:
+                for i in range(100):
+                    await async_yield(i)
+            finally:
+                state.append('closed')
+        stream = Stream(source()).filter(lambda v: v % 2).take(3).map(str)
+        self.assertEqual(await stream.to_list(), ['1', '3', '5'])
+        self.assertEqual(state, ['closed'])
+
+    async def test_batch(self):
+        stream = Stream(self.ag(range(7))).batch(3)
+        self.assertEqual(await stream.to_list(), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(await Stream(self.ag([])).batch(3).to_list(), [])
+        with self.assertRaises(ValueError):
+            Stream(self.ag([])).batch(0)
+
+    async def test_reducers(self):
+        self.assertEqual(await Stream(self.ag(range(5))).map(lambda v: v * 2).sum(), 20)
+        self.assertEqual(await Stream(self.ag(range(5))).sum(10), 20)
+        self.assertEqual(await Stream(self.ag([3, -7, 5])).max(key=abs), -7)
+        self.assertEqual(await Stream(self.ag([3, -7, 5])).min(), -7)
+        self.assertEqual(await Stream(self.ag([])).max(default=None), None)
+
+    async def test_immutable(self):
+        base = Stream(self.ag(range(5)))
+        doubled, filtered = base.map(lambda v: v * 2), base.filter(lambda v: v > 2)
+        self.assertEqual(await filtered.to_list(), [3, 4])
+        self.assertEqual(await doubled.to_list(), [])  # source is exhausted already
+
+
+class TestStreamBatches(TestStream):
+    """Same tests for aiterables supporting __anext_batch__."""
+    ag = staticmethod(ag_many)
@@ -0,0 +1,134 @@
+import asyncio as aio
+import gc
+import threading
+import time
+import unittest
+from typing import AsyncIterator
+from aiogen.agenerator import agenerator, async_yield, async_yield_many
+from aiogen.sync import iterate
+
+
+@agenerator
+async def ag(iterable) -> AsyncIterator:
+    for i in iterable:
+        await async_yield(i)
+
+
+@agenerator(engine='native')
+async def ag_many(iterable) -> AsyncIterator:
+    iterable = list(iterable)
+    await async_yield_many(iterable[:3])
+    await async_yield_many(iterable[3:])
+
+
+class TestIterate(unittest.TestCase):
+    def test_values(self):
+        for gen_func in (ag, ag_many):
+            for prefetch in (1, 2, 64):
+                self.assertEqual(list(iterate(gen_func(range(10)), prefetch)), list(range(10)))
+            self.assertEqual(list(iterate(gen_func([]))), [])
+        with self.assertRaises(ValueError):
+            iterate(ag([]), prefetch=0)
+
+    def test_prefetch(self):
+        pulled = []
+
+        @agenerator
+        async def g():
+            for i in range(100):
+                pulled.append(i)
+                await async_yield(i)
+        it = iterate(g(), prefetch=5)
+        self.assertEqual(next(it), 0)
+        time.sleep(0.05)
+        self.assertLessEqual(len(pulled), 1 + 5 + 5 + 1)
+        self.assertEqual(list(it), list(range(1, 100)))
+
+    def test_exception(self):
+        @agenerator
+        async def g():
+            await async_yield(1)
+            raise ValueError()
+        it = iterate(g())
+        self.assertEqual(next(it), 1)
+        with self.assertRaises(ValueError):
+            next(it)
+        self.assertEqual(list(it), [])
+
+    def test_close(self):
+        state = []
+
+        @agenerator
+        async def g():
+            try:
+                for i in range(100):
+                    await async_yield(i)
+            finally:
+                state.append('closed')
+        it = iterate(g(), prefetch=2)
+        self.assertEqual(next(it), 0)
+        it.close()
+        self.assertEqual(state, ['closed'])
+        self.assertEqual(list(it), [])
+        iterate(g()).close()
+
+    def test_collected(self):
+        state = []
+
+        @agenerator
+        async def g():
+            try:
+                for i in range(100):
+                    await async_yield(i)
+            finally:
+                state.append('closed')
+        it = iterate(g(), prefetch=2)
+        next(it)
+        del it
+        gc.collect()
+        for _ in range(100):
+            if state:
+                break
+            time.sleep(0.01)
+        self.assertEqual(state, ['closed'])
+
+    def test_close_waiting(self):
+        state = []
+
+        @agenerator(engine='native')
+        async def g():
+            try:
+                await async_yield(1)
+                await aio.sleep(3600)
+                await async_yield(2)
+            finally:
+                state.append('closed')
+        # Source waits inside await, closing cancels it:
+        it = iterate(g(), prefetch=1)
+        self.assertEqual(next(it), 1)
+        time.sleep(0.01)
+        start = time.perf_counter()
+        it.close()
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(state, ['closed'])
+        it = iterate(g(), prefetch=1)
+        next(it)
+        del it
+        gc.collect()
+        for _ in range(100):
+            if len(state) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(state, ['closed', 'closed'])
+
+    def test_threads(self):
+        results = []
+
+        def consume():
+            results.append(list(iterate(ag(range(20)), prefetch=3)))
+        threads = [threading.Thread(target=consume) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [list(range(20))] * 4)
@@ -0,0 +1,114 @@
+import random
+from aiogen.utils import AsyncTestCase
+from aiogen.agenerator import agenerator, async_yield
+from aiogen.abuiltins import alist, anext
+from aiogen.windowing import *
+
+
+@agenerator
+async def ag(iterable):
+    for i in iterable:
+        await async_yield(i)
+
+
+async def collect(windows):
+    """Return lists of windows' values and reducers."""
+    result = []
+    async for window in windows:
+        result.append((list(window), window.sum(), window.min(), window.max()))
+    return result
+
+
+def expected(values):
+    return [(list(w), sum(w), min(w), max(w)) for w in values]
+
+
+class TestAWindow(AsyncTestCase):
+    async def test_sliding(self):
+        values = [random.randint(-100, 100) for _ in range(200)]
+        for size in (1, 3, 50):
+            windows = [values[i:i + size] for i in range(len(values) - size + 1)]
+            self.assertEqual(await collect(awindow(ag(values), size)), expected(windows))
+
+    async def test_step(self):
+        values = list(range(10))
+        tumbling = await alist(aiter_lists(awindow(ag(values), 3, step=3)))
+        self.assertEqual(tumbling, [[0, 1, 2], [3, 4, 5], [6, 7, 8]])
+        hopping = await alist(aiter_lists(awindow(ag(values), 2, step=3)))
+        self.assertEqual(hopping, [[0, 1], [3, 4], [6, 7]])
+        overlapping = await alist(aiter_lists(awindow(ag(values), 4, step=2)))
+        self.assertEqual(overlapping, [[0, 1, 2, 3], [2, 3, 4, 5], [4, 5, 6, 7], [6, 7, 8, 9]])
+        self.assertEqual(await alist(awindow(ag([1]), 2)), [])
+        with self.assertRaises(ValueError):
+            awindow(ag([]), 0)
+
+    async def test_shared(self):
+        windows = awindow(ag(range(5)), 2)
+        first = await anext(windows)
+        self.assertIs(await anext(windows), first)
+        self.assertEqual(list(first), [1, 2])
+
+    async def test_lazy_reducers(self):
+        values = [random.randint(-100, 100) for _ in range(100)]
+        windows = awindow(ag(values), 10)
+        for _ in range(50):
+            await anext(windows)
+        # Reducers are built from current values, then maintained:
+        result = []
+        async for window in windows:
+            result.append((window.sum(), window.min(), window.max(), window.mean()))
+        w = [values[i:i + 10] for i in range(50, 91)]
+        self.assertEqual(result, [(sum(v), min(v), max(v), sum(v) / 10) for v in w])
+
+    async def test_float_sum(self):
+        values = [random.random() * 10 ** random.randint(-5, 5) for _ in range(1000)]
+        windows = awindow(ag(values), 7)
+        (await anext(windows)).sum()
+        async for window in windows:
+            pass
+        # Rounding errors of subtracted values don't accumulate:
+        self.assertAlmostEqual(window.sum(), sum(values[-7:]), places=6)
+
+
+class TestATimeWindow(AsyncTestCase):
+    async def test_timestamp(self):
+        events = [(0, 5), (1, 3), (2, 8), (5, 1), (6, 2), (12, 4)]
+        windows = atimewindow(ag(events), 4, timestamp=lambda e: e[0])
+        result = []
+        async for window in windows:
+            result.append(([t for t, _ in window], sum(v for _, v in window)))
+        self.assertEqual(result, [
+            ([0], 5), ([0, 1], 8), ([0, 1, 2], 16), ([2, 5], 9), ([5, 6], 3), ([12], 4),
+        ])
+
+    async def test_reducers(self):
+        times = sorted(random.uniform(0, 100) for _ in range(300))
+        values = [random.randint(-100, 100) for _ in times]
+        # Timestamp is taken once per value in order:
+        windows = atimewindow(ag(values), 10, timestamp=lambda _, t=iter(times): next(t))
+        result = await collect(windows)
+        windows = [[v for t, v in zip(times, values) if now - 10 < t <= now] for now in times]
+        self.assertEqual(result, expected(windows))
+
+    async def test_loop_time(self):
+        import asyncio as aio
+
+        @agenerator
+        async def source():
+            for i in range(3):
+                await async_yield(i)
+                await aio.sleep(0.05)
+        self.assertEqual(await alist(aiter_lists(atimewindow(source(), 0.07))), [[0], [0, 1], [1, 2]])
+
+
+class aiter_lists:
+    """Copies of windows' values."""
+    def __init__(self, windows):
+        self._windows = windows
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return list(await anext(self._windows))
+